@@ -0,0 +1,232 @@
+# LegacyLoop - Engagement Analytics
+# Columnar engagement events across all families with vectorized
+# heatmaps, activity buckets, heir recency/frequency and decayed scores
+
+import threading
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+
+from data import ASSET_TYPES, FAMILY_HEIRS
+from family_state import get_family_state
+
+# Analysis windows offered to the advisor (None = all time)
+ANALYTICS_WINDOWS = {
+    'Last 7 days': 7 * 86400,
+    'Last 30 days': 30 * 86400,
+    'Last 90 days': 90 * 86400,
+    'All time': None,
+}
+
+# Results are reused for this long (and until new events arrive)
+ANALYTICS_REFRESH_SECONDS = 60
+
+# Activity is bucketed by day for windows up to this long, by week beyond
+DAILY_BUCKET_MAX_SECONDS = 31 * 86400
+
+# An event's weight halves every this many seconds
+ENGAGEMENT_HALF_LIFE_SECONDS = 7 * 86400
+
+# Decayed event weight at which the engagement score reaches 50%
+ENGAGEMENT_SATURATION = 3.0
+
+# Cached summaries kept per process
+MAX_CACHED_SUMMARIES = 256
+
+# Parsed value of a missing or malformed timestamp (such events are skipped)
+_NAT = np.iinfo(np.int64).min
+
+
+def current_timestamp() -> int:
+    """Now in the same naive local-time seconds as parsed log timestamps"""
+    return int(np.datetime64(datetime.now().replace(microsecond=0), 's').astype(np.int64))
+
+
+def parse_timestamps(values: list) -> np.ndarray:
+    """Log timestamps as int64 seconds; missing or malformed ones become _NAT"""
+    try:
+        return np.array([value or 'NaT' for value in values], dtype='datetime64[s]').astype(np.int64)
+    except (TypeError, ValueError):
+        pass
+    parsed = np.full(len(values), _NAT, dtype=np.int64)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = np.datetime64(value or 'NaT', 's').astype(np.int64)
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+class _Codes:
+    """Maps strings to dense integer codes"""
+
+    def __init__(self, initial=()):
+        self.index = {}
+        self.values = []
+        for value in initial:
+            self.encode(value)
+
+    def encode(self, value) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class EngagementAnalytics:
+    """
+    Engagement events of every family as columnar numpy arrays.
+
+    New events are read incrementally from each family's log and appended
+    in batches; summaries are computed with masks and bincounts over the
+    whole arrays and cached per (family, window, refresh interval).
+    """
+
+    def __init__(self):
+        self.families = _Codes()
+        self.heirs = _Codes()
+        self.assets = _Codes()
+        self.types = _Codes(ASSET_TYPES)
+        self.times = np.zeros(0, dtype=np.int64)
+        self.family_codes = np.zeros(0, dtype=np.int32)
+        self.heir_codes = np.zeros(0, dtype=np.int32)
+        self.asset_codes = np.zeros(0, dtype=np.int32)
+        self.type_codes = np.zeros(0, dtype=np.int32)
+        self._seen = {}   # family id -> events loaded
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.times)
+
+    def ingest(self, family_id: str, logs: list):
+        """Append a family's new log entries (entries without a valid timestamp are skipped)"""
+        if not logs:
+            return
+        self._seen[family_id] = self._seen.get(family_id, 0) + len(logs)
+        times = parse_timestamps([log.get('timestamp') for log in logs])
+        valid = times != _NAT
+        if not valid.all():
+            logs = [log for log, ok in zip(logs, valid) if ok]
+            times = times[valid]
+            if not logs:
+                return
+        family = self.families.encode(family_id)
+        self.times = np.concatenate([self.times, times])
+        self.family_codes = np.concatenate([self.family_codes, np.full(len(logs), family, dtype=np.int32)])
+        self.heir_codes = np.concatenate([
+            self.heir_codes, np.fromiter((self.heirs.encode(log.get('heir', '')) for log in logs), np.int32, len(logs))
+        ])
+        self.asset_codes = np.concatenate([
+            self.asset_codes, np.fromiter((self.assets.encode(log.get('asset', '')) for log in logs), np.int32, len(logs))
+        ])
+        self.type_codes = np.concatenate([
+            self.type_codes, np.fromiter((self.types.encode(log.get('asset_type', '')) for log in logs), np.int32, len(logs))
+        ])
+
+    def refresh(self, family_ids=None):
+        """Load events logged since the last refresh"""
+        with self._lock:
+            for family_id in family_ids or FAMILY_HEIRS:
+                family = get_family_state(family_id)
+                start = self._seen.get(family_id, 0)
+                if family.count_engagement_logs() > start:
+                    self.ingest(family_id, family.get_engagement_logs(start=start))
+
+    def summary(self, family_id: str = None, window_seconds: int = None, now: int = None) -> dict:
+        """
+        Engagement summary for one family (or all families when None).
+
+        Counts, heatmap and activity cover the window; recency and the
+        decay-weighted scores use every event up to now.
+        """
+        if now is None:
+            now = current_timestamp()
+        key = (family_id, window_seconds, now // ANALYTICS_REFRESH_SECONDS, len(self))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                if len(self._cache) >= MAX_CACHED_SUMMARIES:
+                    self._cache.clear()
+                cached = self._cache[key] = self._summarize(family_id, window_seconds, now)
+        return cached
+
+    def _summarize(self, family_id, window_seconds, now) -> dict:
+        valid = self.times <= now
+        if family_id is not None:
+            code = self.families.index.get(family_id, -1)
+            valid &= self.family_codes == code
+        times = self.times[valid]
+        heirs = self.heir_codes[valid]
+        assets = self.asset_codes[valid]
+        types = self.type_codes[valid]
+
+        start = now - window_seconds if window_seconds else (int(times.min()) if len(times) else now)
+        in_window = times >= start
+        n_heirs, n_types, n_assets = len(self.heirs), len(self.types), len(self.assets)
+
+        # Per (heir, asset type) interest within the window
+        heatmap = np.bincount(
+            heirs[in_window] * n_types + types[in_window], minlength=n_heirs * n_types
+        ).reshape(n_heirs, n_types)
+
+        # Activity over time within the window, in day (or week) buckets
+        bucket = 86400 if (now - start) <= DAILY_BUCKET_MAX_SECONDS else 7 * 86400
+        origin = start - start % 86400
+        n_buckets = (now - origin) // bucket + 1
+        activity = np.bincount((times[in_window] - origin) // bucket, minlength=n_buckets)[:n_buckets]
+        bucket_days = np.datetime_as_string((origin + np.arange(n_buckets) * bucket).astype('datetime64[s]'), unit='D')
+
+        # Recency, frequency and decay-weighted scores
+        weights = np.exp2(-(now - times) / ENGAGEMENT_HALF_LIFE_SECONDS)
+        frequency = np.bincount(heirs, minlength=n_heirs)
+        last_seen = np.full(n_heirs, -1, dtype=np.int64)
+        np.maximum.at(last_seen, heirs, times)
+        heir_scores = np.bincount(heirs, weights=weights, minlength=n_heirs)
+        asset_scores = np.bincount(assets, weights=weights, minlength=n_assets)
+
+        heir_stats = {
+            self.heirs.values[h]: {
+                'interactions': int(frequency[h]),
+                'last_seen_seconds': int(now - last_seen[h]),
+                'score': engagement_score(heir_scores[h]),
+                'window_interactions': int(heatmap[h].sum()),
+            }
+            for h in np.flatnonzero(frequency)
+        }
+        type_totals = heatmap.sum(axis=0)
+        top_assets = np.argsort(-asset_scores, kind='stable')
+        return {
+            'interactions': int(len(times)),
+            'window_interactions': int(in_window.sum()),
+            'assets_explored': int(np.count_nonzero(np.bincount(assets, minlength=n_assets))),
+            'engagement_score': engagement_score(weights.sum()),
+            'heatmap': {
+                self.heirs.values[h]: {
+                    self.types.values[t]: int(heatmap[h, t]) for t in np.flatnonzero(type_totals)
+                }
+                for h in np.flatnonzero(heatmap.sum(axis=1))
+            },
+            'activity': dict(zip(bucket_days.tolist(), activity.tolist())),
+            'heirs': heir_stats,
+            'top_assets': [
+                (self.assets.values[a], round(float(asset_scores[a]), 2))
+                for a in top_assets[:5] if asset_scores[a] > 0
+            ],
+        }
+
+
+def engagement_score(decayed_weight: float) -> int:
+    """0-100 score from a decay-weighted event count"""
+    return int(round(100 * (1 - np.exp2(-float(decayed_weight) / ENGAGEMENT_SATURATION))))
+
+
+@st.cache_resource
+def get_engagement_analytics() -> EngagementAnalytics:
+    """Get the process-wide engagement analytics engine"""
+    return EngagementAnalytics()
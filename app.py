@@ -1,21 +1,45 @@
 # LegacyLoop - Main Application
 # Bridging the engagement gap between wealthy clients, heirs, and advisors
 
+import hashlib
+
 import streamlit as st
 from datetime import datetime
 
 # Import our modules
 from data import (
-    DEFAULT_PORTFOLIO, USERS, ASSET_TYPES, 
-    format_currency, get_total_portfolio_value, 
-    add_asset, update_asset, delete_asset
+    DEFAULT_FAMILY_ID, USERS, ASSET_TYPES, 
+    approximate_value, format_currency, get_total_portfolio_value, get_family_heirs,
+    add_asset, update_asset, delete_asset, find_duplicate_name
 )
-import copy
+from family_state import get_current_family, get_draft_writer, get_family_state
+from analytics import ANALYTICS_WINDOWS, get_engagement_analytics
+from catalog import get_ticker_catalog
+from export import EXPORT_FORMATS, export_filename, export_stream
+from projections import PROJECTION_HORIZONS, project_portfolio
+from memory import LRUDict
 from services import (
+    MISSION_CANDIDATE_COUNT,
     generate_mission_statement,
-    generate_heir_content,
+    generate_mission_statement_candidates,
     generate_advisor_email,
-    is_simulation_mode
+    api_key_mode,
+    build_heir_prompt,
+    get_cached_response,
+    get_job_api_key,
+    is_usable_response,
+    normalize_text,
+    generation_key
+)
+from scheduler import (
+    PRIORITY_VISIBLE,
+    collect_background_job,
+    generation_priority,
+    get_scheduler,
+    start_background_job,
+    submit_heir_content,
+    unfinished_job_names,
+    watch_background_jobs
 )
 from ui_components import (
     render_sidebar,
@@ -100,24 +124,24 @@ def initialize_session_state():
     if 'current_role' not in st.session_state:
         st.session_state.current_role = 'primary'
     
-    if 'mission_statement' not in st.session_state:
-        st.session_state.mission_statement = None
+    # Portfolio, mission statement and engagement logs are shared per family
+    # (see family_state.py); the session only remembers which family it is
+    if 'family_id' not in st.session_state:
+        st.session_state.family_id = DEFAULT_FAMILY_ID
     
+    # Mission-builder inputs start from the family's autosaved draft
     if 'family_values' not in st.session_state:
-        st.session_state.family_values = ""
+        family_id = st.session_state.family_id
+        draft = get_draft_writer().pending(family_id) or get_family_state(family_id).mission_draft or {}
+        st.session_state.family_values = draft.get('values', "")
+        st.session_state.family_goals = draft.get('goals', "")
     
-    if 'family_goals' not in st.session_state:
-        st.session_state.family_goals = ""
-    
-    if 'engagement_logs' not in st.session_state:
-        st.session_state.engagement_logs = []
+    # Futures for generation running on the shared scheduler (see scheduler.py)
+    if 'background_jobs' not in st.session_state:
+        st.session_state.background_jobs = LRUDict(BACKGROUND_JOB_LIMIT)
     
     if 'heir_content_cache' not in st.session_state:
-        st.session_state.heir_content_cache = {}
-    
-    # Initialize portfolio from default if not set
-    if 'portfolio' not in st.session_state:
-        st.session_state.portfolio = copy.deepcopy(DEFAULT_PORTFOLIO)
+        st.session_state.heir_content_cache = LRUDict(HEIR_CONTENT_CACHE_LIMIT)
     
     # Asset management state
     if 'editing_asset_id' not in st.session_state:
@@ -127,14 +151,209 @@ def initialize_session_state():
         st.session_state.show_add_asset = False
 
 
+# How often an open advisor dashboard checks for new family activity
+ADVISOR_POLL_SECONDS = 3
+
+# Session names of the mission-builder background jobs
+MISSION_JOB = ('mission',)
+CANDIDATES_JOB = ('mission_candidates',)
+
+# Number of Legacy Cards shown in the heir feed
+HEIR_FEED_SIZE = 5
+
+# Advisor activity feed events shown at first and added per "Show older"
+ACTIVITY_FEED_PAGE_SIZE = 20
+
+# Suggestions offered by the Add Asset security lookup
+TICKER_SUGGESTIONS = 10
+
+# Per-session cache bounds (least recently used entries are dropped first;
+# a dropped job keeps running and its result still lands in the shared cache)
+HEIR_CONTENT_CACHE_LIMIT = 64
+BACKGROUND_JOB_LIMIT = 64
+
+# Largest export offered as an in-browser download (the download is built
+# in memory; bigger histories are streamed to a file by export.py)
+APP_EXPORT_MAX_EVENTS = 20000
+
+# Emoji shown next to each holding in the Current Holdings list
+ASSET_TYPE_EMOJI = {
+    'Equities': '📈',
+    'Index Fund': '📊',
+    'Bonds': '💵',
+    'Real Estate': '🏠',
+    'Cryptocurrency': '🪙',
+    'Private Equity': '🏢',
+    'Cash/Savings': '💰',
+    'Alternative Investments': '💎'
+}
+
+
+def invalidate_heir_content(*asset_ids):
+    """Drop cached heir explanations (for every heir) for the given assets only"""
+    content_cache = st.session_state.heir_content_cache
+    for key in [key for key in content_cache if key[1] in asset_ids]:
+        del content_cache[key]
+
+
+@st.fragment
+def render_holding_row(asset: dict):
+    """
+    Render one holding with its edit/delete actions.
+    
+    Runs as a fragment so opening or cancelling the edit form only reruns
+    this row. Changes that affect portfolio totals trigger a full rerun.
+    """
+    family = get_current_family()
+    asset_id = asset.get('id', 0)
+    
+    with st.container():
+        # Asset display row
+        col_info, col_value, col_actions = st.columns([3, 2, 2])
+        
+        with col_info:
+            emoji = ASSET_TYPE_EMOJI.get(asset['type'], '📦')
+            symbol = asset.get('symbol', '')
+            st.markdown(f"**{emoji} {asset['name']}**")
+            st.caption(f"{asset['type']} ({symbol})" if symbol else asset['type'])
+        
+        with col_value:
+            st.markdown(f"### {format_currency(asset['value'])}")
+        
+        with col_actions:
+            col_edit, col_delete = st.columns(2)
+            with col_edit:
+                if st.button("✏️", key=f"edit_{asset_id}", help="Edit asset"):
+                    previous_id = st.session_state.editing_asset_id
+                    st.session_state.editing_asset_id = asset_id
+                    st.session_state.show_add_asset = False
+                    if previous_id is not None and previous_id != asset_id:
+                        # Another row still shows its form - close it too
+                        st.rerun()
+            with col_delete:
+                if st.button("🗑️", key=f"delete_{asset_id}", help="Delete asset"):
+                    with family.update() as portfolio:
+                        delete_asset(portfolio, asset_id)
+                    invalidate_heir_content(asset_id)
+                    st.success(f"Deleted {asset['name']}")
+                    st.rerun()
+    
+    # Edit Form (inline)
+    if st.session_state.editing_asset_id == asset_id:
+        with st.form(f"edit_form_{asset_id}"):
+            st.markdown("#### Edit Asset")
+            col1, col2 = st.columns(2)
+            with col1:
+                edit_name = st.text_input("Name", value=asset['name'])
+                edit_value = st.number_input("Value ($)", value=asset['value'], min_value=0, step=10000)
+            with col2:
+                type_index = ASSET_TYPES.index(asset['type']) if asset['type'] in ASSET_TYPES else 0
+                edit_type = st.selectbox("Type", ASSET_TYPES, index=type_index)
+                edit_symbol = st.text_input("Symbol", value=asset.get('symbol', ''))
+            
+            edit_description = st.text_area("Description", value=asset.get('description', ''))
+            
+            col_save, col_cancel = st.columns(2)
+            with col_save:
+                save = st.form_submit_button("💾 Save", use_container_width=True)
+            with col_cancel:
+                cancel_edit = st.form_submit_button("❌ Cancel", use_container_width=True)
+            
+            duplicate = find_duplicate_name(family.get_portfolio(), edit_name, exclude_id=asset_id) if save else None
+            if duplicate:
+                st.error(f"Another holding is already named **{duplicate['name']}**. Please use a distinct name.")
+            elif save:
+                with family.update() as portfolio:
+                    update_asset(portfolio, asset_id, edit_name, edit_value, edit_type, edit_symbol, edit_description)
+                st.session_state.editing_asset_id = None
+                invalidate_heir_content(asset_id)
+                st.success(f"✅ Updated {edit_name}!")
+                st.rerun()
+            elif cancel_edit:
+                st.session_state.editing_asset_id = None
+                st.rerun(scope="fragment")
+    
+    st.markdown("---")
+
+
+def fill_asset_from_catalog():
+    """Copy the chosen catalog entry into the Add Asset form fields"""
+    entry = st.session_state.get("ticker_choice")
+    if not entry:
+        return
+    st.session_state.new_asset_name = entry['name']
+    st.session_state.new_asset_symbol = entry['symbol']
+    st.session_state.new_asset_description = entry['description']
+    if entry['type'] in ASSET_TYPES:
+        st.session_state.new_asset_type = entry['type']
+
+
+def render_ticker_lookup():
+    """Symbol/name lookup against the shared ticker catalog"""
+    catalog = get_ticker_catalog()
+    if catalog is None:
+        return
+    lookup = st.text_input(
+        "🔎 Look up a security", key="ticker_lookup",
+        placeholder=f"Symbol or company name ({len(catalog):,} securities)"
+    )
+    if not lookup:
+        return
+    suggestions = catalog.search(lookup, limit=TICKER_SUGGESTIONS)
+    if not suggestions:
+        st.caption(f"No securities match \"{lookup}\".")
+        return
+    st.selectbox(
+        "Matches", suggestions, index=None, key="ticker_choice",
+        format_func=lambda entry: f"{entry['symbol']} · {entry['name']} ({entry['type']})",
+        placeholder="Choose a security to fill in the form",
+        on_change=fill_asset_from_catalog
+    )
+
+
+@st.fragment
+def render_portfolio_history(family):
+    """Portfolio as of a past date and one asset's value over time"""
+    with st.expander("📈 Portfolio History", expanded=False):
+        col_date, col_asset = st.columns(2)
+        
+        with col_date:
+            as_of_date = st.date_input("Portfolio as of", value=datetime.now().date(), key="history_as_of")
+            end_of_day = datetime.combine(as_of_date, datetime.max.time()).timestamp()
+            past_portfolio = family.history.as_of(int(end_of_day))
+            if past_portfolio is None:
+                st.caption("No changes recorded yet.")
+            else:
+                st.metric("Total Value", format_currency(get_total_portfolio_value(past_portfolio)))
+                for asset in past_portfolio:
+                    st.caption(f"{asset['name']}: {format_currency(asset['value'])}")
+        
+        with col_asset:
+            portfolio = family.get_portfolio()
+            if portfolio:
+                asset = st.selectbox(
+                    "Value over time", portfolio,
+                    format_func=lambda a: a['name'], key="history_asset"
+                )
+                times, values = family.history.value_series(asset['id'])
+                if len(times):
+                    st.line_chart({
+                        'Date': [datetime.fromtimestamp(t) for t in times.tolist()],
+                        'Value': values.tolist(),
+                    }, x='Date', y='Value')
+                else:
+                    st.caption("No value changes recorded for this asset.")
+
+
 def primary_client_view():
     """View for the Primary Client (Arthur) - Family Mission Builder"""
     render_user_header('primary')
     
     st.markdown("---")
     
-    # Get portfolio from session state
-    portfolio = st.session_state.portfolio
+    # Get portfolio from the shared family state
+    family = get_current_family()
+    portfolio = family.get_portfolio()
     
     # Portfolio Overview
     st.markdown("### 💰 Portfolio Overview")
@@ -163,18 +382,22 @@ def primary_client_view():
     # Add Asset Form
     if st.session_state.show_add_asset:
         with st.expander("📝 Add New Asset", expanded=True):
+            render_ticker_lookup()
+            
             with st.form("add_asset_form"):
                 st.markdown("#### New Asset Details")
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    new_name = st.text_input("Asset Name*", placeholder="e.g., Tesla Inc")
+                    new_name = st.text_input("Asset Name*", placeholder="e.g., Tesla Inc", key="new_asset_name")
                     new_value = st.number_input("Value ($)*", min_value=0, value=100000, step=10000)
                 with col2:
-                    new_type = st.selectbox("Asset Type*", ASSET_TYPES)
-                    new_symbol = st.text_input("Symbol (optional)", placeholder="e.g., TSLA")
+                    new_type = st.selectbox("Asset Type*", ASSET_TYPES, key="new_asset_type")
+                    new_symbol = st.text_input("Symbol (optional)", placeholder="e.g., TSLA", key="new_asset_symbol")
                 
-                new_description = st.text_area("Description", placeholder="Brief description of this asset...")
+                new_description = st.text_area(
+                    "Description", placeholder="Brief description of this asset...", key="new_asset_description"
+                )
                 
                 col_submit, col_cancel = st.columns(2)
                 with col_submit:
@@ -182,10 +405,17 @@ def primary_client_view():
                 with col_cancel:
                     cancel = st.form_submit_button("❌ Cancel", use_container_width=True)
                 
-                if submit and new_name:
-                    add_asset(portfolio, new_name, new_value, new_type, new_symbol, new_description)
+                duplicate = find_duplicate_name(family.get_portfolio(), new_name) if submit and new_name else None
+                if duplicate:
+                    st.error(
+                        f"**{duplicate['name']}** is already in the portfolio. "
+                        "Edit that holding instead, or use a distinct name (e.g. add the account)."
+                    )
+                elif submit and new_name:
+                    with family.update() as portfolio:
+                        new_asset = add_asset(portfolio, new_name, new_value, new_type, new_symbol, new_description)
                     st.session_state.show_add_asset = False
-                    st.session_state.heir_content_cache = {}  # Clear cache for new asset
+                    invalidate_heir_content(new_asset['id'])  # Drop stale content for a reused id
                     st.success(f"✅ Added {new_name} to portfolio!")
                     st.rerun()
                 elif cancel:
@@ -195,72 +425,40 @@ def primary_client_view():
     # Display Assets with Edit/Delete
     st.markdown("### Current Holdings")
     
-    for asset in portfolio:
-        asset_id = asset.get('id', 0)
-        
-        with st.container():
-            # Asset display row
-            col_info, col_value, col_actions = st.columns([3, 2, 2])
-            
-            with col_info:
-                type_emoji = {'Equities': '📈', 'Index Fund': '📊', 'Bonds': '💵', 'Real Estate': '🏠', 
-                             'Cryptocurrency': '🪙', 'Private Equity': '🏢', 'Cash/Savings': '💰', 'Alternative Investments': '💎'}
-                emoji = type_emoji.get(asset['type'], '📦')
-                st.markdown(f"**{emoji} {asset['name']}**")
-                st.caption(f"{asset['type']} {f'({asset.get("symbol", "")})' if asset.get('symbol') else ''}")
-            
-            with col_value:
-                st.markdown(f"### {format_currency(asset['value'])}")
-            
-            with col_actions:
-                col_edit, col_delete = st.columns(2)
-                with col_edit:
-                    if st.button("✏️", key=f"edit_{asset_id}", help="Edit asset"):
-                        st.session_state.editing_asset_id = asset_id
-                        st.session_state.show_add_asset = False
-                with col_delete:
-                    if st.button("🗑️", key=f"delete_{asset_id}", help="Delete asset"):
-                        delete_asset(portfolio, asset_id)
-                        st.session_state.heir_content_cache = {}
-                        st.success(f"Deleted {asset['name']}")
-                        st.rerun()
-        
-        # Edit Form (inline)
-        if st.session_state.editing_asset_id == asset_id:
-            with st.form(f"edit_form_{asset_id}"):
-                st.markdown("#### Edit Asset")
-                col1, col2 = st.columns(2)
-                with col1:
-                    edit_name = st.text_input("Name", value=asset['name'])
-                    edit_value = st.number_input("Value ($)", value=asset['value'], min_value=0, step=10000)
-                with col2:
-                    type_index = ASSET_TYPES.index(asset['type']) if asset['type'] in ASSET_TYPES else 0
-                    edit_type = st.selectbox("Type", ASSET_TYPES, index=type_index)
-                    edit_symbol = st.text_input("Symbol", value=asset.get('symbol', ''))
-                
-                edit_description = st.text_area("Description", value=asset.get('description', ''))
-                
-                col_save, col_cancel = st.columns(2)
-                with col_save:
-                    save = st.form_submit_button("💾 Save", use_container_width=True)
-                with col_cancel:
-                    cancel_edit = st.form_submit_button("❌ Cancel", use_container_width=True)
-                
-                if save:
-                    update_asset(portfolio, asset_id, edit_name, edit_value, edit_type, edit_symbol, edit_description)
-                    st.session_state.editing_asset_id = None
-                    st.session_state.heir_content_cache = {}
-                    st.success(f"✅ Updated {edit_name}!")
-                    st.rerun()
-                elif cancel_edit:
-                    st.session_state.editing_asset_id = None
-                    st.rerun()
-        
-        st.markdown("---")
+    query = st.text_input(
+        "🔍 Search holdings", key="holdings_search",
+        placeholder="Name, symbol, type or description"
+    )
+    holdings = family.search_holdings(query) if query else portfolio
+    if query and not holdings:
+        st.caption(f"No holdings match \"{query}\".")
+    
+    for asset in holdings:
+        render_holding_row(asset)
+    
+    render_portfolio_history(family)
     
     st.markdown("---")
     
-    # Family Mission Builder
+    render_mission_builder(family)
+
+
+def autosave_mission_draft():
+    """Keep the edited mission-builder inputs and stage them for saving"""
+    st.session_state.family_values = st.session_state.values_input
+    st.session_state.family_goals = st.session_state.goals_input
+    get_draft_writer().stage(get_current_family(), st.session_state.family_values, st.session_state.family_goals)
+
+
+@st.fragment
+def render_mission_builder(family):
+    """
+    Render the Family Mission Builder.
+    
+    Runs as a fragment so editing the values and goals only reruns the
+    builder; edits are autosaved to the family (see DraftWriter). Starting
+    a generation reruns the whole page so the job gets watched.
+    """
     st.markdown("## 📜 Family Mission Builder")
     st.markdown("*Define what wealth means to your family and create a lasting legacy statement.*")
     
@@ -273,9 +471,9 @@ def primary_client_view():
             value=st.session_state.family_values,
             placeholder="e.g., Hard work, education, philanthropy, family unity, integrity...",
             height=150,
-            key="values_input"
+            key="values_input",
+            on_change=autosave_mission_draft
         )
-        st.session_state.family_values = values
     
     with col2:
         st.markdown("#### Vision for Family Wealth")
@@ -284,25 +482,38 @@ def primary_client_view():
             value=st.session_state.family_goals,
             placeholder="e.g., Keep the family together, fund grandchildren's education, support charitable causes...",
             height=150,
-            key="goals_input"
+            key="goals_input",
+            on_change=autosave_mission_draft
         )
-        st.session_state.family_goals = goals
     
-    st.markdown("")
+    if get_draft_writer().pending(family.family_id):
+        st.caption("💾 Saving draft...")
+    elif family.mission_draft:
+        saved_at = datetime.fromtimestamp(family.mission_draft['saved_at'])
+        st.caption(f"💾 Draft saved at {saved_at.strftime('%H:%M')}")
     
     # Generate Mission Statement
     if st.button("✨ Draft Family Constitution", use_container_width=True):
         if not values.strip() or not goals.strip():
             st.error("Please fill in both your values and goals to generate a mission statement.")
         else:
-            with st.spinner("Crafting your family's mission statement..."):
-                statement = generate_mission_statement(values, goals)
-                st.session_state.mission_statement = statement
+            get_draft_writer().flush(family.family_id)
+            api_key = get_job_api_key()
+            start_background_job(
+                MISSION_JOB,
+                mission_job_key('mission', family.family_id, values, goals, api_key),
+                draft_family_constitution, family.family_id, values, goals, api_key
+            )
+            st.rerun()
+    
+    if MISSION_JOB in st.session_state.background_jobs:
+        if collect_background_job(MISSION_JOB) is None:
+            st.info("✍️ Crafting your family's mission statement... Feel free to keep browsing - it will be saved when ready.")
     
     # Display Mission Statement
-    if st.session_state.mission_statement:
+    if family.mission_statement:
         st.markdown("---")
-        render_mission_statement(st.session_state.mission_statement)
+        render_mission_statement(family.mission_statement)
         
         # Action buttons
         col1, col2 = st.columns(2)
@@ -311,71 +522,294 @@ def primary_client_view():
                 st.toast("Mission statement ready to copy!")
         with col2:
             if st.button("🔄 Regenerate", use_container_width=True):
-                with st.spinner("Regenerating..."):
-                    statement = generate_mission_statement(
-                        st.session_state.family_values,
-                        st.session_state.family_goals
-                    )
-                    st.session_state.mission_statement = statement
-                    st.rerun()
+                start_candidates_job(family, refresh=False)
+                st.rerun()
+        
+        render_mission_candidates(family)
+
+
+def mission_job_key(kind: str, family_id: str, values: str, goals: str, api_key: str) -> str:
+    """Scheduler key shared by every request for the same mission-builder work"""
+    digest = hashlib.sha256(f"{normalize_text(values)}\n{normalize_text(goals)}".encode('utf-8')).hexdigest()
+    return f"{kind}:{family_id}:{api_key_mode(api_key)}:{digest}"
+
+
+def draft_family_constitution(family_id: str, values: str, goals: str, api_key: str) -> str:
+    """Background job: generate the mission statement and save it to the family"""
+    statement = generate_mission_statement(values, goals, api_key)
+    get_family_state(family_id).set_mission_statement(statement)
+    return statement
+
+
+def start_candidates_job(family, refresh: bool):
+    """Start drafting alternative mission statements in the background"""
+    values = st.session_state.family_values
+    goals = st.session_state.family_goals
+    kind = 'mission_candidates_refresh' if refresh else 'mission_candidates'
+    api_key = get_job_api_key()
+    start_background_job(
+        CANDIDATES_JOB,
+        mission_job_key(kind, family.family_id, values, goals, api_key),
+        generate_mission_statement_candidates,
+        values, goals, MISSION_CANDIDATE_COUNT, refresh, api_key
+    )
+
+
+def render_mission_candidates(family):
+    """Show alternative mission statement drafts side by side to pick from"""
+    if CANDIDATES_JOB in st.session_state.background_jobs:
+        result = collect_background_job(CANDIDATES_JOB)
+        if result is None:
+            st.info(f"🗂️ Drafting {MISSION_CANDIDATE_COUNT} alternatives in the background...")
+        else:
+            # A failed job comes back as one error string; never offer it as a draft
+            drafts = [d for d in (result if isinstance(result, list) else [result]) if is_usable_response(d)]
+            if drafts:
+                family.set_mission_candidates(drafts)
+            else:
+                st.warning("⚠️ Couldn't draft alternatives right now. Please try again in a moment.")
+    
+    candidates = family.mission_candidates
+    if not candidates:
+        return
+    
+    st.markdown("#### 🗂️ Pick a Draft")
+    columns = st.columns(len(candidates))
+    for i, (column, candidate) in enumerate(zip(columns, candidates)):
+        with column:
+            with st.container(border=True):
+                st.markdown(candidate)
+            if st.button("✅ Use this draft", key=f"use_candidate_{i}", use_container_width=True):
+                family.set_mission_statement(candidate)
+                family.set_mission_candidates([])
+                st.rerun()
+    
+    col_new, col_dismiss = st.columns(2)
+    with col_new:
+        if st.button("🎲 Draft New Options", use_container_width=True):
+            start_candidates_job(family, refresh=True)
+            family.set_mission_candidates([])
+            st.rerun()
+    with col_dismiss:
+        if st.button("❌ Keep Current Statement", use_container_width=True):
+            family.set_mission_candidates([])
+            st.rerun()
+
+
+def prewarm_heir_feeds(family, portfolio, current_heir_id: str, api_key: str):
+    """
+    Queue the rest of the family's (heir x asset) matrix behind the visible cards.
+    
+    Runs once per portfolio version per session; the scheduler drops jobs
+    whose prompt is already queued, so heirs with matching profiles share work.
+    """
+    if st.session_state.get('prewarmed_version') == family.version:
+        return
+    st.session_state.prewarmed_version = family.version
+    
+    scheduler = get_scheduler()
+    online_ids = family.get_online_heir_ids() | {current_heir_id}
+    for heir in get_family_heirs(family.family_id):
+        priority = generation_priority(heir['id'] in online_ids, card_visible=False)
+        for asset in portfolio:
+            submit_heir_content(scheduler, asset, heir, priority, api_key)
 
 
 def heir_view():
     """View for the Heir (Leo) - Learning Feed with Legacy Cards"""
-    render_user_header('heir')
+    family = get_current_family()
+    heirs = get_family_heirs(family.family_id)
+    
+    # Let families with several heirs pick whose feed to show
+    if len(heirs) > 1:
+        heir_names = [heir['name'] for heir in heirs]
+        selected_name = st.selectbox("👤 Viewing as", heir_names, key="heir_selector")
+        heir_profile = heirs[heir_names.index(selected_name)]
+    else:
+        heir_profile = heirs[0]
+    family.mark_online(heir_profile['id'])
+    
+    render_user_header('heir', heir_profile)
     
     st.markdown("---")
     
     # Show family mission if available
-    if st.session_state.mission_statement:
+    if family.mission_statement:
         with st.expander("📜 Your Family's Mission Statement", expanded=False):
-            st.markdown(st.session_state.mission_statement)
+            st.markdown(family.mission_statement)
     
     # Header
     st.markdown("## 🎯 Your Legacy Portfolio")
     st.markdown("*Discover the investments your family has built for generations. Tap to learn more!*")
     
-    # Portfolio Value Teaser
-    portfolio = st.session_state.portfolio
+    # Portfolio Value Teaser, with a growth projection over the chosen horizon
+    portfolio_version = family.portfolio_version
+    portfolio = family.get_portfolio()
     total_value = get_total_portfolio_value(portfolio)
-    st.info(f"💎 **Total Family Portfolio:** {format_currency(total_value)}")
+    years = st.select_slider(
+        "🔮 Project ahead", options=PROJECTION_HORIZONS, value=PROJECTION_HORIZONS[-1],
+        format_func=lambda y: f"{y} years", key="projection_years"
+    )
+    projection = project_portfolio(family.family_id, portfolio_version, years, portfolio)
+    low, median, high = projection['total'][:, -1]
+    st.info(
+        f"💎 **Total Family Portfolio:** {format_currency(total_value)} · "
+        f"🔮 **In {years} years:** ~{format_currency(approximate_value(median))} "
+        f"(likely {format_currency(approximate_value(low))} – {format_currency(approximate_value(high))})"
+    )
+    st.caption("Projections are simulated from typical returns for each asset type, not a forecast.")
     
     st.markdown("---")
     
-    # Display Legacy Cards
-    heir_profile = USERS['heir']
+    # Generate missing explanations for the visible cards first, in the
+    # background. The session cache remembers which prompt each card was
+    # generated from, so only cards whose prompt changed (e.g. a material
+    # revaluation) are regenerated; until then they keep their old text.
+    query = st.text_input("🔍 Search your family's assets", key="heir_search", placeholder="e.g. tech, real estate")
+    if query:
+        visible_assets = family.search_holdings(query, limit=HEIR_FEED_SIZE)
+        if not visible_assets:
+            st.caption(f"No assets match \"{query}\".")
+    else:
+        visible_assets = family.rank_holdings_for(heir_profile, HEIR_FEED_SIZE)
+    content_cache = st.session_state.heir_content_cache
+    jobs = st.session_state.background_jobs
+    api_key = get_job_api_key()
+    
+    for asset in visible_assets:
+        cache_key = (heir_profile['id'], asset['id'])
+        prompt = build_heir_prompt(asset, heir_profile)
+        prompt_key = generation_key(prompt, api_key)
+        if content_cache.get(cache_key, (None,))[0] == prompt_key:
+            continue
+        # Pre-generated (or shared) cards render now; only misses become jobs
+        cached = get_cached_response(prompt, 'heir_content', api_key)
+        if cached is not None:
+            content_cache[cache_key] = (prompt_key, cached)
+            continue
+        job_name = ('heir_content', prompt_key)
+        if job_name not in jobs:
+            jobs[job_name] = submit_heir_content(get_scheduler(), asset, heir_profile, PRIORITY_VISIBLE, api_key)
+        content = collect_background_job(job_name)
+        if content is not None:
+            content_cache[cache_key] = (prompt_key, content)
+    prewarm_heir_feeds(family, portfolio, heir_profile['id'], api_key)
     
-    for i, asset in enumerate(portfolio[:5]):  # Show top 5 assets
-        asset_name = asset['name']
-        
-        # Check cache for AI content
-        if asset_name not in st.session_state.heir_content_cache:
-            if is_simulation_mode():
-                # In simulation mode, generate content immediately
-                content = generate_heir_content(asset, heir_profile)
-                st.session_state.heir_content_cache[asset_name] = content
-            else:
-                # With API, also generate (could add lazy loading later)
-                content = generate_heir_content(asset, heir_profile)
-                st.session_state.heir_content_cache[asset_name] = content
-        
-        explanation = st.session_state.heir_content_cache.get(
-            asset_name,
-            "Loading explanation..."
+    # Display Legacy Cards
+    for asset in visible_assets:
+        _, explanation = content_cache.get(
+            (heir_profile['id'], asset['id']),
+            (None, "✨ Personalizing this card for you...")
+        )
+        bands = projection['assets'].get(asset['id'])
+        render_legacy_card(
+            asset, explanation, show_action=True, heir=heir_profile,
+            projection=(years, *bands) if bands else None
         )
-        
-        render_legacy_card(asset, explanation, show_action=True)
     
     # Engagement Summary
-    if st.session_state.engagement_logs:
+    analytics = get_engagement_analytics()
+    analytics.refresh([family.family_id])
+    explored = analytics.summary(family.family_id)['heirs'].get(heir_profile['name'], {}).get('interactions', 0)
+    if explored:
         st.markdown("---")
-        st.success(f"🎉 You've explored {len(st.session_state.engagement_logs)} asset(s)! Sarah will be in touch.")
+        st.success(f"🎉 You've explored {explored} asset(s)! Sarah will be in touch.")
+
+
+@st.fragment(run_every=ADVISOR_POLL_SECONDS)
+def watch_family_activity(rendered_version: int):
+    """
+    Poll the shared family version and rerun the page once it moves.
+    
+    Each tick only compares an integer, so an idle dashboard stays cheap;
+    metrics and the activity feed are re-queried only after a change.
+    """
+    if get_current_family().version != rendered_version:
+        st.rerun()
+
+
+def render_engagement_analytics(summary: dict):
+    """Interest heatmap, activity over time and per-heir engagement"""
+    col_title, col_window = st.columns([3, 1])
+    with col_title:
+        st.markdown("### 📈 Engagement Analytics")
+    with col_window:
+        st.selectbox("Window", list(ANALYTICS_WINDOWS), index=1, key="analytics_window", label_visibility="collapsed")
+    
+    if not summary['interactions']:
+        st.caption("Analytics appear once heirs start exploring assets.")
+        return
+    
+    col_heirs, col_activity = st.columns(2)
+    
+    with col_heirs:
+        st.markdown("#### Heirs")
+        st.dataframe([
+            {
+                'Heir': heir,
+                'Score': f"{stats['score']}%",
+                'Interactions': stats['interactions'],
+                'In Window': stats['window_interactions'],
+                'Last Seen': format_elapsed(stats['last_seen_seconds']),
+            }
+            for heir, stats in summary['heirs'].items()
+        ], hide_index=True, use_container_width=True)
+        if summary['top_assets']:
+            st.caption("Trending: " + ", ".join(name for name, _ in summary['top_assets']))
+    
+    with col_activity:
+        st.markdown(f"#### Activity ({summary['window_interactions']} in window)")
+        st.bar_chart(summary['activity'])
+    
+    if summary['heatmap']:
+        st.markdown("#### Interest by Asset Type")
+        st.dataframe([
+            {'Heir': heir, **counts} for heir, counts in summary['heatmap'].items()
+        ], hide_index=True, use_container_width=True)
+
+
+@st.fragment
+def render_export_panel(family):
+    """Download engagement history and email drafts for compliance"""
+    with st.expander("📤 Compliance Export", expanded=False):
+        total = family.count_engagement_logs() + family.count_email_drafts()
+        st.caption(f"{total} engagement event(s) and email draft(s) on record.")
+        fmt = st.selectbox("Format", list(EXPORT_FORMATS), format_func=str.upper, key="export_format")
+        
+        if total > APP_EXPORT_MAX_EVENTS:
+            st.info(
+                "This history is too large to download from the browser. Export it with:\n\n"
+                f"`python export.py --family {family.family_id} --format {fmt} "
+                f"--output {export_filename(family.family_id, fmt)}`"
+            )
+        elif st.button("Prepare Export", key="prepare_export"):
+            st.download_button(
+                "⬇️ Download",
+                data="".join(export_stream(family, fmt)),
+                file_name=export_filename(family.family_id, fmt),
+                mime=EXPORT_FORMATS[fmt][0]
+            )
+
+
+def format_elapsed(seconds: int) -> str:
+    """Short human-readable age, e.g. '5m ago'"""
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds // 60}m ago"
+    if seconds < 86400:
+        return f"{seconds // 3600}h ago"
+    return f"{seconds // 86400}d ago"
 
 
 def advisor_view():
     """View for the Advisor (Sarah) - Pulse Dashboard"""
     render_user_header('advisor')
     
+    # Read the version before any data so a concurrent update causes a rerun
+    family = get_current_family()
+    watch_family_activity(family.version)
+    
     st.markdown("---")
     
     # Dashboard Header
@@ -385,28 +819,30 @@ def advisor_view():
     # Metrics Row
     col1, col2, col3, col4 = st.columns(4)
     
-    logs = st.session_state.engagement_logs
+    analytics = get_engagement_analytics()
+    analytics.refresh([family.family_id])
+    window_label = st.session_state.get('analytics_window', 'Last 30 days')
+    summary = analytics.summary(family.family_id, ANALYTICS_WINDOWS[window_label])
     
     with col1:
         render_metric_card(
             "Total Interactions",
-            str(len(logs)),
-            "Active" if logs else None,
+            str(summary['interactions']),
+            "Active" if summary['interactions'] else None,
             "#4CAF50"
         )
     
     with col2:
-        unique_assets = len(set(log['asset'] for log in logs)) if logs else 0
         render_metric_card(
             "Assets Explored",
-            str(unique_assets),
+            str(summary['assets_explored']),
             None,
             "#2196F3"
         )
     
     with col3:
-        # Calculate engagement score (simple formula for prototype)
-        score = min(100, len(logs) * 20) if logs else 0
+        # Recent interactions count more; see analytics.engagement_score
+        score = summary['engagement_score']
         render_metric_card(
             "Engagement Score",
             f"{score}%",
@@ -425,33 +861,52 @@ def advisor_view():
     
     st.markdown("---")
     
-    # Engagement Feed
+    render_engagement_analytics(summary)
+    
+    st.markdown("---")
+    
+    # Engagement Feed (only the newest events are read; totals come from analytics)
     st.markdown("### 🔔 Recent Activity Feed")
     
-    if not logs:
+    total_logs = family.count_engagement_logs()
+    if not total_logs:
         st.info("📭 No engagement activity yet. Leo hasn't explored any assets.")
         st.markdown("*Tip: Switch to Leo's view and click 'Ask Advisor' on some assets to see activity here.*")
     else:
-        for log in reversed(logs):  # Show most recent first
+        shown = st.session_state.get('activity_feed_limit', ACTIVITY_FEED_PAGE_SIZE)
+        first = max(0, total_logs - shown)
+        logs = family.get_engagement_logs(start=first)
+        for position, log in reversed(list(enumerate(logs, start=first))):  # Show most recent first
             render_engagement_log(log)
             
-            # Add email draft button
+            # Add email draft button (keyed by position: timestamps can collide)
             asset_name = log['asset']
-            if st.button(f"✉️ Draft Email about {asset_name}", key=f"email_{log['timestamp']}"):
+            if st.button(f"✉️ Draft Email about {asset_name}", key=f"email_{position}"):
+                heir_name = log.get('heir', USERS['heir']['name'])
                 with st.spinner("Drafting personalized email..."):
-                    email = generate_advisor_email(
-                        asset_name,
-                        USERS['heir']['name'],
-                        USERS['primary']['name']
-                    )
+                    email = generate_advisor_email(asset_name, heir_name, USERS['primary']['name'])
+                family.log_email_draft({
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'heir': heir_name,
+                    'asset': asset_name,
+                    'email': email
+                })
                 
                 st.markdown("#### 📧 Draft Email")
                 st.text_area(
                     "Edit and send:",
                     value=email,
                     height=200,
-                    key=f"email_content_{log['timestamp']}"
+                    key=f"email_content_{position}"
                 )
+        
+        if first > 0:
+            st.caption(f"Showing the latest {total_logs - first} of {total_logs} events.")
+            if st.button("⬇️ Show older activity", key="activity_feed_more"):
+                st.session_state.activity_feed_limit = shown + ACTIVITY_FEED_PAGE_SIZE
+                st.rerun()
+    
+    render_export_panel(family)
     
     st.markdown("---")
     
@@ -470,21 +925,23 @@ def advisor_view():
         """)
     
     with col2:
-        st.markdown("#### Heir")
-        heir = USERS['heir']
-        st.markdown(f"""
-        **{heir['avatar']} {heir['name']}**  
-        Age: {heir['age']}  
-        Interests: {', '.join(heir['interests'])}  
-        Financial Literacy: {heir['fin_lit_level']}
-        """)
+        st.markdown("#### Heirs")
+        online_ids = family.get_online_heir_ids()
+        for heir in get_family_heirs(family.family_id):
+            status = "🟢 Online" if heir['id'] in online_ids else "⚪ Offline"
+            st.markdown(f"""
+            **{heir['avatar']} {heir['name']}** · {status}  
+            Age: {heir['age']}  
+            Interests: {', '.join(heir['interests'])}  
+            Financial Literacy: {heir['fin_lit_level']}
+            """)
     
     # Mission Statement (if exists)
-    if st.session_state.mission_statement:
+    if family.mission_statement:
         st.markdown("---")
         st.markdown("### 📜 Family Mission Statement")
         with st.expander("View Statement", expanded=False):
-            st.markdown(st.session_state.mission_statement)
+            st.markdown(family.mission_statement)
 
 
 def main():
@@ -503,6 +960,9 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Jobs still running before this run; see watch_background_jobs
+    waiting_jobs = unfinished_job_names()
+    
     # Route to appropriate view
     current_role = st.session_state.current_role
     
@@ -514,6 +974,14 @@ def main():
         advisor_view()
     else:
         st.error("Unknown role selected")
+    
+    # Poll until background generation finishes, then rerun to show it.
+    # Also watch jobs that finished during this run but were not collected.
+    jobs = st.session_state.background_jobs
+    watched = waiting_jobs | unfinished_job_names()
+    watched = tuple(name for name in jobs if name in watched)
+    if watched:
+        watch_background_jobs(watched)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,323 @@
+# LegacyLoop - Ticker Catalog
+# Read-only securities reference (symbol -> name, type, description) in a
+# compact binary file that every process memory-maps, with prefix lookup
+#
+# Usage:
+#   python catalog.py build tickers.csv                 # -> <tmp>/legacyloop/ticker_catalog.bin
+#   python catalog.py build securities.csv --output /shared/ticker_catalog.bin
+#   python catalog.py search app
+
+import argparse
+import csv
+import mmap
+import os
+import struct
+import tempfile
+
+import streamlit as st
+
+# File identifier (format version in the last bytes)
+CATALOG_MAGIC = b'LLCAT\x00\x00\x01'
+
+# magic, record count, then offsets of the types table, records, name index and strings
+HEADER = struct.Struct('<8sIIIII')
+
+# symbol, type code, name offset/length, description offset/length;
+# records are sorted by symbol
+RECORD = struct.Struct('<12sBIHIH')
+
+# Entries of the name index: record numbers sorted by lowercase name
+NAME_INDEX_ENTRY = struct.Struct('<I')
+
+# Longest symbol the fixed-size record can hold
+MAX_SYMBOL_LENGTH = 12
+
+# Catalog file (override with LEGACYLOOP_CATALOG_PATH). The default lives
+# in a cache directory, not the app directory, which may be read-only
+CATALOG_CACHE_DIR = os.path.join(tempfile.gettempdir(), "legacyloop")
+DEFAULT_CATALOG_PATH = os.path.join(CATALOG_CACHE_DIR, "ticker_catalog.bin")
+
+# Bundled sample the default catalog is built from (a small seed: build a
+# full catalog from a securities master with `catalog.py build`)
+SEED_CATALOG_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tickers.csv")
+
+# Suggestions returned per lookup
+DEFAULT_SUGGESTIONS = 10
+
+
+def catalog_entries(rows) -> dict:
+    """
+    Symbol -> (name, type, description) from dicts with those keys.
+
+    Later rows win for duplicate symbols; symbols that are not ASCII or
+    longer than MAX_SYMBOL_LENGTH are skipped.
+    """
+    entries = {}
+    for row in rows:
+        symbol = (row.get('symbol') or '').strip().upper()
+        if not symbol or len(symbol.encode('ascii', 'ignore')) != len(symbol) or len(symbol) > MAX_SYMBOL_LENGTH:
+            continue
+        entries[symbol] = (
+            (row.get('name') or symbol).strip(),
+            (row.get('type') or '').strip(),
+            (row.get('description') or '').strip(),
+        )
+    return entries
+
+
+def _utf8_prefix(text: str, limit: int) -> bytes:
+    """UTF-8 encoding of `text` cut to at most `limit` bytes on a character boundary"""
+    return text.encode('utf-8')[:limit].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def build_catalog(rows, path: str) -> int:
+    """
+    Write a catalog file from dicts with symbol, name, type and description.
+
+    The file is written next to its destination and renamed into place, so
+    processes that already mapped the old file keep reading it safely.
+    Returns the number of records.
+    """
+    entries = catalog_entries(rows)
+
+    symbols = sorted(entries)
+    types = sorted({entry[1] for entry in entries.values()})
+    type_codes = {t: i for i, t in enumerate(types)}
+
+    types_table = bytearray([len(types)])
+    for t in types:
+        encoded = t.encode('utf-8')
+        types_table += bytes([len(encoded)]) + encoded
+
+    records = bytearray()
+    strings = bytearray()
+    for symbol in symbols:
+        name, asset_type, description = entries[symbol]
+        name_bytes = _utf8_prefix(name, 0xFFFF)
+        desc_bytes = _utf8_prefix(description, 0xFFFF)
+        records += RECORD.pack(
+            symbol.encode('ascii'), type_codes[asset_type],
+            len(strings), len(name_bytes), len(strings) + len(name_bytes), len(desc_bytes)
+        )
+        strings += name_bytes + desc_bytes
+
+    by_name = sorted(range(len(symbols)), key=lambda i: entries[symbols[i]][0].lower())
+    name_index = b''.join(NAME_INDEX_ENTRY.pack(i) for i in by_name)
+
+    types_offset = HEADER.size
+    records_offset = types_offset + len(types_table)
+    names_offset = records_offset + len(records)
+    strings_offset = names_offset + len(name_index)
+    header = HEADER.pack(CATALOG_MAGIC, len(symbols), types_offset, records_offset, names_offset, strings_offset)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header + types_table + records + name_index + strings)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(symbols)
+
+
+def read_catalog_csv(path: str):
+    """Yield rows of a `symbol,name,type,description` CSV file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+class _CatalogSearch:
+    """
+    Lookup and prefix search over records sorted by symbol plus a
+    by-name order. Subclasses provide `count`, `entry`, `_symbol`, `_name`
+    and `_name_record`.
+    """
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def _lower_bound(count: int, key, target) -> int:
+        """First position in [0, count) whose key is >= target"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, symbol: str):
+        """Exact symbol lookup (None if unknown)"""
+        symbol = symbol.strip().upper()
+        i = self._lower_bound(self.count, self._symbol, symbol)
+        if i < self.count and self._symbol(i) == symbol:
+            return self.entry(i)
+        return None
+
+    def search(self, prefix: str, limit: int = DEFAULT_SUGGESTIONS) -> list:
+        """Entries whose symbol, then whose name, starts with `prefix`"""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        found = []
+
+        symbol_prefix = prefix.upper()
+        i = self._lower_bound(self.count, self._symbol, symbol_prefix)
+        while i < self.count and len(found) < limit and self._symbol(i).startswith(symbol_prefix):
+            found.append(i)
+            i += 1
+
+        name_prefix = prefix.lower()
+        position = self._lower_bound(self.count, lambda p: self._name(self._name_record(p)).lower(), name_prefix)
+        while position < self.count and len(found) < limit:
+            i = self._name_record(position)
+            if not self._name(i).lower().startswith(name_prefix):
+                break
+            if i not in found:
+                found.append(i)
+            position += 1
+
+        return [self.entry(i) for i in found]
+
+
+class TickerCatalog(_CatalogSearch):
+    """
+    Memory-mapped view of a catalog file.
+
+    Nothing is loaded up front: lookups binary-search the mapped records,
+    so the OS page cache holds a single copy shared by every process on
+    the host.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, types_offset, self._records, self._names, self._strings = HEADER.unpack_from(self._map, 0)
+        if magic != CATALOG_MAGIC:
+            raise ValueError(f"{path} is not a ticker catalog")
+
+        self.types = []
+        position = types_offset + 1
+        for _ in range(self._map[types_offset]):
+            length = self._map[position]
+            self.types.append(self._map[position + 1:position + 1 + length].decode('utf-8'))
+            position += 1 + length
+
+    def _record(self, i: int) -> tuple:
+        return RECORD.unpack_from(self._map, self._records + i * RECORD.size)
+
+    def _symbol(self, i: int) -> str:
+        return self._record(i)[0].rstrip(b'\x00').decode('ascii')
+
+    def _name(self, i: int) -> str:
+        _, _, offset, length, _, _ = self._record(i)
+        start = self._strings + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def _name_record(self, position: int) -> int:
+        return NAME_INDEX_ENTRY.unpack_from(self._map, self._names + position * NAME_INDEX_ENTRY.size)[0]
+
+    def entry(self, i: int) -> dict:
+        """Record `i` as symbol, name, type and description"""
+        symbol, type_code, name_offset, name_length, desc_offset, desc_length = self._record(i)
+        return {
+            'symbol': symbol.rstrip(b'\x00').decode('ascii'),
+            'name': self._map[self._strings + name_offset:self._strings + name_offset + name_length].decode('utf-8'),
+            'type': self.types[type_code],
+            'description': self._map[self._strings + desc_offset:self._strings + desc_offset + desc_length].decode('utf-8'),
+        }
+
+
+class ListCatalog(_CatalogSearch):
+    """In-memory catalog, used when the catalog file cannot be written"""
+
+    def __init__(self, rows):
+        entries = catalog_entries(rows)
+        self._entries = [
+            {'symbol': symbol, 'name': name, 'type': asset_type, 'description': description}
+            for symbol, (name, asset_type, description) in sorted(entries.items())
+        ]
+        self.count = len(self._entries)
+        self.types = sorted({entry['type'] for entry in self._entries})
+        self._by_name = sorted(range(self.count), key=lambda i: self._entries[i]['name'].lower())
+
+    def entry(self, i: int) -> dict:
+        """Record `i` as symbol, name, type and description"""
+        return dict(self._entries[i])
+
+    def _symbol(self, i: int) -> str:
+        return self._entries[i]['symbol']
+
+    def _name(self, i: int) -> str:
+        return self._entries[i]['name']
+
+    def _name_record(self, position: int) -> int:
+        return self._by_name[position]
+
+
+def get_catalog_path() -> str:
+    """Catalog file location (LEGACYLOOP_CATALOG_PATH or the default)"""
+    return os.environ.get("LEGACYLOOP_CATALOG_PATH") or DEFAULT_CATALOG_PATH
+
+
+def open_catalog(path: str = None):
+    """
+    Map the catalog file, or return None if there is no catalog.
+
+    A missing catalog file (or a default one older than the seed) is built
+    from the bundled tickers.csv. If it cannot be written, e.g. on a
+    read-only disk, the seed is served from memory instead.
+    """
+    path = path or get_catalog_path()
+    if os.path.exists(path) and not (path == DEFAULT_CATALOG_PATH and _older_than_seed(path)):
+        return TickerCatalog(path)
+    if not os.path.exists(SEED_CATALOG_CSV):
+        return None
+    rows = list(read_catalog_csv(SEED_CATALOG_CSV))
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        build_catalog(rows, path)
+    except OSError:
+        return ListCatalog(rows)
+    return TickerCatalog(path)
+
+
+def _older_than_seed(path: str) -> bool:
+    return os.path.exists(SEED_CATALOG_CSV) and os.path.getmtime(path) < os.path.getmtime(SEED_CATALOG_CSV)
+
+
+@st.cache_resource
+def get_ticker_catalog():
+    """Get the process-wide catalog (None if there is no catalog)"""
+    return open_catalog()
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Build or query the ticker catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the catalog from a symbol,name,type,description CSV")
+    build.add_argument("csv", help="Source CSV file")
+    build.add_argument("--output", default=None, help="Catalog file (default: LEGACYLOOP_CATALOG_PATH or the cache directory)")
+    search = commands.add_parser("search", help="Look up symbols or names by prefix")
+    search.add_argument("prefix")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        output = args.output or get_catalog_path()
+        count = build_catalog(read_catalog_csv(args.csv), output)
+        print(f"Wrote {count} securities to {output} ({os.path.getsize(output)} bytes).")
+    else:
+        catalog = open_catalog()
+        if catalog is None:
+            parser.error("no catalog file and no tickers.csv to build one from")
+        for entry in catalog.search(args.prefix):
+            print(f"{entry['symbol']:<8} {entry['name']} ({entry['type']})")
+
+
+if __name__ == "__main__":
+    main()
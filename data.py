@@ -1,8 +1,11 @@
 # LegacyLoop - Mock Data
 # Contains portfolio assets, user profiles, and engagement tracking
 
+import math
 from datetime import datetime
 
+from memory import AssetRecord
+
 # Asset Type Options
 ASSET_TYPES = [
     'Equities',
@@ -78,6 +81,9 @@ DEFAULT_PORTFOLIO = [
 # Keep PORTFOLIO as a reference (will be replaced by session state in app)
 PORTFOLIO = DEFAULT_PORTFOLIO.copy()
 
+# Family that the demo users belong to (key for shared cross-session state)
+DEFAULT_FAMILY_ID = 'moneybags'
+
 # User Profiles
 USERS = {
     'primary': {
@@ -88,6 +94,7 @@ USERS = {
         'bio': 'Self-made entrepreneur, founded a manufacturing company at 28. Passionate about family legacy and philanthropy.'
     },
     'heir': {
+        'id': 'leo',
         'name': 'Leo Moneybags',
         'age': 22,
         'role': 'Heir',
@@ -106,11 +113,33 @@ USERS = {
     }
 }
 
+# Heirs per family - every heir gets their own Legacy Card feed
+FAMILY_HEIRS = {
+    DEFAULT_FAMILY_ID: [
+        USERS['heir'],
+        {
+            'id': 'mia',
+            'name': 'Mia Moneybags',
+            'age': 19,
+            'role': 'Heir',
+            'avatar': '👧',
+            'interests': ['Art', 'Social Media', 'Travel'],
+            'fin_lit_level': 'Low',
+            'bio': 'College sophomore studying design. Curious about how the family invests in things she cares about.'
+        }
+    ]
+}
+
 # Engagement Logs - Tracks heir interactions
 # This will be populated via session state in the app
 INITIAL_ENGAGEMENT_LOGS = []
 
 
+def get_family_heirs(family_id):
+    """Get the heir profiles for a family"""
+    return FAMILY_HEIRS.get(family_id, [USERS['heir']])
+
+
 def get_total_portfolio_value(portfolio=None):
     """Calculate total portfolio value"""
     if portfolio is None:
@@ -123,6 +152,14 @@ def format_currency(value):
     return f"${value:,.0f}"
 
 
+def approximate_value(value, digits=2):
+    """Round a value to a few significant digits (e.g. 1,234,567 -> 1,200,000)"""
+    if value <= 0:
+        return 0
+    scale = 10 ** max(0, math.floor(math.log10(value)) - digits + 1)
+    return int(round(value / scale) * scale)
+
+
 def get_asset_by_name(name, portfolio=None):
     """Find an asset by its name"""
     if portfolio is None:
@@ -133,6 +170,15 @@ def get_asset_by_name(name, portfolio=None):
     return None
 
 
+def find_duplicate_name(portfolio, name, exclude_id=None):
+    """The holding (other than `exclude_id`) already named `name`, ignoring case and spacing"""
+    wanted = ' '.join(name.split()).casefold()
+    for asset in portfolio:
+        if asset.get('id') != exclude_id and ' '.join(asset['name'].split()).casefold() == wanted:
+            return asset
+    return None
+
+
 def get_asset_by_id(asset_id, portfolio):
     """Find an asset by its ID"""
     for asset in portfolio:
@@ -150,14 +196,14 @@ def get_next_asset_id(portfolio):
 
 def add_asset(portfolio, name, value, asset_type, symbol='', description=''):
     """Add a new asset to the portfolio"""
-    new_asset = {
-        'id': get_next_asset_id(portfolio),
-        'symbol': symbol,
-        'name': name,
-        'value': value,
-        'type': asset_type,
-        'description': description
-    }
+    new_asset = AssetRecord(
+        id=get_next_asset_id(portfolio),
+        symbol=symbol,
+        name=name,
+        value=value,
+        type=asset_type,
+        description=description
+    )
     portfolio.append(new_asset)
     return new_asset
 
@@ -170,9 +216,12 @@ def update_asset(portfolio, asset_id, name=None, value=None, asset_type=None, sy
                 asset['name'] = name
             if value is not None:
                 asset['value'] = value
+                asset.pop('units', None)  # Re-anchor price-fed holdings at the new value
             if asset_type is not None:
                 asset['type'] = asset_type
             if symbol is not None:
+                if symbol != asset.get('symbol'):
+                    asset.pop('units', None)
                 asset['symbol'] = symbol
             if description is not None:
                 asset['description'] = description
@@ -187,3 +236,20 @@ def delete_asset(portfolio, asset_id):
             return portfolio.pop(i)
     return None
 
+
+def portfolio_key(family_id):
+    """Storage key holding a family's portfolio"""
+    return f"family:{family_id}:portfolio"
+
+
+def load_portfolio(backend, family_id):
+    """Load a family's portfolio from a storage backend (seeded from the default) as AssetRecords"""
+    portfolio = backend.get(portfolio_key(family_id))
+    if portfolio is None:
+        portfolio = DEFAULT_PORTFOLIO
+    return [AssetRecord.from_dict(asset) for asset in portfolio]
+
+
+def save_portfolio(backend, family_id, portfolio):
+    """Save a family's portfolio to a storage backend"""
+    backend.set(portfolio_key(family_id), [dict(asset) for asset in portfolio])
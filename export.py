@@ -0,0 +1,176 @@
+# LegacyLoop - Compliance Export
+# Streams a family's engagement events and advisor email drafts as CSV,
+# JSONL or a paginated, print-ready HTML report without loading them all
+#
+# Usage:
+#   python export.py --family moneybags --format csv --output moneybags.csv
+#   python export.py --format jsonl > moneybags.jsonl
+
+import argparse
+import csv
+import heapq
+import html
+import io
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from data import DEFAULT_FAMILY_ID
+from family_state import get_family_state
+
+# Columns of every export row
+EXPORT_FIELDS = ('timestamp', 'kind', 'heir', 'action', 'asset', 'asset_type', 'email')
+
+# Events read from storage, and CSV rows written, per chunk
+EXPORT_CHUNK_SIZE = 500
+
+# Rows per page of the HTML report
+REPORT_PAGE_SIZE = 50
+
+# MIME type and file extension per export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'html': ('text/html', 'html'),
+}
+
+
+def iter_export_rows(family, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Engagement events and email drafts merged into one stream, oldest first"""
+    events = (
+        {
+            'timestamp': log.get('timestamp', ''),
+            'kind': 'engagement',
+            'heir': log.get('heir', ''),
+            'action': log.get('action', ''),
+            'asset': log.get('asset', ''),
+            'asset_type': log.get('asset_type', ''),
+            'email': '',
+        }
+        for log in family.iter_engagement_logs(chunk_size)
+    )
+    drafts = (
+        {
+            'timestamp': draft.get('timestamp', ''),
+            'kind': 'email_draft',
+            'heir': draft.get('heir', ''),
+            'action': 'Drafted Email',
+            'asset': draft.get('asset', ''),
+            'asset_type': '',
+            'email': draft.get('email', ''),
+        }
+        for draft in family.iter_email_drafts(chunk_size)
+    )
+    # Both lists are appended in time order, so a streaming merge keeps it
+    return heapq.merge(events, drafts, key=lambda row: row['timestamp'])
+
+
+def stream_csv(rows, rows_per_chunk: int = EXPORT_CHUNK_SIZE):
+    """Yield CSV text a chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_jsonl(rows, rows_per_chunk: int = EXPORT_CHUNK_SIZE):
+    """Yield JSON Lines text a chunk of rows at a time"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) == rows_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _render_page(rows: list, page: int, pages: int) -> str:
+    cells = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(row[field]))}</td>" for field in EXPORT_FIELDS) + "</tr>"
+        for row in rows
+    )
+    header = "".join(f"<th>{field.replace('_', ' ').title()}</th>" for field in EXPORT_FIELDS)
+    return (
+        f'<section class="page"><table><thead><tr>{header}</tr></thead>'
+        f'<tbody>{cells}</tbody></table><p class="footer">Page {page} of {pages}</p></section>'
+    )
+
+
+def stream_html_report(rows, family_id: str, total_rows: int, page_size: int = REPORT_PAGE_SIZE):
+    """
+    Yield a paginated HTML report a page at a time.
+
+    Each page breaks onto a new sheet when printed, so "Print to PDF" in a
+    browser produces the paginated PDF version.
+    """
+    pages = max(1, -(-total_rows // page_size))
+    yield (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>LegacyLoop engagement report - {html.escape(family_id)}</title>"
+        "<style>body{font-family:sans-serif;font-size:12px}"
+        "table{border-collapse:collapse;width:100%}th,td{border:1px solid #ccc;padding:4px;vertical-align:top}"
+        "td:last-child{white-space:pre-wrap}.footer{color:#888;text-align:right}"
+        ".page{page-break-after:always}.page:last-child{page-break-after:auto}</style></head><body>"
+        f"<h1>Engagement report: {html.escape(family_id)}</h1>"
+    )
+    page = []
+    page_number = 0
+    for row in rows:
+        page.append(row)
+        if len(page) == page_size:
+            page_number += 1
+            yield _render_page(page, page_number, pages)
+            page = []
+    if page or page_number == 0:
+        yield _render_page(page, page_number + 1, pages)
+    yield "</body></html>"
+
+
+def export_stream(family, fmt: str):
+    """Text chunks of a family's export in the given format"""
+    rows = iter_export_rows(family)
+    if fmt == 'csv':
+        return stream_csv(rows)
+    if fmt == 'jsonl':
+        return stream_jsonl(rows)
+    if fmt == 'html':
+        total = family.count_engagement_logs() + family.count_email_drafts()
+        return stream_html_report(rows, family.family_id, total)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_filename(family_id: str, fmt: str) -> str:
+    """Download file name for an export"""
+    return f"legacyloop_{family_id}_engagement.{EXPORT_FORMATS[fmt][1]}"
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Export a family's engagement history and email drafts.")
+    parser.add_argument("--family", default=DEFAULT_FAMILY_ID, help="Family id to export")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default='csv', help="Export format")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    family = get_family_state(args.family)
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in export_stream(family, args.format):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
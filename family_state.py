@@ -0,0 +1,295 @@
+# LegacyLoop - Shared Family State
+# Portfolio, mission statement and engagement logs shared by every session
+# (Arthur, Leo, Sarah) that belongs to the same family, on any replica
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+from data import DEFAULT_FAMILY_ID, get_family_heirs, load_portfolio, save_portfolio
+from history import ADDED, META, REMOVED, VALUE, PortfolioHistory, diff_portfolios, record_portfolio_change
+from memory import EngagementRecord
+from ranking import HeirRanker
+from search import DEFAULT_LIMIT, HoldingIndex
+from storage import StorageBackend, get_storage_backend
+
+# An heir counts as online if their feed was rendered this recently
+PRESENCE_TIMEOUT_SECONDS = 120
+
+# Items read per round trip when iterating over a whole stored list
+LIST_CHUNK_SIZE = 500
+
+# A mission-builder draft is saved once it has been this long without edits
+DRAFT_AUTOSAVE_SECONDS = 2.0
+
+
+class FamilyState:
+    """
+    Handle on one family's state in the shared storage backend.
+
+    Every mutation bumps the family `version` counter. Readers compare
+    versions to find out cheaply whether anything changed since they last
+    rendered, and the portfolio is only re-read from storage when it has.
+    """
+
+    def __init__(self, family_id: str, backend: StorageBackend):
+        self.family_id = family_id
+        self.backend = backend
+        self._portfolio_cache = None  # (version, portfolio)
+        self._holdings_by_id = None   # (version, {asset id: asset})
+        self.history = PortfolioHistory(backend, family_id)
+        self._search_index = HoldingIndex()
+        self._indexed_version = None  # listing_version the index reflects
+        self._search_lock = threading.Lock()
+        self._rankers = {}  # heir id -> HeirRanker
+
+    def _key(self, name: str) -> str:
+        return f"family:{self.family_id}:{name}"
+
+    @property
+    def version(self) -> int:
+        """Counter bumped on every change to this family's state"""
+        return self.backend.get(self._key('version'), 0)
+
+    @property
+    def portfolio_version(self) -> int:
+        """Counter bumped only when the holdings change"""
+        return self.backend.get(self._key('portfolio_version'), 0)
+
+    @property
+    def listing_version(self) -> int:
+        """Counter bumped when holdings are added, removed or re-described (not revalued)"""
+        return self.backend.get(self._key('listing_version'), 0)
+
+    @property
+    def mission_statement(self):
+        """The current family mission statement (or None)"""
+        return self.backend.get(self._key('mission_statement'))
+
+    @property
+    def mission_draft(self):
+        """Last saved mission-builder draft: {'values', 'goals', 'saved_at'} (or None)"""
+        return self.backend.get(self._key('mission_draft'))
+
+    @property
+    def mission_candidates(self) -> list:
+        """Alternative mission statements waiting to be picked from"""
+        return self.backend.get(self._key('mission_candidates')) or []
+
+    @contextmanager
+    def update(self, if_portfolio_version: int = None):
+        """
+        Lock the family and yield its portfolio for mutation.
+
+        The portfolio is saved, the changes are recorded in the portfolio
+        history and the version bumped when the block exits. With
+        `if_portfolio_version` the update is a compare-and-swap: if the
+        holdings changed since that version, None is yielded and nothing
+        is written.
+        """
+        with self.backend.lock(self._key('lock')):
+            if if_portfolio_version is not None and self.portfolio_version != if_portfolio_version:
+                yield None
+                return
+            portfolio = load_portfolio(self.backend, self.family_id)
+            before = [dict(asset) for asset in portfolio]
+            yield portfolio
+            save_portfolio(self.backend, self.family_id, portfolio)
+            events = diff_portfolios(before, portfolio)
+            record_portfolio_change(self.backend, self.family_id, before, portfolio, events=events)
+            self.backend.incr(self._key('portfolio_version'))
+            self.backend.incr(self._key('version'))
+            if any(kind != VALUE for kind, _, _, _ in events):
+                # Value moves (e.g. price ticks) leave the search index as it is
+                self._apply_to_search_index(events, portfolio, self.backend.incr(self._key('listing_version')))
+
+    def _apply_to_search_index(self, events: list, portfolio: list, listing_version: int):
+        """Re-index only the holdings this process just changed"""
+        with self._search_lock:
+            if self._indexed_version != listing_version - 1:
+                return  # Index is behind other writers; search() re-syncs it
+            changed = {asset_id for kind, asset_id, _, _ in events if kind in (ADDED, META)}
+            for asset in portfolio:
+                if asset['id'] in changed:
+                    self._search_index.add(asset)
+            for kind, asset_id, _, _ in events:
+                if kind == REMOVED:
+                    self._search_index.remove(asset_id)
+            self._indexed_version = listing_version
+
+    def get_portfolio(self) -> list:
+        """Return the holdings list, re-reading storage only after a change"""
+        version = self.version
+        if self._portfolio_cache is None or self._portfolio_cache[0] != version:
+            self._portfolio_cache = (version, load_portfolio(self.backend, self.family_id))
+        return list(self._portfolio_cache[1])
+
+    def search_holdings(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """Holdings matching a search query, best matches first"""
+        listing_version = self.listing_version
+        portfolio = self.get_portfolio()
+        with self._search_lock:
+            if self._indexed_version != listing_version:
+                self._search_index.sync(portfolio)
+                self._indexed_version = listing_version
+            ids = self._search_index.search(query, limit)
+
+        version = self._portfolio_cache[0]
+        if self._holdings_by_id is None or self._holdings_by_id[0] != version:
+            self._holdings_by_id = (version, {asset['id']: asset for asset in portfolio})
+        by_id = self._holdings_by_id[1]
+        return [by_id[asset_id] for asset_id in ids if asset_id in by_id]
+
+    def rank_holdings_for(self, heir_profile: dict, limit: int) -> list:
+        """The `limit` holdings most relevant to an heir, best first"""
+        ranker = self._rankers.get(heir_profile['id'])
+        if ranker is None:
+            ranker = self._rankers.setdefault(heir_profile['id'], HeirRanker(heir_profile))
+        start = ranker.logs_seen
+        ranker.observe_engagement(self.get_engagement_logs(start=start), start)
+        portfolio_version = self.portfolio_version
+        return ranker.top(self.get_portfolio(), limit, portfolio_version)
+
+    def get_engagement_logs(self, start: int = 0) -> list:
+        """Return heir engagement events from `start` on, oldest first"""
+        logs = self.backend.get_list(self._key('engagement_logs'), start=start)
+        return [EngagementRecord.from_dict(log) for log in logs]
+
+    def iter_engagement_logs(self, chunk_size: int = LIST_CHUNK_SIZE):
+        """Yield every heir engagement event, oldest first, reading a chunk at a time"""
+        yield from self._iter_list('engagement_logs', chunk_size)
+
+    def _iter_list(self, name: str, chunk_size: int):
+        start = 0
+        while True:
+            chunk = self.backend.get_list(self._key(name), start=start, end=start + chunk_size)
+            if not chunk:
+                return
+            yield from chunk
+            start += len(chunk)
+
+    def count_engagement_logs(self) -> int:
+        """Return the number of heir engagement events"""
+        return self.backend.list_length(self._key('engagement_logs'))
+
+    def log_engagement(self, log_entry: dict):
+        """Append an heir engagement event"""
+        self.backend.append(self._key('engagement_logs'), log_entry)
+        self.backend.incr(self._key('version'))
+
+    def log_email_draft(self, draft: dict):
+        """Keep a generated advisor email draft for the compliance export"""
+        self.backend.append(self._key('email_drafts'), draft)
+
+    def iter_email_drafts(self, chunk_size: int = LIST_CHUNK_SIZE):
+        """Yield every advisor email draft, oldest first, reading a chunk at a time"""
+        yield from self._iter_list('email_drafts', chunk_size)
+
+    def count_email_drafts(self) -> int:
+        """Return the number of advisor email drafts"""
+        return self.backend.list_length(self._key('email_drafts'))
+
+    def mark_online(self, heir_id: str):
+        """Record that an heir is looking at their feed right now"""
+        self.backend.set(self._key(f'presence:{heir_id}'), time.time())
+
+    def get_online_heir_ids(self) -> set:
+        """Ids of heirs seen within PRESENCE_TIMEOUT_SECONDS"""
+        cutoff = time.time() - PRESENCE_TIMEOUT_SECONDS
+        return {
+            heir['id'] for heir in get_family_heirs(self.family_id)
+            if self.backend.get(self._key(f"presence:{heir['id']}"), 0) >= cutoff
+        }
+
+    def set_mission_statement(self, statement: str):
+        """Replace the family mission statement"""
+        self.backend.set(self._key('mission_statement'), statement)
+        self.backend.incr(self._key('version'))
+
+    # Drafts and candidates are only shown in the mission builder, so saving
+    # them does not bump the version (other views would rerender for nothing)
+
+    def save_mission_draft(self, values: str, goals: str):
+        """Save the mission-builder inputs"""
+        self.backend.set(self._key('mission_draft'), {'values': values, 'goals': goals, 'saved_at': time.time()})
+
+    def set_mission_candidates(self, candidates: list):
+        """Replace the alternative mission statements ([] to dismiss them)"""
+        self.backend.set(self._key('mission_candidates'), candidates)
+
+
+class DraftWriter:
+    """
+    Coalescing write-behind for mission-builder drafts.
+
+    Sessions stage the latest draft per family and a background thread
+    saves it once no newer edit has arrived for `delay` seconds, so a burst
+    of edits costs one storage write. Staged drafts are flushed at exit.
+    """
+
+    def __init__(self, delay: float = DRAFT_AUTOSAVE_SECONDS):
+        self.delay = delay
+        self._pending = {}  # family id -> (staged at, family, values, goals)
+        self._changed = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def stage(self, family: FamilyState, values: str, goals: str):
+        """Queue a draft, replacing any unsaved one for the family"""
+        with self._changed:
+            self._pending[family.family_id] = (time.monotonic(), family, values, goals)
+            self._changed.notify()
+
+    def pending(self, family_id: str):
+        """The family's unsaved draft as {'values', 'goals'} (or None)"""
+        with self._changed:
+            entry = self._pending.get(family_id)
+        return None if entry is None else {'values': entry[2], 'goals': entry[3]}
+
+    def flush(self, family_id: str = None):
+        """Save staged drafts now (one family's, or all)"""
+        with self._changed:
+            family_ids = list(self._pending) if family_id is None else [family_id]
+            entries = [self._pending.pop(f) for f in family_ids if f in self._pending]
+        for _, family, values, goals in entries:
+            family.save_mission_draft(values, goals)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._pending:
+                    self._changed.wait()
+                now = time.monotonic()
+                oldest = min(staged_at for staged_at, *_ in self._pending.values())
+                if now - oldest < self.delay:
+                    self._changed.wait(oldest + self.delay - now)
+                    continue
+                due = [f for f, (staged_at, *_) in self._pending.items() if now - staged_at >= self.delay]
+                entries = [self._pending.pop(f) for f in due]
+            for _, family, values, goals in entries:
+                try:
+                    family.save_mission_draft(values, goals)
+                except Exception:
+                    # Retry later unless a newer draft has been staged meanwhile
+                    with self._changed:
+                        self._pending.setdefault(family.family_id, (time.monotonic(), family, values, goals))
+
+
+@st.cache_resource
+def get_family_state(family_id: str = DEFAULT_FAMILY_ID) -> FamilyState:
+    """Get the process-wide handle on a family's shared state"""
+    return FamilyState(family_id, get_storage_backend())
+
+
+@st.cache_resource
+def get_draft_writer() -> DraftWriter:
+    """Get the process-wide mission-draft writer"""
+    return DraftWriter()
+
+
+def get_current_family() -> FamilyState:
+    """Get the shared state for the family of the current session"""
+    family_id = st.session_state.get('family_id', DEFAULT_FAMILY_ID)
+    return get_family_state(family_id)
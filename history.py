@@ -0,0 +1,260 @@
+# LegacyLoop - Portfolio History
+# Records every portfolio change as compact delta events with periodic
+# checkpoints, and answers point-in-time and per-asset series queries
+
+import base64
+import bisect
+import json
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Event kinds
+ADDED = 1      # Asset created (value + metadata)
+VALUE = 2      # Value changed
+META = 3       # Name, type, symbol or description changed
+REMOVED = 4    # Asset deleted
+
+# Asset fields tracked as metadata (value is tracked separately, units are derived)
+META_FIELDS = ('name', 'type', 'symbol', 'description')
+
+# Events per sealed segment; each segment starts with a full checkpoint
+SEGMENT_EVENTS = 256
+
+# Packed event layout inside a sealed segment (21 bytes per event before
+# compression); timestamps are stored as offsets from the segment start
+EVENT_DTYPE = np.dtype([('dt', '<u4'), ('asset', '<u4'), ('kind', 'u1'), ('value', '<f8')])
+
+
+def _key(family_id: str, name: str) -> str:
+    return f"family:{family_id}:history:{name}"
+
+
+def _pack(data: bytes) -> str:
+    return base64.b64encode(zlib.compress(data, 6)).decode('ascii')
+
+
+def _unpack(text: str) -> bytes:
+    return zlib.decompress(base64.b64decode(text))
+
+
+def diff_portfolios(before: list, after: list) -> list:
+    """Delta events (kind, asset_id, value, meta) turning `before` into `after`"""
+    old = {asset['id']: asset for asset in before}
+    events = []
+    for asset in after:
+        previous = old.pop(asset['id'], None)
+        if previous is None:
+            meta = {field: asset.get(field, '') for field in META_FIELDS}
+            events.append((ADDED, asset['id'], asset['value'], meta))
+            continue
+        meta = {field: asset.get(field, '') for field in META_FIELDS if asset.get(field) != previous.get(field)}
+        if meta:
+            events.append((META, asset['id'], 0, meta))
+        if asset['value'] != previous['value']:
+            events.append((VALUE, asset['id'], asset['value'], None))
+    for asset_id in old:
+        events.append((REMOVED, asset_id, 0, None))
+    return events
+
+
+def record_portfolio_change(backend, family_id: str, before: list, after: list,
+                            timestamp: int = None, events: list = None):
+    """
+    Append the changes between two portfolio versions to the family history.
+
+    Call while holding the family lock (FamilyState.update does). Events go
+    to a small open tail, one write per batch; whenever it reaches
+    SEGMENT_EVENTS events it is sealed into a compressed segment and the
+    portfolio at that point becomes the next checkpoint. Pass `events` if
+    the diff has already been computed.
+    """
+    if events is None:
+        events = diff_portfolios(before, after)
+    if not events:
+        return
+    if timestamp is None:
+        timestamp = int(time.time())
+
+    tail_key = _key(family_id, 'tail')
+    if backend.get(_key(family_id, 'tail_checkpoint')) is None:
+        backend.set(_key(family_id, 'tail_checkpoint'), before)
+    rows = [[timestamp, asset_id, kind, value, meta] for kind, asset_id, value, meta in events]
+    filled = backend.list_length(tail_key)
+    state = before
+    while rows:
+        room = max(0, SEGMENT_EVENTS - filled)
+        batch, rows = rows[:room], rows[room:]
+        if batch:
+            backend.extend(tail_key, batch)
+            filled += len(batch)
+            state = after if not rows else _apply_rows(state, batch, after)
+        if filled < SEGMENT_EVENTS:
+            break
+        _seal_tail(backend, family_id, state)
+        filled = 0
+
+
+def _apply_rows(portfolio: list, rows: list, after: list) -> list:
+    """Portfolio part-way through a batch: `portfolio` with tail `rows` applied"""
+    final = {asset['id']: asset for asset in after}
+    state = {asset['id']: dict(asset) for asset in portfolio}
+    for _, asset_id, kind, value, meta in rows:
+        if kind == ADDED:
+            state[asset_id] = dict(final.get(asset_id) or {'id': asset_id, **meta, 'value': value})
+        elif kind == VALUE and asset_id in state:
+            state[asset_id]['value'] = value
+        elif kind == META and asset_id in state:
+            state[asset_id].update(meta)
+        elif kind == REMOVED:
+            state.pop(asset_id, None)
+    return list(state.values())
+
+
+def _seal_tail(backend, family_id: str, current: list):
+    """Compress the open tail into a segment and start a new one"""
+    tail = backend.get_list(_key(family_id, 'tail'))
+    start = tail[0][0]
+    events = np.zeros(len(tail), dtype=EVENT_DTYPE)
+    events['dt'] = [row[0] - start for row in tail]
+    events['asset'] = [row[1] for row in tail]
+    events['kind'] = [row[2] for row in tail]
+    events['value'] = [row[3] for row in tail]
+    backend.append(_key(family_id, 'segments'), {
+        'start': start,
+        'end': tail[-1][0],
+        'checkpoint': _pack(json.dumps(backend.get(_key(family_id, 'tail_checkpoint'))).encode('utf-8')),
+        'events': _pack(events.tobytes()),
+        'meta': {str(i): row[4] for i, row in enumerate(tail) if row[4]},
+    })
+    backend.delete(_key(family_id, 'tail'))
+    backend.set(_key(family_id, 'tail_checkpoint'), [dict(asset) for asset in current])
+
+
+class _Segment:
+    """Decoded segment: checkpoint plus columnar events"""
+
+    __slots__ = ('start', 'end', 'checkpoint', 'times', 'assets', 'kinds', 'values', 'meta')
+
+    def __init__(self, start, end, checkpoint, times, assets, kinds, values, meta):
+        self.start = start
+        self.end = end
+        self.checkpoint = checkpoint
+        self.times = times
+        self.assets = assets
+        self.kinds = kinds
+        self.values = values
+        self.meta = meta
+
+    @classmethod
+    def from_stored(cls, stored: dict):
+        events = np.frombuffer(_unpack(stored['events']), dtype=EVENT_DTYPE)
+        return cls(
+            stored['start'], stored['end'],
+            json.loads(_unpack(stored['checkpoint'])),
+            stored['start'] + events['dt'].astype(np.int64),
+            events['asset'].astype(np.int64), events['kind'], events['value'],
+            {int(i): meta for i, meta in stored['meta'].items()}
+        )
+
+    @classmethod
+    def from_tail(cls, checkpoint: list, tail: list):
+        return cls(
+            tail[0][0] if tail else None, tail[-1][0] if tail else None, checkpoint,
+            np.array([row[0] for row in tail], dtype=np.int64),
+            np.array([row[1] for row in tail], dtype=np.int64),
+            np.array([row[2] for row in tail], dtype=np.uint8),
+            np.array([row[3] for row in tail], dtype=float),
+            {i: row[4] for i, row in enumerate(tail) if row[4]}
+        )
+
+    def replay(self, until: int) -> list:
+        """Portfolio after applying this segment's events up to `until`"""
+        state = {asset['id']: dict(asset) for asset in self.checkpoint}
+        count = int(np.searchsorted(self.times, until, side='right'))
+        for i in range(count):
+            asset_id = int(self.assets[i])
+            kind = self.kinds[i]
+            if kind == ADDED:
+                state[asset_id] = {'id': asset_id, **self.meta.get(i, {}), 'value': _as_number(self.values[i])}
+            elif kind == VALUE and asset_id in state:
+                state[asset_id]['value'] = _as_number(self.values[i])
+            elif kind == META and asset_id in state:
+                state[asset_id].update(self.meta.get(i, {}))
+            elif kind == REMOVED:
+                state.pop(asset_id, None)
+        return list(state.values())
+
+
+def _as_number(value):
+    """Stored values are float64; give whole-dollar values back as ints"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class PortfolioHistory:
+    """
+    Read side of a family's portfolio history.
+
+    Sealed segments never change, so they are decoded once and kept; each
+    query only fetches segments sealed since the last one plus the open tail.
+    """
+
+    def __init__(self, backend, family_id: str):
+        self.backend = backend
+        self.family_id = family_id
+        self._segments = []
+        self._starts = []
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> tuple:
+        """Load newly sealed segments; returns (segments, open tail or None)"""
+        with self._lock:
+            new = self.backend.get_list(_key(self.family_id, 'segments'), start=len(self._segments))
+            for stored in new:
+                self._segments.append(_Segment.from_stored(stored))
+                self._starts.append(stored['start'])
+            segments = list(self._segments)
+        checkpoint = self.backend.get(_key(self.family_id, 'tail_checkpoint'))
+        tail = self.backend.get_list(_key(self.family_id, 'tail'))
+        return segments, (_Segment.from_tail(checkpoint, tail) if checkpoint is not None else None)
+
+    def as_of(self, timestamp: int):
+        """
+        Portfolio as it was at `timestamp` (seconds since the epoch).
+
+        Returns None if no change has been recorded yet. Times before the
+        first recorded change get the portfolio as it was before it.
+        """
+        segments, tail = self._refresh()
+        if tail is not None and tail.start is not None and timestamp >= tail.start:
+            return tail.replay(timestamp)
+        if not segments:
+            return tail.checkpoint if tail is not None else None
+        index = max(0, bisect.bisect_right(self._starts, timestamp) - 1)
+        return segments[index].replay(timestamp)
+
+    def value_series(self, asset_id: int) -> tuple:
+        """
+        (timestamps, values) arrays of every recorded value for an asset.
+
+        Starts with the value the asset had before the first recorded change
+        (the oldest checkpoint), dated at that change, if it existed then.
+        """
+        segments, tail = self._refresh()
+        parts = segments + ([tail] if tail is not None else [])
+        times, values = [], []
+        if parts and parts[0].start is not None:
+            baseline = [asset['value'] for asset in parts[0].checkpoint if asset['id'] == asset_id]
+            if baseline:
+                times.append(np.array([parts[0].start], dtype=np.int64))
+                values.append(np.array(baseline[:1], dtype=float))
+        for segment in parts:
+            mask = (segment.assets == asset_id) & ((segment.kinds == ADDED) | (segment.kinds == VALUE))
+            times.append(segment.times[mask])
+            values.append(segment.values[mask])
+        if not times:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(times), np.concatenate(values)
@@ -0,0 +1,351 @@
+# LegacyLoop - Load Test Harness
+# Replays click scripts in many headless app sessions against a local fake
+# Gemini server and reports throughput, rerun latency, CPU and memory
+#
+# Usage:
+#   python loadtest.py                                    # 10, 25, 50, 100 sessions
+#   python loadtest.py --sessions 50,100,200,400 --duration 120 --workers 4
+#   python loadtest.py --latency 2.0 --error-rate 0.05 --json results.json
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+
+from routing import percentile
+
+# The app under test
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Session kinds assigned round-robin, so each family gets a client, an heir and an advisor
+SESSION_KINDS = ('primary', 'heir', 'advisor')
+
+# Longest a single rerun may take before it counts as failed
+RERUN_TIMEOUT_SECONDS = 60
+
+# A level is saturated once reruns/s per session drop below this share of
+# the first level's, or p99 rerun latency exceeds the budget
+SATURATION_EFFICIENCY = 0.8
+DEFAULT_P99_BUDGET_SECONDS = 2.0
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Gemini generateContent REST API.
+
+    Every call sleeps for a normally distributed latency and fails with
+    503 at the configured rate; replies are short canned texts.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 1.0, jitter: float = 0.3, error_rate: float = 0.0):
+        super().__init__(('127.0.0.1', port), _FakeGeminiHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve on a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, failed: bool):
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(max(0.0, random.gauss(server.latency, server.latency * server.jitter)))
+
+        failed = random.random() < server.error_rate
+        server.count(failed)
+        if failed:
+            status, reply = 503, {'error': {'code': 503, 'message': "Simulated overload", 'status': 'UNAVAILABLE'}}
+        else:
+            digest = hashlib.sha256(body).hexdigest()[:8]
+            text = f"Did you know? This holding is a long-term building block for the family (load test reply {digest})."
+            status, reply = 200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}]
+            }
+
+        payload = json.dumps(reply).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# --- Click scripts -------------------------------------------------------
+
+def _button(at, key_prefix: str = None, label: str = None):
+    for button in at.button:
+        if key_prefix and (button.key or '').startswith(key_prefix):
+            return button
+        if label and label in button.label:
+            return button
+    return None
+
+
+def _click(button):
+    return button.click() if button is not None else None
+
+
+def _select_role(at, role: str):
+    selector = at.sidebar.selectbox(key="role_selector")
+    return selector.select(next(option for option in selector.options if option.startswith(role)))
+
+
+def _primary_steps():
+    name = f"Load Test Holding {random.randrange(10 ** 6)}"
+    return [
+        ('open', lambda at: at),
+        ('open_add_form', lambda at: _click(_button(at, label="Add New Asset"))),
+        ('add_asset', lambda at: (at.text_input(key="new_asset_name").input(name),
+                                  _click(_button(at, label="✅ Add Asset")))[-1]),
+        ('search', lambda at: at.text_input(key="holdings_search").input("load test")),
+        ('clear_search', lambda at: at.text_input(key="holdings_search").input("")),
+        ('delete_asset', lambda at: _click(_button(at, key_prefix="delete_"))),
+        ('draft_mission', lambda at: (at.text_area(key="values_input").input("Hard work, education, philanthropy"),
+                                      at.text_area(key="goals_input").input("Keep the family united for generations"),
+                                      _click(_button(at, label="Draft Family Constitution")))[-1]),
+        ('poll', lambda at: at),
+        ('poll', lambda at: at),
+    ]
+
+
+def _heir_steps():
+    return [
+        ('open', lambda at: at),
+        ('switch_role', lambda at: _select_role(at, "Heir")),
+        ('poll', lambda at: at),
+        ('poll', lambda at: at),
+        ('poll', lambda at: at),
+        ('search', lambda at: at.text_input(key="heir_search").input("tech")),
+        ('clear_search', lambda at: at.text_input(key="heir_search").input("")),
+        ('ask_advisor', lambda at: _click(_button(at, key_prefix="ask_"))),
+    ]
+
+
+def _advisor_steps():
+    return [
+        ('open', lambda at: at),
+        ('switch_role', lambda at: _select_role(at, "Advisor")),
+        ('change_window', lambda at: at.selectbox(key="analytics_window").select("Last 7 days")),
+        ('draft_email', lambda at: _click(_button(at, key_prefix="email_"))),
+        ('poll', lambda at: at),
+    ]
+
+
+CLICK_SCRIPTS = {
+    'primary': _primary_steps,
+    'heir': _heir_steps,
+    'advisor': _advisor_steps,
+}
+
+
+# --- Worker processes ----------------------------------------------------
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+
+def _run_session(AppTest, kind: str, family_id: str, deadline: float, think: float, lock, results: dict):
+    at = AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT_SECONDS)
+    at.session_state['family_id'] = family_id
+    while time.monotonic() < deadline:
+        for step, action in CLICK_SCRIPTS[kind]():
+            if time.monotonic() >= deadline:
+                return
+            started = time.monotonic()
+            # AppTest is not thread-safe, so a worker runs one script at a
+            # time like a single busy server process; waiting counts as latency
+            with lock:
+                try:
+                    target = action(at)
+                    if target is None:
+                        results['skipped'] += 1
+                        continue
+                    target.run()
+                    failed = bool(at.exception)
+                except Exception:
+                    failed = True
+                # Shared with the other sessions' threads: update under the lock
+                results['latencies'].append(time.monotonic() - started)
+                results['errors'] += failed
+            time.sleep(random.uniform(0.5, 1.5) * think)
+
+
+def run_worker(sessions: list, duration: float, think: float) -> dict:
+    """
+    Run (kind, family id) sessions concurrently in this process.
+
+    Returns rerun latencies, error counts, CPU seconds and the resident
+    memory growth after warm-up.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    AppTest.from_file(APP_PATH, default_timeout=RERUN_TIMEOUT_SECONDS).run()  # Imports and shared caches
+    rss_before = current_rss()
+    cpu_before = _cpu_seconds()
+
+    lock = threading.Lock()
+    results = {'latencies': [], 'errors': 0, 'skipped': 0}
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=_run_session, args=(AppTest, kind, family_id, deadline, think, lock, results), daemon=True)
+        for kind, family_id in sessions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(duration + RERUN_TIMEOUT_SECONDS)
+
+    results['cpu_seconds'] = _cpu_seconds() - cpu_before
+    results['rss_growth'] = current_rss() - rss_before
+    return results
+
+
+# --- Levels and report ---------------------------------------------------
+
+def run_level(sessions: int, workers: int, duration: float, think: float, families: int = None) -> dict:
+    """Run one load level and summarize it"""
+    families = families or max(1, -(-sessions // len(SESSION_KINDS)))
+    specs = [(SESSION_KINDS[i % len(SESSION_KINDS)], f"loadtest-{i // len(SESSION_KINDS) % families}")
+             for i in range(sessions)]
+    workers = max(1, min(workers, sessions))
+    shares = [specs[w::workers] for w in range(workers)]
+
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        outcomes = list(pool.map(run_worker, shares, [duration] * workers, [think] * workers))
+    wall = time.monotonic() - started
+
+    latencies = [latency for outcome in outcomes for latency in outcome['latencies']]
+    cpu = sum(outcome['cpu_seconds'] for outcome in outcomes)
+    return {
+        'sessions': sessions,
+        'workers': workers,
+        'reruns': len(latencies),
+        'throughput': len(latencies) / duration,
+        'p50': percentile(latencies, 0.50) if latencies else None,
+        'p99': percentile(latencies, 0.99) if latencies else None,
+        'errors': sum(outcome['errors'] for outcome in outcomes),
+        'skipped': sum(outcome['skipped'] for outcome in outcomes),
+        'cpu_percent_per_session': 100 * cpu / duration / sessions,
+        'cpu_utilization': cpu / (duration * (os.cpu_count() or 1)),
+        'mb_per_session': sum(outcome['rss_growth'] for outcome in outcomes) / sessions / 2 ** 20,
+        'wall_seconds': wall,
+    }
+
+
+def find_saturation(levels: list, p99_budget: float = DEFAULT_P99_BUDGET_SECONDS):
+    """
+    First level that is saturated (see SATURATION_EFFICIENCY), or None.
+
+    Throughput per session stays flat while the server keeps up (sessions
+    are paced by think time); it drops once reruns start queueing.
+    """
+    baseline = levels[0]['throughput'] / levels[0]['sessions']
+    for level in levels:
+        efficiency = level['throughput'] / level['sessions'] / baseline if baseline else 0
+        if efficiency < SATURATION_EFFICIENCY or (level['p99'] or 0) > p99_budget:
+            return level
+    return None
+
+
+def print_report(levels: list, server: FakeGeminiServer, p99_budget: float):
+    print(f"\n{'Sessions':>8} {'Reruns/s':>9} {'p50 (s)':>8} {'p99 (s)':>8} {'CPU%/sess':>10} "
+          f"{'Host CPU':>9} {'MB/sess':>8} {'Errors':>7}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['throughput']:>9.2f} {level['p50'] or 0:>8.3f} {level['p99'] or 0:>8.3f} "
+              f"{level['cpu_percent_per_session']:>10.2f} {level['cpu_utilization']:>9.0%} "
+              f"{level['mb_per_session']:>8.2f} {level['errors']:>7}")
+    print(f"\nFake Gemini: {server.calls} calls, {server.failures} simulated failures.")
+
+    saturated = find_saturation(levels, p99_budget)
+    if saturated is None:
+        print(f"Not saturated up to {levels[-1]['sessions']} sessions.")
+    elif saturated is levels[0]:
+        print(f"Saturated at the first level ({saturated['sessions']} sessions); try fewer sessions.")
+    else:
+        previous = levels[levels.index(saturated) - 1]
+        print(f"Saturates between {previous['sessions']} and {saturated['sessions']} sessions "
+              f"(p99 budget {p99_budget:g}s).")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load-test the app with concurrent headless sessions.")
+    parser.add_argument("--sessions", default="10,25,50,100", help="Comma-separated concurrent session levels")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds per level")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Server processes per level (each like one replica)")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean think time between clicks (seconds)")
+    parser.add_argument("--families", type=int, default=None, help="Families shared by the sessions (default: sessions / 3)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean fake Gemini latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Latency standard deviation as a share of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake Gemini calls that fail")
+    parser.add_argument("--p99-budget", type=float, default=DEFAULT_P99_BUDGET_SECONDS,
+                        help="p99 rerun latency (seconds) above which a level counts as saturated")
+    parser.add_argument("--storage", default=None, help="Storage URL shared by the workers (default: a temporary SQLite file)")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    os.environ["GEMINI_API_ENDPOINT"] = server.url
+    os.environ["GEMINI_API_KEY"] = "loadtest"
+    print(f"Fake Gemini at {server.url} (latency {args.latency:g}s, error rate {args.error_rate:.0%}).")
+
+    levels = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for sessions in (int(s) for s in args.sessions.split(',')):
+            # Fresh shared store per level so earlier levels do not skew it
+            os.environ["LEGACYLOOP_STORAGE_URL"] = args.storage or f"sqlite:///{workdir}/loadtest-{sessions}.db"
+            print(f"Running {sessions} sessions for {args.duration:g}s...", flush=True)
+            levels.append(run_level(sessions, args.workers, args.duration, args.think, args.families))
+
+    print_report(levels, server, args.p99_budget)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'levels': levels, 'gemini_calls': server.calls, 'gemini_failures': server.failures}, f, indent=2)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# LegacyLoop - Session Memory
+# Compact records for holdings and engagement events, size-bounded session
+# caches, and per-session memory accounting
+
+import sys
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import Future
+
+# Marks an unset field in a record
+_MISSING = object()
+
+
+class Record(MutableMapping):
+    """
+    Dict-compatible record whose fields live in __slots__.
+
+    Subclasses list their fields in FIELDS (and __slots__); string values
+    of the INTERNED fields are interned so repeated names and types are
+    stored once per process. Use dict(record) where plain JSON is needed.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    INTERNED = frozenset()
+
+    def __init__(self, values=(), **kwargs):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, _MISSING)
+        self.update(values, **kwargs)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Build a record from a plain dict (unknown keys are dropped)"""
+        record = cls.__new__(cls)
+        for field in cls.FIELDS:
+            value = data.get(field, _MISSING)
+            if field in cls.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(record, field, value)
+        return record
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        if key in self.INTERNED and type(value) is str:
+            value = sys.intern(value)
+        object.__setattr__(self, key, value)
+
+    def __delitem__(self, key):
+        self[key]  # KeyError if unset
+        object.__setattr__(self, key, _MISSING)
+
+    def __iter__(self):
+        return (field for field in self.FIELDS if getattr(self, field) is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        return (type(self).from_dict, (dict(self),))
+
+
+class AssetRecord(Record):
+    """A portfolio holding"""
+
+    FIELDS = ('id', 'symbol', 'name', 'value', 'type', 'description', 'units')
+    INTERNED = frozenset({'symbol', 'name', 'type'})
+    __slots__ = FIELDS
+
+
+class EngagementRecord(Record):
+    """An heir engagement event"""
+
+    FIELDS = ('timestamp', 'heir', 'action', 'asset', 'asset_type')
+    INTERNED = frozenset({'heir', 'action', 'asset', 'asset_type'})
+    __slots__ = FIELDS
+
+
+class LRUDict(OrderedDict):
+    """Dict that keeps only the `maxsize` most recently used entries"""
+
+    def __init__(self, maxsize: int = 128, *args, **kwargs):
+        self.maxsize = maxsize
+        super().__init__(*args, **kwargs)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Approximate bytes held by an object and everything it references"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, Future):
+        if obj.done() and obj.exception() is None:
+            size += deep_sizeof(obj.result(), seen)
+        return size
+    if isinstance(obj, (dict, MutableMapping)):
+        return size + sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def session_memory(session_state) -> dict:
+    """Approximate bytes per session state key, largest first"""
+    seen = set()
+    sizes = {str(key): deep_sizeof(session_state[key], seen) for key in session_state}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
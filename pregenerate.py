@@ -0,0 +1,149 @@
+# LegacyLoop - Offline Heir Content Pre-generation
+# Nightly batch job that fills the shared response cache with every
+# (heir x asset) Legacy Card so morning traffic is served from cache
+#
+# Usage:
+#   python pregenerate.py                       # all families
+#   python pregenerate.py --family moneybags --concurrency 8 --rate 6
+#   python pregenerate.py --reset               # ignore the checkpoint
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+from dotenv import load_dotenv
+
+from data import FAMILY_HEIRS, get_family_heirs
+from family_state import get_family_state
+from routing import get_model_router
+from scheduler import GenerationScheduler, PRIORITY_OFFLINE
+from services import (
+    DEFAULT_MODEL,
+    build_heir_prompt,
+    generate_heir_content,
+    generation_key,
+    get_api_key,
+    get_cached_response,
+    is_usable_response
+)
+from storage import get_storage_url
+
+# Completed job keys, one JSON string per line
+DEFAULT_CHECKPOINT = "pregenerate_checkpoint.jsonl"
+
+# Print progress every this many finished items
+PROGRESS_EVERY = 25
+
+
+def load_checkpoint(path: str) -> set:
+    """Read the job keys finished by previous runs"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {json.loads(line) for line in f if line.strip()}
+
+
+def collect_work(family_ids: list, done: set, api_key: str) -> tuple:
+    """
+    Build the deduplicated (heir x asset) work list.
+
+    Returns (items, skipped) where items maps job key -> (asset, heir) and
+    skipped counts pairs that are checkpointed, cached or duplicates.
+    """
+    items = {}
+    skipped = 0
+    for family_id in family_ids:
+        portfolio = get_family_state(family_id).get_portfolio()
+        for heir in get_family_heirs(family_id):
+            for asset in portfolio:
+                prompt = build_heir_prompt(asset, heir)
+                key = generation_key(prompt, api_key)
+                if key in items or key in done or get_cached_response(prompt, 'heir_content', api_key) is not None:
+                    skipped += 1
+                    continue
+                items[key] = (asset, heir)
+    return items, skipped
+
+
+def run(family_ids: list, concurrency: int, rate: float, checkpoint_path: str) -> int:
+    """Pre-generate all missing content; returns the number of failures"""
+    api_key = get_api_key()
+    if not api_key:
+        print("No GEMINI_API_KEY/GOOGLE_API_KEY configured - nothing to pre-generate in simulation mode.")
+        return 1
+
+    if get_storage_url().startswith("memory://"):
+        print("Warning: STORAGE_URL is memory://, results will not outlive this process.")
+
+    done = load_checkpoint(checkpoint_path)
+    items, skipped = collect_work(family_ids, done, api_key)
+    print(f"{len(items)} item(s) to generate, {skipped} already done or duplicate.")
+    if not items:
+        return 0
+
+    get_model_router(DEFAULT_MODEL).limiter.set_rate(rate, burst=concurrency)
+    scheduler = GenerationScheduler(concurrency=concurrency)
+    futures = {
+        scheduler.submit(key, generate_heir_content, asset, heir, api_key, priority=PRIORITY_OFFLINE): key
+        for key, (asset, heir) in items.items()
+    }
+
+    started = time.monotonic()
+    finished = 0
+    failures = 0
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        for future in as_completed(futures):
+            key = futures[future]
+            finished += 1
+            try:
+                ok = is_usable_response(future.result())
+            except Exception:
+                ok = False
+
+            if ok:
+                checkpoint.write(json.dumps(key) + "\n")
+                checkpoint.flush()
+            else:
+                failures += 1
+
+            if finished % PROGRESS_EVERY == 0 or finished == len(futures):
+                elapsed = time.monotonic() - started
+                print(
+                    f"[{finished}/{len(futures)}] "
+                    f"{finished / elapsed:.2f} items/sec, {failures} failure(s), "
+                    f"queue depth {scheduler.stats()['queue_depth']}"
+                )
+
+    elapsed = time.monotonic() - started
+    print(
+        f"Done: {finished - failures} generated, {failures} failed "
+        f"in {elapsed:.1f}s ({finished / elapsed:.2f} items/sec)."
+    )
+    return failures
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Pre-generate Legacy Card content into the shared cache.")
+    parser.add_argument("--family", action="append", dest="families",
+                        help="Family id to process (repeatable, default: all)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel model calls")
+    parser.add_argument("--rate", type=float, default=4.0, help="Max model calls per second")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="Delete the checkpoint and start over")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    failures = run(args.families or list(FAMILY_HEIRS), args.concurrency, args.rate, args.checkpoint)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
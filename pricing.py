@@ -0,0 +1,395 @@
+# LegacyLoop - Price Feed Revaluation
+# Revalues symbol-bearing holdings across all families from a price feed
+#
+# Usage:
+#   python pricing.py --csv prices.csv                # symbol,price per line
+#   python pricing.py --listen 127.0.0.1:9009         # same lines over TCP
+#
+# Needs a shared STORAGE_URL so the app replicas see the new values.
+
+import argparse
+import csv
+import socket
+import time
+
+import numpy as np
+
+from data import FAMILY_HEIRS
+from family_state import get_family_state
+
+# Ticks applied together in one vectorized batch
+DEFAULT_BATCH_SIZE = 5000
+
+# A socket batch is flushed at least this often even if not full
+MAX_BATCH_DELAY_SECONDS = 1.0
+
+
+def approximate_values(values: np.ndarray, digits: int = 2) -> np.ndarray:
+    """Vectorized data.approximate_value (the rounding used in heir prompts)"""
+    values = np.maximum(values, 0)
+    exponent = np.floor(np.log10(np.maximum(values, 1)))
+    scale = 10.0 ** np.maximum(0, exponent - digits + 1)
+    return np.round(values / scale) * scale
+
+
+class Revaluation:
+    """
+    Outcome of one batch of price ticks.
+
+    Revalued holdings are kept as parallel arrays (one entry per holding)
+    so large batches never loop over holdings in Python.
+    """
+
+    def __init__(self, family_ids: list, ticks: int = 0, unknown_symbols: int = 0,
+                 family_index=None, asset_ids=None, values=None, units=None, material=None):
+        self.ticks = ticks
+        self.unknown_symbols = unknown_symbols
+        self._family_ids = family_ids
+        self.family_index = np.zeros(0, dtype=np.int64) if family_index is None else family_index
+        self.asset_ids = np.zeros(0, dtype=np.int64) if asset_ids is None else asset_ids
+        self.values = np.zeros(0) if values is None else values
+        self.units = np.zeros(0) if units is None else units
+        self.material = np.zeros(0, dtype=bool) if material is None else material
+
+    @property
+    def holdings(self) -> int:
+        """Number of holdings revalued"""
+        return len(self.asset_ids)
+
+    def by_family(self):
+        """Yield (family_id, {asset_id: (value, units)}) for each affected family"""
+        order = np.argsort(self.family_index, kind='stable')
+        family_index = self.family_index[order]
+        bounds = np.flatnonzero(np.diff(family_index)) + 1
+        for group in np.split(order, bounds):
+            if len(group):
+                yield self._family_ids[self.family_index[group[0]]], dict(zip(
+                    self.asset_ids[group].tolist(),
+                    zip(self.values[group].tolist(), self.units[group].tolist())
+                ))
+
+    def material_holdings(self) -> set:
+        """(family_id, asset_id) pairs whose heir prompt value changed"""
+        return {
+            (self._family_ids[family_idx], asset_id)
+            for family_idx, asset_id in zip(
+                self.family_index[self.material].tolist(), self.asset_ids[self.material].tolist()
+            )
+        }
+
+
+class RevaluationEngine:
+    """
+    In-memory index of every symbol-bearing holding across families.
+
+    Holdings live in parallel NumPy arrays, grouped by symbol (CSR-style
+    order/starts/ends), so a batch of ticks is applied with a handful of
+    vectorized operations.
+
+    A holding's units are anchored on the first price seen (value / price)
+    unless the asset already carries `units`; editing the value by hand
+    drops the anchor (see data.update_asset).
+
+    Each family remembers the portfolio_version its holdings were loaded
+    at, which commit_revaluation() uses to detect edits made in the app.
+    """
+
+    def __init__(self):
+        self._symbol_ids = {}
+        self._family_index = {}
+        self._family_ids = []
+        self._loaded_versions = {}  # family id -> portfolio_version loaded
+        self._family_rows = {}   # family index -> row indices (after _build_index)
+        self._pending = []       # rows registered since the last index build
+        self._last_price = np.zeros(0)
+        self._row_family = np.zeros(0, dtype=np.int64)
+        self._row_asset = np.zeros(0, dtype=np.int64)
+        self._row_symbol = np.zeros(0, dtype=np.int64)
+        self._row_units = np.zeros(0)
+        self._row_value = np.zeros(0)
+        self._alive = np.zeros(0, dtype=bool)
+        self._index_dirty = True
+
+    def _symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self._symbol_ids)
+        return symbol_id
+
+    def loaded_version(self, family_id: str):
+        """portfolio_version of the family's holdings as last loaded (None if never)"""
+        return self._loaded_versions.get(family_id)
+
+    def mark_committed(self, family_id: str):
+        """Note that our own write bumped the family's portfolio_version"""
+        if self._loaded_versions.get(family_id) is not None:
+            self._loaded_versions[family_id] += 1
+
+    def load_family(self, family_id: str, portfolio: list, portfolio_version: int = None):
+        """
+        (Re)register a family's holdings, replacing any previous rows.
+
+        Read `portfolio_version` before the portfolio: a version older than
+        the holdings only causes a needless reload, never a lost edit.
+        """
+        self._loaded_versions[family_id] = portfolio_version
+        family_idx = self._family_index.get(family_id)
+        if family_idx is None:
+            family_idx = self._family_index[family_id] = len(self._family_ids)
+            self._family_ids.append(family_id)
+        else:
+            self._alive[self._family_rows.pop(family_idx, [])] = False
+            self._pending = [row for row in self._pending if row[0] != family_idx]
+
+        for asset in portfolio:
+            if asset.get('symbol'):
+                self._pending.append((
+                    family_idx, asset['id'], self._symbol_id(asset['symbol'].upper()),
+                    asset.get('units', np.nan), float(asset['value'])
+                ))
+        self._index_dirty = True
+
+    def _build_index(self):
+        """Merge pending rows, drop dead ones and regroup rows by symbol"""
+        if self._pending:
+            family, asset, symbol, units, value = zip(*self._pending)
+            self._row_family = np.concatenate([self._row_family, np.array(family, dtype=np.int64)])
+            self._row_asset = np.concatenate([self._row_asset, np.array(asset, dtype=np.int64)])
+            self._row_symbol = np.concatenate([self._row_symbol, np.array(symbol, dtype=np.int64)])
+            self._row_units = np.concatenate([self._row_units, np.array(units, dtype=float)])
+            self._row_value = np.concatenate([self._row_value, np.array(value, dtype=float)])
+            self._alive = np.concatenate([self._alive, np.ones(len(self._pending), dtype=bool)])
+            self._pending = []
+
+        keep = self._alive
+        self._row_family = self._row_family[keep]
+        self._row_asset = self._row_asset[keep]
+        self._row_symbol = self._row_symbol[keep]
+        self._row_units = self._row_units[keep]
+        self._row_value = self._row_value[keep]
+        self._alive = self._alive[keep]
+
+        by_family = np.argsort(self._row_family, kind='stable')
+        bounds = np.flatnonzero(np.diff(self._row_family[by_family])) + 1
+        self._family_rows = {
+            int(self._row_family[rows[0]]): rows for rows in np.split(by_family, bounds) if len(rows)
+        }
+
+        if len(self._last_price) < len(self._symbol_ids):
+            self._last_price = np.concatenate([
+                self._last_price, np.full(len(self._symbol_ids) - len(self._last_price), np.nan)
+            ])
+
+        self._order = np.argsort(self._row_symbol, kind='stable')
+        sorted_symbols = self._row_symbol[self._order]
+        symbol_range = np.arange(len(self._symbol_ids))
+        self._starts = np.searchsorted(sorted_symbols, symbol_range, side='left')
+        self._ends = np.searchsorted(sorted_symbols, symbol_range, side='right')
+        self._index_dirty = False
+
+    def apply_ticks(self, symbols, prices) -> Revaluation:
+        """Apply a batch of (symbol, price) ticks; the last tick per symbol wins"""
+        if not len(symbols):
+            return Revaluation(self._family_ids)
+        if self._index_dirty:
+            self._build_index()
+
+        # Symbols are matched case-insensitively, so normalize before grouping
+        symbols = np.char.upper(np.asarray(symbols, dtype=str))
+        prices = np.asarray(prices, dtype=float)
+
+        # Latest valid price per distinct symbol in the batch
+        unique_symbols, inverse = np.unique(symbols, return_inverse=True)
+        latest = np.full(len(unique_symbols), -1)
+        valid = prices > 0
+        np.maximum.at(latest, inverse[valid], np.flatnonzero(valid))
+        symbol_ids = np.array([self._symbol_ids.get(str(s), -1) for s in unique_symbols])
+        known = (symbol_ids >= 0) & (latest >= 0)
+        unknown = int(np.count_nonzero(symbol_ids < 0))
+
+        symbol_ids = symbol_ids[known]
+        new_prices = prices[latest[known]]
+        self._last_price[symbol_ids] = new_prices
+
+        # Expand each symbol to its holdings (CSR gather)
+        starts = self._starts[symbol_ids]
+        counts = self._ends[symbol_ids] - starts
+        total = int(counts.sum())
+        if not total:
+            return Revaluation(self._family_ids, len(symbols), unknown)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        rows = self._order[offsets]
+        return self._revalue(rows, np.repeat(new_prices, counts), len(symbols), unknown)
+
+    def reprice_family(self, family_id: str) -> Revaluation:
+        """Revalue a family's holdings at the last price seen for each symbol"""
+        if self._index_dirty:
+            self._build_index()
+        rows = self._family_rows.get(self._family_index[family_id], np.zeros(0, dtype=np.int64))
+        row_prices = self._last_price[self._row_symbol[rows]]
+        priced = ~np.isnan(row_prices)
+        return self._revalue(rows[priced], row_prices[priced])
+
+    def _revalue(self, rows: np.ndarray, row_prices: np.ndarray, ticks: int = 0, unknown: int = 0) -> Revaluation:
+        """Set the given rows to units * price"""
+        if not len(rows):
+            return Revaluation(self._family_ids, ticks, unknown)
+        units = self._row_units[rows]
+        unanchored = np.isnan(units)
+        units[unanchored] = self._row_value[rows][unanchored] / row_prices[unanchored]
+        self._row_units[rows] = units
+
+        old_values = self._row_value[rows]
+        new_values = units * row_prices
+        self._row_value[rows] = new_values
+        family_index = self._row_family[rows]
+
+        return Revaluation(
+            self._family_ids, ticks, unknown,
+            family_index=family_index,
+            asset_ids=self._row_asset[rows],
+            values=new_values,
+            units=units,
+            material=approximate_values(old_values) != approximate_values(new_values)
+        )
+
+
+def commit_revaluation(engine: RevaluationEngine, result: Revaluation) -> int:
+    """
+    Write revalued holdings back to each family's shared state.
+
+    Each write is a compare-and-swap on the family's portfolio_version. If
+    the holdings were edited since the engine loaded them, the family is
+    reloaded, repriced at the latest prices and written again, so edits
+    made in the app are never overwritten. Returns the number of retries.
+    """
+    pending = dict(result.by_family())
+    retries = 0
+    while pending:
+        family_id, holdings = pending.popitem()
+        family = get_family_state(family_id)
+        with family.update(if_portfolio_version=engine.loaded_version(family_id)) as portfolio:
+            if portfolio is not None:
+                for asset in portfolio:
+                    if asset.get('id') in holdings:
+                        value, units = holdings[asset['id']]
+                        asset['value'] = int(round(value))
+                        asset['units'] = units
+        if portfolio is None:
+            retries += 1
+            version = family.portfolio_version
+            engine.load_family(family_id, family.get_portfolio(), version)
+            pending.update(engine.reprice_family(family_id).by_family())
+        else:
+            engine.mark_committed(family_id)
+    return retries
+
+
+def iter_csv_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Yield (symbols, prices) batches from a `symbol,price` CSV file"""
+    symbols, prices = [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 2:
+                continue
+            try:
+                price = float(row[1])
+            except ValueError:
+                continue  # Header or malformed line
+            symbols.append(row[0].strip().upper())
+            prices.append(price)
+            if len(symbols) >= batch_size:
+                yield symbols, prices
+                symbols, prices = [], []
+    if symbols:
+        yield symbols, prices
+
+
+def iter_socket_batches(host: str, port: int, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Yield (symbols, prices) batches from `symbol,price` lines sent over TCP.
+
+    Stand-in for a real market data feed: accepts one connection at a time
+    and flushes a batch when it is full or MAX_BATCH_DELAY_SECONDS old.
+    """
+    with socket.create_server((host, port)) as server:
+        while True:
+            conn, _ = server.accept()
+            conn.settimeout(MAX_BATCH_DELAY_SECONDS)
+            buffer = b""
+            symbols, prices = [], []
+            flushed_at = time.monotonic()
+            with conn:
+                while True:
+                    try:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            break
+                        buffer += chunk
+                    except socket.timeout:
+                        pass
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        parts = line.decode('utf-8', 'replace').split(',')
+                        try:
+                            prices.append(float(parts[1]))
+                        except (IndexError, ValueError):
+                            continue
+                        symbols.append(parts[0].strip().upper())
+                    if symbols and (len(symbols) >= batch_size
+                                    or time.monotonic() - flushed_at >= MAX_BATCH_DELAY_SECONDS):
+                        yield symbols, prices
+                        symbols, prices = [], []
+                        flushed_at = time.monotonic()
+            if symbols:
+                yield symbols, prices
+
+
+def run_feed(batches, family_ids: list):
+    """Apply price batches to the given families and report ticks/sec"""
+    engine = RevaluationEngine()
+    families = {family_id: get_family_state(family_id) for family_id in family_ids}
+    started = time.monotonic()
+    ticks = 0
+
+    for symbols, prices in batches:
+        # Pick up holdings added or edited in the app since the last batch
+        for family_id, family in families.items():
+            version = family.portfolio_version
+            if engine.loaded_version(family_id) != version:
+                engine.load_family(family_id, family.get_portfolio(), version)
+
+        result = engine.apply_ticks(symbols, prices)
+        retries = commit_revaluation(engine, result)
+
+        ticks += result.ticks
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(
+            f"{result.ticks} ticks, {result.holdings} holdings revalued "
+            f"({int(result.material.sum())} material), {result.unknown_symbols} unknown symbol(s), "
+            f"{retries} retried after app edits - {ticks / elapsed:,.0f} ticks/sec"
+        )
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Revalue symbol-bearing holdings from a price feed.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Path to a symbol,price CSV file")
+    source.add_argument("--listen", help="host:port to accept symbol,price lines on")
+    parser.add_argument("--family", action="append", dest="families",
+                        help="Family id to revalue (repeatable, default: all)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.csv:
+        batches = iter_csv_batches(args.csv, args.batch_size)
+    else:
+        host, port = args.listen.rsplit(':', 1)
+        batches = iter_socket_batches(host, int(port), args.batch_size)
+
+    run_feed(batches, args.families or list(FAMILY_HEIRS))
+
+
+if __name__ == "__main__":
+    main()
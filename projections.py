@@ -0,0 +1,102 @@
+# LegacyLoop - Growth Projections
+# Vectorized Monte Carlo growth projections for holdings and the whole
+# portfolio, from return and volatility assumptions per asset type
+
+from types import MappingProxyType
+
+import numpy as np
+import streamlit as st
+
+from data import ASSET_TYPES
+
+# Expected annual return and volatility per asset type (nominal, illustrative)
+TYPE_ASSUMPTIONS = {
+    'Equities': (0.08, 0.18),
+    'Index Fund': (0.07, 0.15),
+    'Bonds': (0.035, 0.06),
+    'Real Estate': (0.05, 0.12),
+    'Cryptocurrency': (0.10, 0.65),
+    'Private Equity': (0.10, 0.25),
+    'Cash/Savings': (0.02, 0.01),
+    'Alternative Investments': (0.06, 0.15),
+}
+
+# Used for holdings whose type has no assumption
+DEFAULT_ASSUMPTION = (0.05, 0.15)
+
+# Simulated paths per asset type
+PROJECTION_PATHS = 4000
+
+# Percentiles reported as the low / median / high band
+PROJECTION_PERCENTILES = (10, 50, 90)
+
+# Fixed seed so every session and replica shows the same projection
+PROJECTION_SEED = 2024
+
+# Horizons offered in the heir feed (years)
+PROJECTION_HORIZONS = (10, 20, 30)
+
+
+@st.cache_resource(max_entries=len(PROJECTION_HORIZONS) * 2)
+def simulate_growth(years: int) -> tuple:
+    """
+    Simulate yearly growth factors for every asset type (shared, read-only).
+
+    Returns (types, paths) where paths has shape (type, path, year) and
+    year 0 is 1.0; the last row (type None) uses DEFAULT_ASSUMPTION. Yearly
+    log returns are normal with the type's drift and volatility (geometric
+    Brownian motion, one step per year).
+    """
+    types = list(ASSET_TYPES) + [None]
+    assumptions = np.array([TYPE_ASSUMPTIONS.get(t, DEFAULT_ASSUMPTION) for t in types])
+    mu = assumptions[:, 0, None, None]
+    sigma = assumptions[:, 1, None, None]
+
+    rng = np.random.default_rng(PROJECTION_SEED)
+    shocks = rng.standard_normal((len(types), PROJECTION_PATHS, years))
+    log_returns = (mu - 0.5 * sigma ** 2) + sigma * shocks
+    paths = np.ones((len(types), PROJECTION_PATHS, years + 1))
+    paths[:, :, 1:] = np.exp(np.cumsum(log_returns, axis=2))
+    paths.setflags(write=False)
+    return types, paths
+
+
+@st.cache_resource(max_entries=64)
+def project_portfolio(family_id: str, portfolio_version: int, years: int, _portfolio: list) -> MappingProxyType:
+    """
+    Percentile bands for every holding and the portfolio total (shared, read-only).
+
+    Memoized by (family, portfolio version, horizon); the portfolio itself
+    is not hashed. The result is shared by every session rather than
+    pickled and copied on each rerun, so it is returned as read-only
+    mappings and arrays. Holdings of the same type share simulated paths, so a
+    holding's band is its value times its type's band, and the total is
+    simulated jointly with types moving independently.
+
+    Returns:
+        {'years': years,
+         'assets': {asset id: (low, median, high) at the horizon},
+         'total': array of shape (3, years + 1) with yearly bands}
+    """
+    types, paths = simulate_growth(years)
+    type_index = {t: i for i, t in enumerate(types)}
+    codes = np.array([type_index.get(asset.get('type'), len(types) - 1) for asset in _portfolio], dtype=np.int64)
+    values = np.array([float(asset.get('value', 0) or 0) for asset in _portfolio])
+
+    type_bands = np.percentile(paths[:, :, -1], PROJECTION_PERCENTILES, axis=1)  # (3, type)
+    asset_bands = type_bands[:, codes] * values  # (3, asset)
+
+    type_totals = np.bincount(codes, weights=values, minlength=len(types))
+    total_paths = np.tensordot(type_totals, paths, axes=(0, 0))  # (path, year)
+    total_bands = np.percentile(total_paths, PROJECTION_PERCENTILES, axis=0)
+    total_bands.setflags(write=False)
+
+    return MappingProxyType({
+        'years': years,
+        'assets': MappingProxyType({
+            asset['id']: tuple(float(v) for v in asset_bands[:, i])
+            for i, asset in enumerate(_portfolio)
+        }),
+        'total': total_bands,
+    })
+
@@ -0,0 +1,179 @@
+# LegacyLoop - Prompt Templates
+# Prompt templates parsed once, with local token estimates, per-call-type
+# token budgets, input canonicalization and truncation of over-budget inputs
+
+import re
+import string
+import unicodedata
+
+# Most tokens a rendered prompt may use, per call type
+PROMPT_TOKEN_BUDGETS = {
+    'mission_statement': 1200,
+    'heir_content': 400,
+    'advisor_email': 350,
+}
+
+# Average characters per token of a word (a rough rate for English text)
+CHARS_PER_TOKEN = 4
+
+# Words and single punctuation marks, the units the estimate counts
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Appended where an input was cut short
+TRUNCATION_MARKER = " […]"
+
+# A truncated input keeps at least this many tokens
+MIN_FIELD_TOKENS = 8
+
+# Cut at the last sentence end if that keeps at least this share of the text
+SENTENCE_CUT_MIN_SHARE = 0.6
+
+_SENTENCE_END = re.compile(r"[.!?]\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate model tokens: one per punctuation mark, one per CHARS_PER_TOKEN of a word"""
+    return sum(-(-len(piece) // CHARS_PER_TOKEN) for piece in TOKEN_PATTERN.findall(text))
+
+
+def canonical_text(text: str) -> str:
+    """Unicode-normalized text with whitespace collapsed to single spaces"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to about `max_tokens` tokens (marker included).
+
+    Cuts at the last sentence end when that keeps most of the text, and at
+    a word boundary otherwise.
+    """
+    if len(text) <= max_tokens or estimate_tokens(text) <= max_tokens:
+        return text
+    allowed = max(max_tokens, MIN_FIELD_TOKENS) - estimate_tokens(TRUNCATION_MARKER)
+    used = 0
+    end = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        tokens = -(-len(match.group()) // CHARS_PER_TOKEN)
+        if used + tokens > allowed:
+            if end == 0:  # A single word longer than the budget: cut inside it
+                end = match.start() + (allowed - used) * CHARS_PER_TOKEN
+            break
+        used += tokens
+        end = match.end()
+
+    sentence_ends = [m.start() + 1 for m in _SENTENCE_END.finditer(text, 0, end + 1)]
+    if sentence_ends and sentence_ends[-1] >= SENTENCE_CUT_MIN_SHARE * end:
+        end = sentence_ends[-1]
+    return text[:end].rstrip() + TRUNCATION_MARKER
+
+
+class PromptTemplate:
+    """
+    A prompt with `{field}` placeholders, parsed once.
+
+    `render()` canonicalizes text values (see canonical_text), so inputs
+    that differ only in whitespace or Unicode form give the same prompt
+    (and share cached answers). If the prompt would exceed its call type's
+    token budget, the longest values are shortened until it fits; the rest
+    stay whole. Non-text values (numbers) are formatted as-is.
+    """
+
+    def __init__(self, call_type: str, text: str):
+        self.call_type = call_type
+        self.budget = PROMPT_TOKEN_BUDGETS[call_type]
+        self._parts = []  # (literal, field, format spec)
+        self._uses = {}   # field -> occurrences
+        for literal, field, spec, _ in string.Formatter().parse(text):
+            self._parts.append((literal, field, spec or ''))
+            if field is not None:
+                self._uses[field] = self._uses.get(field, 0) + 1
+        self._fixed_tokens = estimate_tokens(''.join(literal for literal, _, _ in self._parts))
+
+    def render(self, **values) -> str:
+        """The prompt with the given field values, within budget"""
+        texts = {}
+        available = self.budget - self._fixed_tokens
+        for field, uses in self._uses.items():
+            value = values[field]
+            if isinstance(value, str):
+                texts[field] = canonical_text(value)
+            else:
+                available -= uses * estimate_tokens(str(value))
+
+        texts = self._fit(texts, available)
+        return ''.join(
+            literal + ('' if field is None else format(texts.get(field, values[field]), spec))
+            for literal, field, spec in self._parts
+        )
+
+    def _fit(self, texts: dict, available: int) -> dict:
+        # A token needs at least one character, so short inputs skip the estimate
+        if sum(len(text) * self._uses[field] for field, text in texts.items()) <= available:
+            return texts
+        # Canonical text has single spaces, so a token spans at most
+        # CHARS_PER_TOKEN + 1 characters: text beyond that cannot fit anyway
+        clipped = {field: text[:(max(available, 0) + 1) * (CHARS_PER_TOKEN + 1)] for field, text in texts.items()}
+        tokens = {field: estimate_tokens(text) for field, text in clipped.items()}
+        if clipped == texts and sum(tokens[field] * self._uses[field] for field in texts) <= available:
+            return texts
+        texts = clipped
+
+        # Shortest values stay whole; longer ones share what is left equally
+        remaining = max(available, 0)
+        fields = sorted(texts, key=tokens.get)
+        fitted = {}
+        for i, field in enumerate(fields):
+            share = remaining // sum(self._uses[f] for f in fields[i:])
+            limit = min(tokens[field], share)
+            fitted[field] = truncate_to_tokens(texts[field], limit) if limit < tokens[field] else texts[field]
+            remaining -= limit * self._uses[field]
+        return fitted
+
+    def estimate(self, **values) -> int:
+        """Estimated tokens of the rendered prompt"""
+        return estimate_tokens(self.render(**values))
+
+
+MISSION_PROMPT = PromptTemplate('mission_statement', """You are a specialized wealth consultant helping ultra-high-net-worth families articulate their legacy.
+
+Based on these inputs from the family patriarch:
+
+**Core Family Values:** {values}
+
+**Vision for the Family Wealth:** {goals}
+
+Draft a formal yet warm 3-paragraph Family Mission Statement that:
+1. Opens with a powerful statement about what wealth means to this family
+2. Articulates the core values and how they guide financial decisions
+3. Closes with a forward-looking pledge about legacy and future generations
+
+Keep it inspiring, authentic, and avoid generic platitudes. Make it feel personal to THIS family.""")
+
+HEIR_PROMPT = PromptTemplate('heir_content', """You are creating educational financial content for young adults who are inheriting wealth.
+
+Explain the asset '{asset_name}' (a {asset_type} worth about ${asset_value:,}) to a {age}-year-old who is interested in {interests}.
+
+Rules:
+- Explain why a wealthy family might own this for the long term
+- Connect it to concepts they'd understand (gaming, tech, social media analogies welcome)
+- Do NOT use financial jargon - explain like talking to a smart friend
+- Keep it under 100 words
+- Make it sound like a "Did you know?" fun fact
+- End with something that sparks curiosity
+
+Start directly with the content, no preamble.""")
+
+ADVISOR_EMAIL_PROMPT = PromptTemplate('advisor_email', """You are Sarah Jenkins, a financial advisor who has managed {client_name}'s wealth for 15 years.
+
+Draft a short, casual email to {heir_name} (the heir) who just expressed interest in learning about '{asset_name}'.
+
+Guidelines:
+- Keep it warm and low-pressure - you're building a relationship, not selling
+- Mention that {client_name} (their grandfather) has always been passionate about this investment
+- Offer to explain more over coffee or a quick call
+- Sound like a friendly mentor, not a stiff banker
+- Keep it under 100 words
+- Sign off as "Sarah"
+
+Write only the email body, no subject line.""")
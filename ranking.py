@@ -0,0 +1,120 @@
+# LegacyLoop - Legacy Card Ranking
+# Scores holdings against an heir's profile and picks the top cards for
+# their feed
+
+import heapq
+import math
+import threading
+
+from search import tokenize
+
+# How strongly each heir interest relates to each asset type (0-1)
+INTEREST_TYPE_AFFINITY = {
+    'Tech': {'Equities': 0.8, 'Private Equity': 0.6, 'Index Fund': 0.3},
+    'Gaming': {'Equities': 0.6, 'Private Equity': 0.4},
+    'Startups': {'Private Equity': 1.0, 'Alternative Investments': 0.6, 'Equities': 0.4},
+    'Crypto': {'Cryptocurrency': 1.0, 'Alternative Investments': 0.4},
+    'Art': {'Alternative Investments': 0.8, 'Real Estate': 0.3},
+    'Social Media': {'Equities': 0.6},
+    'Travel': {'Real Estate': 0.7},
+}
+
+# Words in a holding's name or description that signal an interest
+INTEREST_KEYWORDS = {
+    'Tech': {'tech', 'technology', 'software', 'cloud', 'computing', 'iphone', 'google', 'ai', 'semiconductor'},
+    'Gaming': {'gaming', 'games', 'game', 'xbox', 'playstation', 'nintendo', 'esports'},
+    'Startups': {'startup', 'startups', 'venture', 'seed', 'founder', 'innovative'},
+    'Crypto': {'crypto', 'bitcoin', 'ethereum', 'blockchain', 'token'},
+    'Art': {'art', 'artwork', 'gallery', 'collectible', 'collectibles', 'design'},
+    'Social Media': {'social', 'media', 'youtube', 'instagram', 'tiktok', 'creator'},
+    'Travel': {'travel', 'vacation', 'beachfront', 'hotel', 'resort', 'airline'},
+}
+
+# Affinity added per matching interest keyword
+KEYWORD_BONUS = 0.3
+
+# Score weights: interest affinity, value, and already asked the advisor
+INTEREST_WEIGHT = 1.0
+VALUE_WEIGHT = 0.3
+ENGAGED_PENALTY = 0.5
+
+# Values are weighted on a fixed log scale (so one holding's score never
+# depends on the others): $1 -> 0, $100M and up -> 1
+VALUE_SCALE_DIGITS = 8
+
+
+def interest_affinity(asset: dict, interests: list) -> float:
+    """0-1 match between a holding and an heir's interests"""
+    words = set(tokenize(asset.get('name', ''))) | set(tokenize(asset.get('description', '')))
+    best = 0.0
+    for interest in interests:
+        affinity = INTEREST_TYPE_AFFINITY.get(interest, {}).get(asset.get('type'), 0.0)
+        affinity += KEYWORD_BONUS * len(words & INTEREST_KEYWORDS.get(interest, set()))
+        best = max(best, affinity)
+    return min(best, 1.0)
+
+
+def value_weight(value) -> float:
+    """0-1 weight of a holding's value on a fixed log scale"""
+    if not value or value <= 1:
+        return 0.0
+    return min(math.log10(value) / VALUE_SCALE_DIGITS, 1.0)
+
+
+def score_asset(asset: dict, heir_profile: dict) -> float:
+    """Relevance of a holding to an heir, before engagement"""
+    return (
+        INTEREST_WEIGHT * interest_affinity(asset, heir_profile.get('interests', []))
+        + VALUE_WEIGHT * value_weight(asset.get('value'))
+    )
+
+
+class HeirRanker:
+    """
+    Picks the most relevant holdings for one heir.
+
+    Base scores are cached per holding and only recomputed when that
+    holding's name, type, description or value changes. Engagement is
+    folded in from new log entries only, and the top-K selection itself is
+    reused until the portfolio or the heir's engagement changes.
+    """
+
+    def __init__(self, heir_profile: dict):
+        self.heir_profile = heir_profile
+        self.logs_seen = 0
+        self._scores = {}    # asset id -> (fingerprint, base score)
+        self._engaged = set()  # asset names the heir asked the advisor about
+        self._ranked = None  # (portfolio version, engaged count, limit, assets)
+        self._lock = threading.Lock()
+
+    def observe_engagement(self, new_logs: list, start: int):
+        """Fold in engagement log entries read from position `start` on"""
+        with self._lock:
+            if start != self.logs_seen:
+                return  # Another session already folded these in
+            for log in new_logs:
+                if log.get('heir') == self.heir_profile['name']:
+                    self._engaged.add(log.get('asset'))
+            self.logs_seen += len(new_logs)
+
+    def _score(self, asset: dict) -> float:
+        fingerprint = (asset.get('name'), asset.get('type'), asset.get('description'), asset.get('value'))
+        cached = self._scores.get(asset['id'])
+        if cached is None or cached[0] != fingerprint:
+            cached = self._scores[asset['id']] = (fingerprint, score_asset(asset, self.heir_profile))
+        if asset.get('name') in self._engaged:
+            return cached[1] - ENGAGED_PENALTY
+        return cached[1]
+
+    def top(self, portfolio: list, limit: int, portfolio_version: int) -> list:
+        """The `limit` most relevant holdings, best first (ties keep portfolio order)"""
+        with self._lock:
+            state = (portfolio_version, len(self._engaged), limit)
+            if self._ranked is not None and self._ranked[:3] == state:
+                return list(self._ranked[3])
+            if len(self._scores) > 2 * len(portfolio):
+                current = {asset['id'] for asset in portfolio}
+                self._scores = {i: s for i, s in self._scores.items() if i in current}
+            ranked = heapq.nlargest(limit, portfolio, key=self._score)
+            self._ranked = state + (ranked,)
+            return list(ranked)
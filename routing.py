@@ -0,0 +1,240 @@
+# LegacyLoop - Model Routing
+# Picks a Gemini model per call type from measured latency and quality
+# settings, rate-limits calls, and hedges slow calls to cut tail latency
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import streamlit as st
+
+# Relative output quality of each model (higher is better)
+MODEL_QUALITY = {
+    'gemini-2.0-flash-lite': 1,
+    'gemini-2.0-flash': 2,
+    'gemini-2.5-flash': 3,
+}
+
+# Models each call type may use (in order of preference), the minimum quality
+# it needs, and whether slow calls are hedged with a duplicate request
+CALL_ROUTES = {
+    'heir_content': {
+        'models': ['gemini-2.0-flash-lite', 'gemini-2.0-flash'],
+        'min_quality': 1,
+        'hedge': True,
+    },
+    'advisor_email': {
+        'models': ['gemini-2.0-flash-lite', 'gemini-2.0-flash'],
+        'min_quality': 1,
+        'hedge': True,
+    },
+    'mission_statement': {
+        'models': ['gemini-2.0-flash', 'gemini-2.5-flash'],
+        'min_quality': 2,
+        'hedge': False,
+    },
+}
+
+# Latency samples kept per (model, call type)
+LATENCY_WINDOW = 200
+
+# Samples needed before a model's latency is trusted (and hedging starts)
+MIN_SAMPLES = 20
+
+# A preferred model is kept unless it is this much slower than the fastest
+LATENCY_TOLERANCE = 0.2
+
+# Models failing more often than this are skipped while alternatives exist
+MAX_ERROR_RATE = 0.5
+
+# Threads available for primary and hedge calls
+HEDGE_WORKERS = 16
+
+# Process-wide limit on calls sent to a model (cache hits are not counted)
+MODEL_CALLS_PER_SECOND = 4.0
+MODEL_CALL_BURST = 4
+
+
+def percentile(samples, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` calls per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float, burst: int = None):
+        """Change the limit (e.g. from a command-line option)"""
+        with self._lock:
+            self.rate = rate
+            if burst is not None:
+                self.burst = burst
+                self._tokens = min(self._tokens, float(burst))
+
+    def _take(self):
+        """Take a token if one is available; else return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """Take a token without waiting; False if none is available"""
+        return self._take() == 0.0
+
+    def acquire(self):
+        """Block until a call is allowed"""
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+
+class ModelRouter:
+    """
+    Chooses models from observed latency and runs calls with hedging.
+
+    Every call's latency (or failure) is recorded per (model, call type).
+    `choose()` keeps the preferred model unless another eligible model is
+    clearly faster; `call()` waits for a `limiter` token, then sends a
+    duplicate request when the first one runs past its observed p95 (if a
+    second token is free right away) and returns whichever answers first.
+    """
+
+    def __init__(self, default_model: str, rate_per_second: float = MODEL_CALLS_PER_SECOND,
+                 burst: int = MODEL_CALL_BURST):
+        self.default_model = default_model
+        self.limiter = RateLimiter(rate_per_second, burst)
+        self._latencies = {}
+        self._outcomes = {}
+        self._hedged = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="legacyloop-hedge")
+
+    def _record(self, model: str, call_type: str, latency: float, ok: bool):
+        key = (model, call_type)
+        with self._lock:
+            self._outcomes.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(ok)
+            if ok:
+                self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def latency_percentile(self, model: str, call_type: str, fraction: float = 0.95):
+        """Observed latency percentile in seconds, or None until MIN_SAMPLES"""
+        with self._lock:
+            samples = list(self._latencies.get((model, call_type), ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return percentile(samples, fraction)
+
+    def _error_rate(self, model: str, call_type: str) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes.get((model, call_type), ()))
+        if len(outcomes) < MIN_SAMPLES:
+            return 0.0
+        return 1 - sum(outcomes) / len(outcomes)
+
+    def choose(self, call_type: str) -> str:
+        """Pick the model for a call type"""
+        route = CALL_ROUTES.get(call_type)
+        if route is None:
+            return self.default_model
+
+        eligible = [
+            model for model in route['models']
+            if MODEL_QUALITY.get(model, 0) >= route['min_quality']
+        ]
+        healthy = [m for m in eligible if self._error_rate(m, call_type) <= MAX_ERROR_RATE] or eligible
+
+        # Warm up: measure each model before comparing them
+        p95s = {}
+        for model in healthy:
+            p95 = self.latency_percentile(model, call_type)
+            if p95 is None:
+                return model
+            p95s[model] = p95
+
+        fastest = min(p95s.values())
+        for model in healthy:
+            if p95s[model] <= fastest * (1 + LATENCY_TOLERANCE):
+                return model
+        return healthy[0]
+
+    def _timed(self, model: str, call_type: str, fn, args):
+        started = time.monotonic()
+        try:
+            result = fn(*args)
+        except Exception:
+            self._record(model, call_type, time.monotonic() - started, ok=False)
+            raise
+        self._record(model, call_type, time.monotonic() - started, ok=True)
+        return result
+
+    def call(self, call_type: str, model: str, fn, *args):
+        """
+        Run `fn(*args)` for `model`, hedging if the call type allows it.
+
+        Raises the last error if every attempt fails.
+        """
+        route = CALL_ROUTES.get(call_type, {})
+        self.limiter.acquire()
+        hedge_after = self.latency_percentile(model, call_type) if route.get('hedge') else None
+        if hedge_after is None:
+            return self._timed(model, call_type, fn, args)
+
+        primary = self._executor.submit(self._timed, model, call_type, fn, args)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        # The hedge is an extra model call: skip it rather than exceed the limit
+        if not self.limiter.try_acquire():
+            return primary.result()
+        with self._lock:
+            self._hedged += 1
+        backup = self._executor.submit(self._timed, model, call_type, fn, args)
+
+        error = None
+        for future in as_completed([primary, backup]):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
+
+    def stats(self) -> dict:
+        """Per (model, call type) latency percentiles and the hedge count"""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._latencies.items()}
+            hedged = self._hedged
+        return {
+            'hedged': hedged,
+            'latency': {
+                f"{model}/{call_type}": {
+                    'samples': len(samples),
+                    'p50': percentile(samples, 0.50),
+                    'p95': percentile(samples, 0.95),
+                    'p99': percentile(samples, 0.99),
+                }
+                for (model, call_type), samples in snapshot.items() if samples
+            },
+        }
+
+
+@st.cache_resource
+def get_model_router(default_model: str) -> ModelRouter:
+    """Get the process-wide model router"""
+    return ModelRouter(default_model)
@@ -0,0 +1,199 @@
+# LegacyLoop - Content Generation Scheduler
+# Orders the (heir x asset) generation matrix by priority and runs it
+# within a global concurrency limit (model calls are rate-limited in routing)
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import streamlit as st
+from services import build_heir_prompt, generate_heir_content, generation_key
+
+# Priorities (lower runs first)
+PRIORITY_VISIBLE = 0      # Card on screen for an heir who is online now
+PRIORITY_ONLINE = 1       # Rest of the feed for an online heir
+PRIORITY_OFFLINE = 2      # Pre-warming for heirs who are not online
+
+# Generation jobs running at once
+GENERATION_CONCURRENCY = 4
+
+# Window used to report throughput
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+def generation_priority(heir_online: bool, card_visible: bool) -> int:
+    """Pick a scheduler priority for one (heir, asset) card"""
+    if heir_online and card_visible:
+        return PRIORITY_VISIBLE
+    if heir_online:
+        return PRIORITY_ONLINE
+    return PRIORITY_OFFLINE
+
+
+class _Job:
+    __slots__ = ('key', 'priority', 'fn', 'args', 'future', 'started')
+
+    def __init__(self, key, priority, fn, args):
+        self.key = key
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.started = False
+
+
+class GenerationScheduler:
+    """
+    Priority queue of generation jobs served by a fixed pool of workers.
+
+    Jobs are keyed (normally by prompt hash): submitting a key that is
+    already queued or running returns the existing future, and raises its
+    priority if the new request is more urgent.
+    """
+
+    def __init__(self, concurrency: int = GENERATION_CONCURRENCY):
+        self.concurrency = concurrency
+        self._heap = []
+        self._jobs = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._completed_at = deque()
+        self._counts = {'submitted': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0}
+        self._running = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f"legacyloop-gen-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, key: str, fn, *args, priority: int = PRIORITY_OFFLINE) -> Future:
+        """Queue `fn(*args)` under `key` and return a future for its result"""
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._counts['deduplicated'] += 1
+                if not job.started and priority < job.priority:
+                    # Re-queue at the higher priority; the old entry is skipped
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._sequence), job))
+                    self._cond.notify()
+                return job.future
+
+            job = _Job(key, priority, fn, args)
+            self._jobs[key] = job
+            self._counts['submitted'] += 1
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+            self._cond.notify()
+            return job.future
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while True:
+                while self._heap:
+                    priority, _, job = heapq.heappop(self._heap)
+                    if not job.started and priority == job.priority:
+                        job.started = True
+                        self._running += 1
+                        return job
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            try:
+                result = job.fn(*job.args)
+            except Exception as e:
+                outcome = 'failed'
+                job.future.set_exception(e)
+            else:
+                outcome = 'completed'
+                job.future.set_result(result)
+            with self._cond:
+                self._running -= 1
+                self._counts[outcome] += 1
+                self._completed_at.append(time.monotonic())
+                del self._jobs[job.key]
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight jobs, counters and recent throughput"""
+        with self._cond:
+            cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+            while self._completed_at and self._completed_at[0] < cutoff:
+                self._completed_at.popleft()
+            return {
+                'queue_depth': len(self._jobs) - self._running,
+                'in_flight': self._running,
+                'throughput_per_min': len(self._completed_at) * 60 / THROUGHPUT_WINDOW_SECONDS,
+                **self._counts,
+            }
+
+
+@st.cache_resource
+def get_scheduler() -> GenerationScheduler:
+    """Get the process-wide generation scheduler"""
+    return GenerationScheduler()
+
+
+def submit_heir_content(scheduler: GenerationScheduler, asset: dict, heir_profile: dict,
+                        priority: int, api_key: str = None) -> Future:
+    """Schedule a Legacy Card explanation, sharing work between identical prompts"""
+    key = generation_key(build_heir_prompt(asset, heir_profile), api_key)
+    return scheduler.submit(key, generate_heir_content, asset, heir_profile, api_key, priority=priority)
+
+
+# Session attachment:
+# Jobs run on the scheduler's worker threads, not in the script run, so a
+# rerun (role switch, any click) never cancels them. Each session keeps the
+# futures it is waiting for in st.session_state.background_jobs and picks up
+# the results on a later rerun.
+
+# How often a page with unfinished jobs checks whether they are done
+JOB_POLL_SECONDS = 1
+
+
+def start_background_job(name, key: str, fn, *args, priority: int = PRIORITY_VISIBLE) -> Future:
+    """
+    Run `fn(*args)` on the shared scheduler and track it in this session.
+
+    `name` identifies the job within the session; `key` identifies the work
+    across sessions, so a rerun or another tab asking for the same work
+    attaches to the job that is already running.
+    """
+    future = get_scheduler().submit(key, fn, *args, priority=priority)
+    st.session_state.background_jobs[name] = future
+    return future
+
+
+def collect_background_job(name):
+    """
+    Take a finished job's result out of the session.
+
+    Returns None while the job is still running (or if there is no such
+    job); a failed job yields an "[API Error]" message like the services do.
+    """
+    jobs = st.session_state.background_jobs
+    future = jobs.get(name)
+    if future is None or not future.done():
+        return None
+    del jobs[name]
+    try:
+        return future.result()
+    except Exception as e:
+        return f"[API Error] {str(e)}"
+
+
+def unfinished_job_names() -> set:
+    """Names of this session's jobs that are still running"""
+    return {name for name, future in st.session_state.background_jobs.items() if not future.done()}
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def watch_background_jobs(job_names: tuple):
+    """Rerun the page as soon as any of the watched jobs finishes"""
+    jobs = st.session_state.background_jobs
+    if any(name not in jobs or jobs[name].done() for name in job_names):
+        st.rerun()
@@ -0,0 +1,207 @@
+# LegacyLoop - Holdings Search
+# In-memory inverted index over holding name, symbol, description and type
+# with prefix and typo-tolerant matching
+
+import bisect
+import heapq
+import itertools
+import re
+import threading
+
+# Asset fields that are searchable
+SEARCH_FIELDS = ('name', 'symbol', 'description', 'type')
+
+# Query tokens shorter than this only match whole words (very short
+# prefixes match a large share of the index)
+MIN_PREFIX_LENGTH = 3
+
+# Query tokens at least this long also match words one typo away
+MIN_FUZZY_LENGTH = 4
+
+# Score per query token by how well it matched a holding, best first
+MATCH_SCORES = (3, 2, 1)  # exact word, word prefix, one typo
+
+# Extra query words beyond this are ignored
+MAX_QUERY_TOKENS = 5
+
+# Vocabulary changes applied one by one to the sorted word list; larger
+# batches (e.g. the first sync of a big portfolio) re-sort it instead
+MAX_INCREMENTAL_WORDS = 256
+
+# Results returned when no limit is given
+DEFAULT_LIMIT = 50
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase alphanumeric words of a string"""
+    return _TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+def _deletes(token: str) -> set:
+    """The token with one character removed, at every position"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+class HoldingIndex:
+    """
+    Inverted index from words to holding ids.
+
+    Words are kept in a sorted list for prefix range scans, and every word
+    is also filed under each of its one-character deletions so words one
+    typo away from a query token are found without scanning the vocabulary.
+    `sync()` only re-indexes holdings whose searchable fields changed.
+    """
+
+    def __init__(self):
+        self._postings = {}   # word -> set of asset ids
+        self._words = []      # sorted vocabulary (see _sorted_words)
+        self._added_words = set()
+        self._removed_words = set()
+        self._variants = {}   # one-deletion variant -> set of words
+        self._documents = {}  # asset id -> (field values, words)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add_word(self, word: str, asset_id: int):
+        ids = self._postings.get(word)
+        if ids is None:
+            ids = self._postings[word] = set()
+            if word in self._removed_words:
+                self._removed_words.discard(word)
+            else:
+                self._added_words.add(word)
+            if len(word) >= MIN_FUZZY_LENGTH - 1:
+                for variant in _deletes(word):
+                    self._variants.setdefault(variant, set()).add(word)
+        ids.add(asset_id)
+
+    def _remove_word(self, word: str, asset_id: int):
+        ids = self._postings[word]
+        ids.discard(asset_id)
+        if ids:
+            return
+        del self._postings[word]
+        if word in self._added_words:
+            self._added_words.discard(word)
+        else:
+            self._removed_words.add(word)
+        if len(word) >= MIN_FUZZY_LENGTH - 1:
+            for variant in _deletes(word):
+                words = self._variants[variant]
+                words.discard(word)
+                if not words:
+                    del self._variants[variant]
+
+    def add(self, asset: dict):
+        """Index a holding (replacing any previous version of it)"""
+        with self._lock:
+            self._add(asset)
+
+    def _add(self, asset: dict):
+        asset_id = asset['id']
+        fields = tuple(asset.get(field, '') for field in SEARCH_FIELDS)
+        if asset_id in self._documents:
+            if self._documents[asset_id][0] == fields:
+                return
+            self._remove(asset_id)
+        words = {word for value in fields for word in tokenize(value)}
+        for word in words:
+            self._add_word(word, asset_id)
+        self._documents[asset_id] = (fields, words)
+
+    def remove(self, asset_id: int):
+        """Drop a holding from the index"""
+        with self._lock:
+            self._remove(asset_id)
+
+    def _remove(self, asset_id: int):
+        document = self._documents.pop(asset_id, None)
+        if document is None:
+            return
+        for word in document[1]:
+            self._remove_word(word, asset_id)
+
+    def sync(self, portfolio: list):
+        """Bring the index in line with a portfolio, touching only changed holdings"""
+        with self._lock:
+            current = set()
+            for asset in portfolio:
+                current.add(asset['id'])
+                self._add(asset)
+            for asset_id in [i for i in self._documents if i not in current]:
+                self._remove(asset_id)
+            self._sorted_words()
+
+    def _sorted_words(self) -> list:
+        """The vocabulary in sorted order, with pending changes applied"""
+        if len(self._added_words) + len(self._removed_words) > MAX_INCREMENTAL_WORDS:
+            self._words = sorted(self._postings)
+        else:
+            for word in self._removed_words:
+                del self._words[bisect.bisect_left(self._words, word)]
+            for word in self._added_words:
+                bisect.insort(self._words, word)
+        self._added_words.clear()
+        self._removed_words.clear()
+        return self._words
+
+    def _match(self, token: str) -> tuple:
+        """Disjoint (exact, prefix, typo) sets of asset ids for one query token"""
+        exact = self._postings.get(token, set())
+
+        prefix = set()
+        if len(token) >= MIN_PREFIX_LENGTH:
+            words = self._sorted_words()
+            start = bisect.bisect_left(words, token)
+            end = bisect.bisect_left(words, token[:-1] + chr(ord(token[-1]) + 1), lo=start)
+            prefix = set().union(*[self._postings[word] for word in words[start:end]]) - exact
+
+        fuzzy = set()
+        if len(token) >= MIN_FUZZY_LENGTH:
+            near = _deletes(token) & self._postings.keys()
+            for variant in _deletes(token) | {token}:
+                near |= self._variants.get(variant, set())
+            near.discard(token)
+            fuzzy = set().union(*[self._postings[word] for word in near]) - exact - prefix
+
+        return exact, prefix, fuzzy
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """
+        Ids of holdings matching every word of the query, best matches first.
+
+        Each word matches whole words, word prefixes, and (for longer words)
+        words with one typo. Holdings are ranked by their summed match
+        scores, then by id.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        if not tokens:
+            return []
+        with self._lock:
+            tiers = [self._match(token) for token in tokens]
+        if any(not (exact or prefix or fuzzy) for exact, prefix, fuzzy in tiers):
+            return []
+
+        # Every combination of per-token match kinds is a disjoint group of
+        # holdings with the same total score; walk them best score first
+        # and stop once the limit is filled
+        combos = {}
+        for combo in itertools.product(range(len(MATCH_SCORES)), repeat=len(tokens)):
+            score = sum(MATCH_SCORES[kind] for kind in combo)
+            combos.setdefault(score, []).append(combo)
+
+        results = []
+        for score in sorted(combos, reverse=True):
+            group = set()
+            for combo in combos[score]:
+                sets = sorted((tiers[t][kind] for t, kind in enumerate(combo)), key=len)
+                if sets[0]:
+                    group |= sets[0].intersection(*sets[1:])
+            results.extend(heapq.nsmallest(limit - len(results), group))
+            if len(results) >= limit:
+                break
+        return results
@@ -1,14 +1,40 @@
 # LegacyLoop - AI Services Layer
 # Handles all Gemini API interactions with graceful fallbacks
 
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+from data import approximate_value
+from memory import LRUDict
+from prompts import ADVISOR_EMAIL_PROMPT, HEIR_PROMPT, MISSION_PROMPT
+from routing import CALL_ROUTES, get_model_router
+from storage import get_storage_backend
 
 try:
-    import google.generativeai as genai
+    # Low-level client shipped with google-generativeai; unlike genai.configure
+    # it takes the API key per client instead of process-wide
+    from google.ai import generativelanguage as glm
     GENAI_AVAILABLE = True
 except ImportError:
     GENAI_AVAILABLE = False
 
+# Model used for calls without a route (see routing.CALL_ROUTES)
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Timeout for calls sent to GEMINI_API_ENDPOINT
+ENDPOINT_TIMEOUT_SECONDS = 60
+
+# SDK clients kept, one per API key
+SDK_CLIENT_LIMIT = 16
+
+# Number of drafts offered side by side when regenerating a mission statement
+MISSION_CANDIDATE_COUNT = 3
+
 # Fallback responses for simulation mode
 FALLBACK_RESPONSES = {
     'mission_statement': """**The Moneybags Family Mission Statement**
@@ -31,7 +57,7 @@ Sarah"""
 
 
 def get_api_key():
-    """Get API key from session state or secrets"""
+    """Get API key from session state, secrets or the environment"""
     # First check session state (user-provided key)
     if 'gemini_api_key' in st.session_state and st.session_state.gemini_api_key:
         return st.session_state.gemini_api_key
@@ -43,64 +69,184 @@ def get_api_key():
     except Exception:
         pass
     
-    return None
+    # Finally the environment (.env), used by the command-line tools
+    return os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+
+
+def get_api_endpoint() -> str:
+    """
+    Base URL of a Gemini-compatible REST endpoint, or None for the SDK.
+
+    Set GEMINI_API_ENDPOINT (e.g. http://127.0.0.1:8765 for the load-test
+    fake server) to send generateContent calls there over plain HTTP.
+    """
+    return os.environ.get("GEMINI_API_ENDPOINT") or None
 
 
-def get_gemini_response(prompt: str, model: str = "gemini-2.0-flash") -> str:
+def get_job_api_key() -> str:
+    """API key to hand to background jobs ("" when in simulation mode)"""
+    return get_api_key() or ""
+
+
+def get_gemini_response(prompt: str, model: str = None, api_key: str = None, call_type: str = None) -> str:
     """
     Get response from Gemini API with graceful fallback.
     
     Args:
         prompt: The prompt to send to Gemini
-        model: The model to use (default: gemini-2.0-flash)
+        model: The model to use (default: routed by call type, see routing.py)
+        api_key: Key to use; looked up from the session/secrets if omitted.
+            Background threads cannot see the user's session state, so jobs
+            get it from get_job_api_key() ("" means simulation mode).
+        call_type: 'heir_content', 'mission_statement' or 'advisor_email';
+            selects the model route and whether slow calls are hedged
     
     Returns:
         Generated text response or fallback string
     """
-    api_key = get_api_key()
+    if api_key is None:
+        api_key = get_api_key()
     
-    if not GENAI_AVAILABLE:
+    if not GENAI_AVAILABLE and not get_api_endpoint():
         return "[Simulation Mode] google-generativeai package not installed."
     
     if not api_key:
         return None  # Return None to trigger fallback handling
     
+    router = get_model_router(DEFAULT_MODEL)
+    if model is None:
+        model = router.choose(call_type)
+    
     try:
-        genai.configure(api_key=api_key)
-        model_instance = genai.GenerativeModel(model)
-        response = model_instance.generate_content(prompt)
-        return response.text
+        return router.call(call_type, model, _generate_text, prompt, model, api_key)
     except Exception as e:
         return f"[API Error] {str(e)}"
 
 
-def generate_mission_statement(values: str, goals: str) -> str:
+_sdk_clients = LRUDict(SDK_CLIENT_LIMIT)
+_sdk_clients_lock = threading.Lock()
+
+
+def _sdk_client(api_key: str):
+    """
+    Generative Language client bound to one API key.
+
+    genai.configure() swaps a process-global client, so concurrent sessions
+    using different keys could send each other's calls; each key gets its
+    own client instead.
+    """
+    with _sdk_clients_lock:
+        client = _sdk_clients.get(api_key)
+        if client is None:
+            client = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+            _sdk_clients[api_key] = client
+        return client
+
+
+def _generate_text(prompt: str, model: str, api_key: str) -> str:
+    """Single Gemini call; raises on failure"""
+    endpoint = get_api_endpoint()
+    if endpoint:
+        return _generate_text_rest(endpoint, prompt, model, api_key)
+    response = _sdk_client(api_key).generate_content(
+        model=f"models/{model}",
+        contents=[glm.Content(parts=[glm.Part(text=prompt)])]
+    )
+    return ''.join(part.text for part in response.candidates[0].content.parts)
+
+
+def _generate_text_rest(endpoint: str, prompt: str, model: str, api_key: str) -> str:
+    """Single generateContent call over REST; raises on failure"""
+    request = urllib.request.Request(
+        f"{endpoint.rstrip('/')}/v1beta/models/{model}:generateContent",
+        data=json.dumps({'contents': [{'parts': [{'text': prompt}]}]}).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'x-goog-api-key': api_key}
+    )
+    with urllib.request.urlopen(request, timeout=ENDPOINT_TIMEOUT_SECONDS) as response:
+        body = json.loads(response.read())
+    return ''.join(part.get('text', '') for part in body['candidates'][0]['content']['parts'])
+
+
+def api_key_mode(api_key: str) -> str:
+    """'live' if calls made with this key reach a model, else 'simulation'"""
+    if api_key and (GENAI_AVAILABLE or get_api_endpoint()):
+        return 'live'
+    return 'simulation'
+
+
+def generation_key(prompt: str, api_key: str) -> str:
+    """
+    Name of the job generating a response to `prompt`.
+
+    The key mode is part of the name, so simulation sessions never share
+    jobs with live ones.
+    """
+    digest = hashlib.sha256(f"{api_key_mode(api_key)}\n{prompt}".encode('utf-8')).hexdigest()
+    return f"generate:{digest}"
+
+
+def response_cache_key(prompt: str, model: str, api_key: str) -> str:
+    """Storage key for `model`'s cached response to `prompt` in the key's mode"""
+    digest = hashlib.sha256(f"{api_key_mode(api_key)}\n{model}\n{prompt}".encode('utf-8')).hexdigest()
+    return f"gemini:{digest}"
+
+
+def get_cached_response(prompt: str, call_type: str, api_key: str):
+    """A stored answer from any model routed for `call_type`, or None"""
+    backend = get_storage_backend()
+    for model in CALL_ROUTES.get(call_type, {}).get('models', [DEFAULT_MODEL]):
+        cached = backend.get(response_cache_key(prompt, model, api_key))
+        if cached is not None:
+            return cached
+    return None
+
+
+def is_usable_response(response) -> bool:
+    """True for real model output (not a fallback, simulation or error marker)"""
+    return response is not None and not response.startswith(("[Simulation Mode]", "[API Error]"))
+
+
+def get_cached_gemini_response(prompt: str, api_key: str = None, call_type: str = None) -> str:
+    """
+    Get a Gemini response, reusing answers stored in the shared backend.
+    
+    Identical prompts are answered once for every session and replica; an
+    answer from any model on the call type's route is reused. Errors and
+    fallbacks are never cached.
+    """
+    if api_key is None:
+        api_key = get_api_key()
+    
+    cached = get_cached_response(prompt, call_type, api_key)
+    if cached is not None:
+        return cached
+    
+    model = get_model_router(DEFAULT_MODEL).choose(call_type)
+    response = get_gemini_response(prompt, model=model, api_key=api_key, call_type=call_type)
+    if is_usable_response(response):
+        get_storage_backend().set(response_cache_key(prompt, model, api_key), response)
+    
+    return response
+
+
+def build_mission_prompt(values: str, goals: str) -> str:
+    """Build the Family Mission Statement prompt (see prompts.py)"""
+    return MISSION_PROMPT.render(values=values, goals=goals)
+
+
+def generate_mission_statement(values: str, goals: str, api_key: str = None) -> str:
     """
     Generate a Family Mission Statement based on values and goals.
     
     Args:
         values: Core family values (e.g., "Hard work, education, philanthropy")
         goals: What the client wants their money to do
+        api_key: Optional explicit key (see get_gemini_response)
     
     Returns:
         Formatted mission statement
     """
-    prompt = f"""You are a specialized wealth consultant helping ultra-high-net-worth families articulate their legacy.
-
-Based on these inputs from the family patriarch:
-
-**Core Family Values:** {values}
-
-**Vision for the Family Wealth:** {goals}
-
-Draft a formal yet warm 3-paragraph Family Mission Statement that:
-1. Opens with a powerful statement about what wealth means to this family
-2. Articulates the core values and how they guide financial decisions
-3. Closes with a forward-looking pledge about legacy and future generations
-
-Keep it inspiring, authentic, and avoid generic platitudes. Make it feel personal to THIS family."""
-    
-    response = get_gemini_response(prompt)
+    response = get_gemini_response(build_mission_prompt(values, goals), api_key=api_key, call_type='mission_statement')
     
     if response is None:
         return FALLBACK_RESPONSES['mission_statement']
@@ -108,39 +254,95 @@ Keep it inspiring, authentic, and avoid generic platitudes. Make it feel persona
     return response
 
 
-def generate_heir_content(asset: dict, heir_profile: dict) -> str:
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different inputs match"""
+    return ' '.join(text.split()).casefold()
+
+
+def generate_mission_statement_candidates(values: str, goals: str, count: int = MISSION_CANDIDATE_COUNT,
+                                          refresh: bool = False, api_key: str = None) -> list:
     """
-    Generate educational content about an asset tailored to the heir's profile.
+    Generate several alternative mission statements concurrently.
+    
+    Every draft goes through the model router, so it counts against the
+    process-wide rate limit. Candidates are cached in the shared backend by
+    key mode, model and normalized (values, goals), so unchanged inputs
+    return the same drafts without calling the model again unless
+    `refresh` is set.
     
     Args:
-        asset: Asset dictionary with name, value, type, etc.
-        heir_profile: Heir's profile with age, interests, fin_lit_level
+        values: Core family values
+        goals: What the client wants their money to do
+        count: Number of drafts to request
+        refresh: Ignore cached drafts and generate a new set
+        api_key: Optional explicit key (see get_gemini_response)
     
     Returns:
-        Engaging explanation of the asset
+        List of usable drafts: the simulation fallback without an API key,
+        and empty if every call failed
     """
-    asset_name = asset.get('name', 'Unknown Asset')
-    asset_type = asset.get('type', 'Investment')
-    asset_value = asset.get('value', 0)
+    if api_key is None:
+        api_key = get_api_key()
     
-    age = heir_profile.get('age', 22)
-    interests = ', '.join(heir_profile.get('interests', ['general topics']))
+    if api_key_mode(api_key) == 'simulation':
+        return [FALLBACK_RESPONSES['mission_statement']]
     
-    prompt = f"""You are creating educational financial content for young adults who are inheriting wealth.
+    backend = get_storage_backend()
+    model = get_model_router(DEFAULT_MODEL).choose('mission_statement')
+    digest = hashlib.sha256(
+        f"{api_key_mode(api_key)}\n{model}\n{count}\n{normalize_text(values)}\n{normalize_text(goals)}".encode('utf-8')
+    ).hexdigest()
+    key = f"mission_candidates:{digest}"
+    
+    if not refresh:
+        cached = backend.get(key)
+        if cached:
+            return cached
+    
+    prompt = build_mission_prompt(values, goals)
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [
+            executor.submit(get_gemini_response, prompt, model=model, api_key=api_key, call_type='mission_statement')
+            for _ in range(count)
+        ]
+        candidates = [future.result() for future in futures]
+    
+    candidates = [candidate for candidate in candidates if is_usable_response(candidate)]
+    if candidates:
+        backend.set(key, candidates)
+    return candidates
 
-Explain the asset '{asset_name}' (a {asset_type} worth ${asset_value:,}) to a {age}-year-old who is interested in {interests}.
 
-Rules:
-- Explain why a wealthy family might own this for the long term
-- Connect it to concepts they'd understand (gaming, tech, social media analogies welcome)
-- Do NOT use financial jargon - explain like talking to a smart friend
-- Keep it under 100 words
-- Make it sound like a "Did you know?" fun fact
-- End with something that sparks curiosity
+def build_heir_prompt(asset: dict, heir_profile: dict) -> str:
+    """
+    Build the Legacy Card prompt for an asset and heir.
+    
+    Heirs whose profiles produce the same prompt share one generation. The
+    value is rounded so small price moves do not invalidate the card.
+    """
+    return HEIR_PROMPT.render(
+        asset_name=asset.get('name', 'Unknown Asset'),
+        asset_type=asset.get('type', 'Investment'),
+        asset_value=approximate_value(asset.get('value', 0)),
+        age=heir_profile.get('age', 22),
+        interests=', '.join(heir_profile.get('interests', ['general topics']))
+    )
 
-Start directly with the content, no preamble."""
+
+def generate_heir_content(asset: dict, heir_profile: dict, api_key: str = None) -> str:
+    """
+    Generate educational content about an asset tailored to the heir's profile.
     
-    response = get_gemini_response(prompt)
+    Args:
+        asset: Asset dictionary with name, value, type, etc.
+        heir_profile: Heir's profile with age, interests, fin_lit_level
+        api_key: Optional explicit key (see get_gemini_response)
+    
+    Returns:
+        Engaging explanation of the asset
+    """
+    prompt = build_heir_prompt(asset, heir_profile)
+    response = get_cached_gemini_response(prompt, api_key=api_key, call_type='heir_content')
     
     if response is None:
         return FALLBACK_RESPONSES['heir_content']
@@ -148,7 +350,12 @@ Start directly with the content, no preamble."""
     return response
 
 
-def generate_advisor_email(asset_name: str, heir_name: str, client_name: str) -> str:
+def build_advisor_prompt(asset_name: str, heir_name: str, client_name: str) -> str:
+    """Build the advisor outreach email prompt (see prompts.py)"""
+    return ADVISOR_EMAIL_PROMPT.render(asset_name=asset_name, heir_name=heir_name, client_name=client_name)
+
+
+def generate_advisor_email(asset_name: str, heir_name: str, client_name: str, api_key: str = None) -> str:
     """
     Generate a casual outreach email from advisor to heir.
     
@@ -156,25 +363,14 @@ def generate_advisor_email(asset_name: str, heir_name: str, client_name: str) ->
         asset_name: The asset the heir showed interest in
         heir_name: Name of the heir
         client_name: Name of the primary client (grandfather/parent)
+        api_key: Optional explicit key (see get_gemini_response)
     
     Returns:
         Draft email text
     """
-    prompt = f"""You are Sarah Jenkins, a financial advisor who has managed {client_name}'s wealth for 15 years.
-
-Draft a short, casual email to {heir_name} (the heir) who just expressed interest in learning about '{asset_name}'.
-
-Guidelines:
-- Keep it warm and low-pressure - you're building a relationship, not selling
-- Mention that {client_name} (their grandfather) has always been passionate about this investment
-- Offer to explain more over coffee or a quick call
-- Sound like a friendly mentor, not a stiff banker
-- Keep it under 100 words
-- Sign off as "Sarah"
-
-Write only the email body, no subject line."""
+    prompt = build_advisor_prompt(asset_name, heir_name, client_name)
     
-    response = get_gemini_response(prompt)
+    response = get_gemini_response(prompt, api_key=api_key, call_type='advisor_email')
     
     if response is None:
         return FALLBACK_RESPONSES['advisor_email'].replace('Leo', heir_name)
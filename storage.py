@@ -0,0 +1,403 @@
+# LegacyLoop - Storage Backends
+# Pluggable shared storage so any replica can serve any session
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import streamlit as st
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Used when no STORAGE_URL is configured (single-process demo)
+DEFAULT_STORAGE_URL = "memory://"
+
+
+class StorageBackend(ABC):
+    """
+    Minimal key/value, counter and list store shared by all sessions.
+
+    Values must be JSON-serializable; every backend stores them as JSON text
+    so callers always get independent copies back, whichever backend is used.
+    """
+
+    @abstractmethod
+    def get(self, key: str, default=None):
+        """Get a value, or `default` if the key is missing"""
+
+    @abstractmethod
+    def set(self, key: str, value):
+        """Store a value under a key"""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove a key (value or list) if it exists"""
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        """Atomically increment a counter and return the new value"""
+
+    @abstractmethod
+    def append(self, key: str, value) -> int:
+        """Append to a list and return the new list length"""
+
+    @abstractmethod
+    def extend(self, key: str, values: list) -> int:
+        """Append several items in one write and return the new list length"""
+
+    @abstractmethod
+    def get_list(self, key: str, start: int = 0, end: int = None) -> list:
+        """Get list items in [start, end) (the whole list by default)"""
+
+    @abstractmethod
+    def list_length(self, key: str) -> int:
+        """Get the number of items in a list"""
+
+    @abstractmethod
+    def _try_acquire(self, name: str, token: str, ttl: float) -> bool:
+        """Take the named lock for `token` unless someone else holds it"""
+
+    @abstractmethod
+    def _release(self, name: str, token: str):
+        """Drop the named lock if `token` still holds it"""
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 10.0, ttl: float = 30.0):
+        """
+        Hold a named lock that is visible to every process using this store.
+
+        The lock expires after `ttl` seconds so a crashed replica cannot
+        block the family forever. Locks are not reentrant.
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self._try_acquire(name, token, ttl):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Could not acquire storage lock '{name}'")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            self._release(name, token)
+
+
+class MemoryBackend(StorageBackend):
+    """In-process storage (single replica, lost on restart)"""
+
+    def __init__(self):
+        self._values = {}
+        self._lists = {}
+        self._locks = {}
+        self._mutex = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._mutex:
+            raw = self._values.get(key)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        raw = json.dumps(value)
+        with self._mutex:
+            self._values[key] = raw
+
+    def delete(self, key):
+        with self._mutex:
+            self._values.pop(key, None)
+            self._lists.pop(key, None)
+
+    def incr(self, key):
+        with self._mutex:
+            value = json.loads(self._values.get(key, '0')) + 1
+            self._values[key] = json.dumps(value)
+        return value
+
+    def append(self, key, value):
+        raw = json.dumps(value)
+        with self._mutex:
+            items = self._lists.setdefault(key, [])
+            items.append(raw)
+            return len(items)
+
+    def extend(self, key, values):
+        raws = [json.dumps(value) for value in values]
+        with self._mutex:
+            items = self._lists.setdefault(key, [])
+            items.extend(raws)
+            return len(items)
+
+    def get_list(self, key, start=0, end=None):
+        with self._mutex:
+            items = self._lists.get(key, [])[start:end]
+        return [json.loads(raw) for raw in items]
+
+    def list_length(self, key):
+        with self._mutex:
+            return len(self._lists.get(key, []))
+
+    def _try_acquire(self, name, token, ttl):
+        now = time.monotonic()
+        with self._mutex:
+            holder = self._locks.get(name)
+            if holder and holder[1] > now:
+                return False
+            self._locks[name] = (token, now + ttl)
+            return True
+
+    def _release(self, name, token):
+        with self._mutex:
+            if self._locks.get(name, (None,))[0] == token:
+                del self._locks[name]
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Storage in a SQLite file in WAL mode.
+
+    Put the file on a volume shared by the replicas (or run replicas on one
+    host) to get consistent state without running a separate server.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS list_items (
+                key TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (key, pos)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS locks (
+                name TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One autocommit connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Run statements in a single write transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        self._conn().execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    def delete(self, key):
+        with self._write() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            conn.execute("DELETE FROM list_items WHERE key = ?", (key,))
+
+    def incr(self, key):
+        with self._write() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + 1
+            conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value))
+            )
+        return value
+
+    def append(self, key, value):
+        with self._write() as conn:
+            pos = conn.execute(
+                "SELECT COALESCE(MAX(pos) + 1, 0) FROM list_items WHERE key = ?", (key,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO list_items (key, pos, value) VALUES (?, ?, ?)",
+                (key, pos, json.dumps(value))
+            )
+        return pos + 1
+
+    def extend(self, key, values):
+        with self._write() as conn:
+            pos = conn.execute(
+                "SELECT COALESCE(MAX(pos) + 1, 0) FROM list_items WHERE key = ?", (key,)
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO list_items (key, pos, value) VALUES (?, ?, ?)",
+                [(key, pos + i, json.dumps(value)) for i, value in enumerate(values)]
+            )
+        return pos + len(values)
+
+    def get_list(self, key, start=0, end=None):
+        if end is None:
+            rows = self._conn().execute(
+                "SELECT value FROM list_items WHERE key = ? AND pos >= ? ORDER BY pos",
+                (key, start)
+            )
+        else:
+            rows = self._conn().execute(
+                "SELECT value FROM list_items WHERE key = ? AND pos >= ? AND pos < ? ORDER BY pos",
+                (key, start, end)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def list_length(self, key):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM list_items WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+    def _try_acquire(self, name, token, ttl):
+        now = time.time()
+        with self._write() as conn:
+            conn.execute("DELETE FROM locks WHERE name = ? AND expires <= ?", (name, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (name, token, expires) VALUES (?, ?, ?)",
+                (name, token, now + ttl)
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, name, token):
+        self._conn().execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+
+class RedisBackend(StorageBackend):
+    """
+    Storage on a Redis-protocol server (Redis, Valkey, KeyDB...).
+
+    Takes any client with the redis-py API, so a local stand-in such as
+    fakeredis can be plugged in for development.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key, default=None):
+        raw = self.client.get(key)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(key, json.dumps(value))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return int(self.client.incr(key))
+
+    def append(self, key, value):
+        return int(self.client.rpush(key, json.dumps(value)))
+
+    def extend(self, key, values):
+        if not values:
+            return self.list_length(key)
+        return int(self.client.rpush(key, *(json.dumps(value) for value in values)))
+
+    def get_list(self, key, start=0, end=None):
+        stop = -1 if end is None else end - 1
+        if end is not None and end <= start:
+            return []
+        return [json.loads(raw) for raw in self.client.lrange(key, start, stop)]
+
+    def list_length(self, key):
+        return int(self.client.llen(key))
+
+    def _try_acquire(self, name, token, ttl):
+        return bool(self.client.set(name, token, nx=True, px=int(ttl * 1000)))
+
+    def _release(self, name, token):
+        # Only delete the lock if we still own it
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(name)
+                if pipe.get(name) == token:
+                    pipe.multi()
+                    pipe.delete(name)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+            except Exception:
+                pass
+
+
+def create_backend(url: str) -> StorageBackend:
+    """
+    Create a storage backend from a URL.
+
+    Supported forms:
+        memory://                    In-process (default, single replica)
+        sqlite:///legacyloop.db      SQLite file (relative path)
+        sqlite:////var/data/ll.db    SQLite file (absolute path)
+        redis://host:6379/0          Redis-protocol server (needs `redis`)
+        fakeredis://                 Local Redis stand-in (needs `fakeredis`)
+    """
+    if url.startswith("memory://"):
+        return MemoryBackend()
+
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("STORAGE_URL points at Redis but the `redis` package is not installed.")
+        return RedisBackend(redis.Redis.from_url(url, decode_responses=True))
+
+    if url.startswith("fakeredis://"):
+        try:
+            import fakeredis
+        except ImportError:
+            raise RuntimeError("STORAGE_URL points at fakeredis but the `fakeredis` package is not installed.") from None
+        return RedisBackend(fakeredis.FakeRedis(decode_responses=True))
+
+    raise ValueError(f"Unsupported STORAGE_URL: {url}")
+
+
+def get_storage_url() -> str:
+    """Get the storage URL from the environment or secrets"""
+    url = os.environ.get("LEGACYLOOP_STORAGE_URL")
+    if url:
+        return url
+
+    try:
+        if "STORAGE_URL" in st.secrets:
+            return st.secrets["STORAGE_URL"]
+    except Exception:
+        pass
+
+    return DEFAULT_STORAGE_URL
+
+
+@st.cache_resource
+def get_storage_backend() -> StorageBackend:
+    """Get the process-wide storage backend"""
+    return create_backend(get_storage_url())
@@ -0,0 +1,34 @@
+from analytics import EngagementAnalytics, current_timestamp
+
+NOW = current_timestamp()
+
+
+def event(timestamp, heir='Leo', asset='Apple Inc', asset_type='Equities'):
+    return {'timestamp': timestamp, 'heir': heir, 'action': 'Asked Advisor', 'asset': asset, 'asset_type': asset_type}
+
+
+def test_malformed_timestamps_are_skipped():
+    analytics = EngagementAnalytics()
+    analytics.ingest('fam', [
+        event('2024-01-02 03:04:05'),
+        event('yesterday-ish'),
+        event(None, asset='Tesla'),
+        event('2024-13-45 00:00:00'),
+        event('2024-01-03 10:00:00', heir='Mia', asset='Bitcoin', asset_type='Crypto'),
+    ])
+    assert len(analytics) == 2
+    # Skipped entries still count as read, so they are not fetched again
+    assert analytics._seen['fam'] == 5
+
+    summary = analytics.summary('fam', now=NOW)
+    assert summary['interactions'] == 2
+    assert summary['assets_explored'] == 2
+    assert summary['heirs']['Leo']['interactions'] == 1
+    assert summary['heirs']['Mia']['interactions'] == 1
+
+
+def test_batch_of_only_bad_timestamps_adds_nothing():
+    analytics = EngagementAnalytics()
+    analytics.ingest('fam', [event('not a date'), event('')])
+    assert len(analytics) == 0
+    assert analytics.summary('fam', now=NOW)['interactions'] == 0
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import catalog
+from catalog import ListCatalog, TickerCatalog, build_catalog, open_catalog, read_catalog_csv
+
+ROWS = [
+    {'symbol': 'AAPL', 'name': 'Apple Inc', 'type': 'Equities', 'description': 'iPhone maker'},
+    {'symbol': 'AMZN', 'name': 'Amazon.com Inc', 'type': 'Equities', 'description': 'Online retail'},
+    {'symbol': 'APLE', 'name': 'Apple Hospitality REIT', 'type': 'Real Estate', 'description': 'Hotels'},
+    {'symbol': 'VTSAX', 'name': 'Vanguard Total Stock Market Index', 'type': 'Index Fund', 'description': ''},
+    {'symbol': 'brk.b', 'name': 'Berkshire Hathaway', 'type': 'Equities', 'description': 'Conglomerate'},
+    {'symbol': 'TOOLONGSYMBOL', 'name': 'Skipped', 'type': 'Equities', 'description': ''},
+    {'symbol': 'AAPL', 'name': 'Apple Inc.', 'type': 'Equities', 'description': 'Later rows win'},
+]
+
+
+@pytest.fixture(params=['mmap', 'memory'])
+def ticker_catalog(request, tmp_path):
+    if request.param == 'memory':
+        return ListCatalog(ROWS)
+    path = str(tmp_path / "catalog.bin")
+    assert build_catalog(ROWS, path) == 5
+    return TickerCatalog(path)
+
+
+def test_lookup(ticker_catalog):
+    assert len(ticker_catalog) == 5
+    assert ticker_catalog.lookup(' aapl ') == {
+        'symbol': 'AAPL', 'name': 'Apple Inc.', 'type': 'Equities', 'description': 'Later rows win'
+    }
+    assert ticker_catalog.lookup('BRK.B')['name'] == 'Berkshire Hathaway'
+    assert ticker_catalog.lookup('AAP') is None
+    assert ticker_catalog.lookup('TOOLONGSYMBOL') is None
+    assert ticker_catalog.lookup('ZZZZ') is None
+
+
+def test_search_symbols_then_names(ticker_catalog):
+    assert [e['symbol'] for e in ticker_catalog.search('ap')] == ['APLE', 'AAPL']
+    assert [e['symbol'] for e in ticker_catalog.search('a')] == ['AAPL', 'AMZN', 'APLE']
+    assert [e['symbol'] for e in ticker_catalog.search('a', limit=2)] == ['AAPL', 'AMZN']
+    assert [e['symbol'] for e in ticker_catalog.search('vanguard total')] == ['VTSAX']
+    assert ticker_catalog.search('  ') == []
+    assert ticker_catalog.search('xyz') == []
+
+
+def test_long_non_ascii_text_is_cut_on_a_character_boundary(tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    # Both cuts at 0xFFFF bytes would land inside a multibyte character
+    name = "Société " + "é" * 40000
+    description = "ABC " + "株式会社" * 30000
+    build_catalog([{'symbol': 'GLE', 'name': name, 'type': 'Equities', 'description': description}], path)
+    entry = TickerCatalog(path).lookup('GLE')
+    assert name.startswith(entry['name']) and len(entry['name'].encode('utf-8')) <= 0xFFFF
+    assert description.startswith(entry['description']) and len(entry['description'].encode('utf-8')) <= 0xFFFF
+    assert entry['name'][-1] == "é" and entry['description'][-1] in "株式会社"
+
+
+def test_bundled_seed_builds(tmp_path):
+    path = str(tmp_path / "seed.bin")
+    count = build_catalog(read_catalog_csv(catalog.SEED_CATALOG_CSV), path)
+    assert len(TickerCatalog(path)) == count > 0
+
+
+def test_open_catalog_builds_missing_file(tmp_path):
+    path = str(tmp_path / "cache" / "catalog.bin")
+    opened = open_catalog(path)
+    assert isinstance(opened, TickerCatalog)
+    assert os.path.exists(path)
+
+
+def test_open_catalog_falls_back_to_memory(tmp_path, monkeypatch):
+    def read_only(rows, path):
+        raise PermissionError(13, "Read-only file system", path)
+    monkeypatch.setattr(catalog, 'build_catalog', read_only)
+    opened = open_catalog(str(tmp_path / "catalog.bin"))
+    assert isinstance(opened, ListCatalog)
+    assert opened.lookup('AAPL') is not None
+
+
+def test_default_catalog_is_rebuilt_when_seed_changes(tmp_path, monkeypatch):
+    seed = tmp_path / "tickers.csv"
+    seed.write_text("symbol,name,type,description\nAAPL,Apple Inc,Equities,\n", encoding='utf-8')
+    default = str(tmp_path / "cache" / "ticker_catalog.bin")
+    monkeypatch.setattr(catalog, 'SEED_CATALOG_CSV', str(seed))
+    monkeypatch.setattr(catalog, 'DEFAULT_CATALOG_PATH', default)
+    monkeypatch.delenv('LEGACYLOOP_CATALOG_PATH', raising=False)
+    assert len(open_catalog()) == 1
+
+    seed.write_text("symbol,name,type,description\nAAPL,Apple Inc,Equities,\nMSFT,Microsoft,Equities,\n",
+                    encoding='utf-8')
+    os.utime(default, (0, 0))
+    assert len(open_catalog()) == 2
+
+
+def test_no_catalog_without_seed(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, 'SEED_CATALOG_CSV', str(tmp_path / "missing.csv"))
+    assert open_catalog(str(tmp_path / "catalog.bin")) is None
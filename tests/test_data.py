@@ -0,0 +1,23 @@
+from data import DEFAULT_PORTFOLIO, add_asset, approximate_value, find_duplicate_name, update_asset
+
+
+def test_find_duplicate_name_ignores_case_and_spacing():
+    portfolio = [dict(asset) for asset in DEFAULT_PORTFOLIO]
+    apple = portfolio[0]
+    assert find_duplicate_name(portfolio, f"  {apple['name'].upper()} ")['id'] == apple['id']
+    assert find_duplicate_name(portfolio, apple['name'], exclude_id=apple['id']) is None
+    assert find_duplicate_name(portfolio, "Something New") is None
+
+
+def test_add_and_update_asset():
+    portfolio = [dict(asset) for asset in DEFAULT_PORTFOLIO]
+    new_asset = add_asset(portfolio, "Tesla Inc", 1000, 'Equities', 'TSLA')
+    assert new_asset['id'] == max(asset['id'] for asset in DEFAULT_PORTFOLIO) + 1
+    new_asset['units'] = 5.0
+    update_asset(portfolio, new_asset['id'], value=2000)
+    assert 'units' not in new_asset  # Re-anchored at the edited value
+
+
+def test_approximate_value():
+    assert approximate_value(123456) == 120000
+    assert approximate_value(0) == 0
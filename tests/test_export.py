@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+import pytest
+
+from export import export_stream, iter_export_rows, stream_html_report
+from family_state import FamilyState
+from storage import MemoryBackend
+
+
+@pytest.fixture
+def family():
+    family = FamilyState('fam', MemoryBackend())
+    for day in (1, 3, 5, 7, 9):
+        family.log_engagement({
+            'timestamp': f"2026-01-0{day} 10:00:00", 'heir': 'Leo', 'action': 'Asked Advisor',
+            'asset': f'Asset {day}', 'asset_type': 'Equities',
+        })
+    for day in (2, 4, 8):
+        family.log_email_draft({
+            'timestamp': f"2026-01-0{day} 10:00:00", 'heir': 'Leo', 'asset': f'Asset {day - 1}',
+            'email': f"Hi Leo, <about> day {day}",
+        })
+    return family
+
+
+def test_rows_are_merged_oldest_first_across_chunks(family):
+    rows = list(iter_export_rows(family, chunk_size=2))
+    assert [row['timestamp'][8:10] for row in rows] == ['01', '02', '03', '04', '05', '07', '08', '09']
+    assert [row['kind'] for row in rows[:2]] == ['engagement', 'email_draft']
+    assert rows[1]['action'] == 'Drafted Email' and rows[1]['email'].startswith("Hi Leo")
+
+
+def test_csv_and_jsonl(family):
+    text = "".join(export_stream(family, 'csv'))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert len(rows) == 8
+    assert rows[1]['email'] == "Hi Leo, <about> day 2"
+
+    lines = "".join(export_stream(family, 'jsonl')).splitlines()
+    assert [json.loads(line)['timestamp'] for line in lines] == [row['timestamp'] for row in rows]
+
+
+def test_html_report_is_escaped_and_paginated(family):
+    report = "".join(export_stream(family, 'html'))
+    assert report.startswith("<!DOCTYPE html>") and report.endswith("</html>")
+    assert "Hi Leo, &lt;about&gt; day 2" in report
+    assert "<about>" not in report
+    assert report.count('<section class="page">') == 1
+    assert "Page 1 of 1" in report
+
+    paged = "".join(stream_html_report(iter_export_rows(family), 'fam', 8, page_size=3))
+    assert paged.count('<section class="page">') == 3
+    assert "Page 3 of 3" in paged
+
+    with pytest.raises(ValueError):
+        export_stream(family, 'pdf')
+
+
+def test_export_reads_storage_lazily(family):
+    reads = []
+    get_list = family.backend.get_list
+    family.backend.get_list = lambda key, start=0, end=None: reads.append(key) or get_list(key, start, end)
+
+    export_stream(family, 'csv')
+    assert reads == []
+
+    rows = iter_export_rows(family, chunk_size=2)
+    next(rows)
+    assert len(reads) == 2  # one chunk of each list, not the whole history
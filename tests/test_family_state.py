@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+import family_state
+from data import DEFAULT_PORTFOLIO, update_asset
+from family_state import DraftWriter, FamilyState
+from storage import MemoryBackend, SQLiteBackend
+
+APPLE_ID = DEFAULT_PORTFOLIO[0]['id']
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / "family.db"))
+
+
+def value_of(family, asset_id=APPLE_ID):
+    return next(asset['value'] for asset in family.get_portfolio() if asset['id'] == asset_id)
+
+
+def test_conflicting_update_is_rejected_then_retried(backend):
+    # Two replicas' handles on the same family
+    ours, theirs = FamilyState('fam', backend), FamilyState('fam', backend)
+    seen = ours.portfolio_version
+
+    with theirs.update() as portfolio:
+        update_asset(portfolio, APPLE_ID, name="Apple (renamed)")
+
+    with ours.update(if_portfolio_version=seen) as portfolio:
+        assert portfolio is None
+    assert ours.portfolio_version == seen + 1
+    assert value_of(ours) == DEFAULT_PORTFOLIO[0]['value']
+
+    # Retry against the version that is now current
+    with ours.update(if_portfolio_version=ours.portfolio_version) as portfolio:
+        update_asset(portfolio, APPLE_ID, value=1)
+    renamed = next(asset for asset in ours.get_portfolio() if asset['id'] == APPLE_ID)
+    assert (renamed['name'], renamed['value']) == ("Apple (renamed)", 1)
+    assert ours.portfolio_version == seen + 2
+
+
+def test_concurrent_compare_and_swap_loses_no_updates(backend):
+    writers, increments = 4, 10
+
+    def add_one_dollar_repeatedly():
+        family = FamilyState('fam', backend)
+        for _ in range(increments):
+            while True:
+                version = family.portfolio_version
+                with family.update(if_portfolio_version=version) as portfolio:
+                    if portfolio is not None:
+                        asset = next(asset for asset in portfolio if asset['id'] == APPLE_ID)
+                        asset['value'] += 1
+                if portfolio is not None:
+                    break
+
+    threads = [threading.Thread(target=add_one_dollar_repeatedly) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    family = FamilyState('fam', backend)
+    assert value_of(family) == DEFAULT_PORTFOLIO[0]['value'] + writers * increments
+    assert family.portfolio_version == writers * increments
+
+
+def test_versions_bump_only_for_what_changed(backend):
+    family = FamilyState('fam', backend)
+    assert (family.version, family.portfolio_version) == (0, 0)
+
+    with family.update() as portfolio:
+        update_asset(portfolio, APPLE_ID, value=123)
+    assert (family.version, family.portfolio_version) == (1, 1)
+
+    family.log_engagement({'heir': 'Leo', 'action': 'Asked Advisor', 'asset': 'Apple Inc'})
+    family.set_mission_statement("We build together.")
+    assert (family.version, family.portfolio_version) == (3, 1)
+
+    # Mission-builder scratch state and presence never rerender other views
+    family.save_mission_draft("values", "goals")
+    family.set_mission_candidates(["draft"])
+    family.mark_online('leo')
+    family.log_email_draft({'heir': 'Leo', 'body': 'Hi'})
+    assert (family.version, family.portfolio_version) == (3, 1)
+
+
+def test_portfolio_cache_follows_the_version(backend):
+    ours, theirs = FamilyState('fam', backend), FamilyState('fam', backend)
+    assert value_of(ours) == DEFAULT_PORTFOLIO[0]['value']
+    with theirs.update() as portfolio:
+        update_asset(portfolio, APPLE_ID, value=42)
+    assert value_of(ours) == 42
+
+
+def test_value_moves_do_not_resync_the_search_index(backend):
+    ours, theirs = FamilyState('fam', backend), FamilyState('fam', backend)
+    assert ours.search_holdings("apple")[0]['id'] == APPLE_ID
+    syncs = []
+    original_sync = ours._search_index.sync
+    ours._search_index.sync = lambda portfolio: (syncs.append(len(portfolio)), original_sync(portfolio))
+
+    with theirs.update() as portfolio:
+        update_asset(portfolio, APPLE_ID, value=7)
+    assert ours.listing_version == 0
+    assert ours.search_holdings("apple")[0]['value'] == 7
+    assert syncs == []
+
+    with theirs.update() as portfolio:
+        update_asset(portfolio, APPLE_ID, name="Pear Holdings")
+    assert ours.listing_version == 1
+    assert ours.search_holdings("pear")[0]['id'] == APPLE_ID
+    assert len(syncs) == 1
+
+
+def counting_saves(family):
+    saves = []
+    save = family.save_mission_draft
+    family.save_mission_draft = lambda values, goals: (saves.append(values), save(values, goals))
+    return saves
+
+
+def test_rapid_draft_edits_collapse_into_one_write(backend):
+    family = FamilyState('fam', backend)
+    saves = counting_saves(family)
+    writer = DraftWriter(delay=0.2)
+    for i in range(10):
+        writer.stage(family, f"values {i}", "goals")
+    assert writer.pending('fam') == {'values': "values 9", 'goals': "goals"}
+
+    deadline = time.monotonic() + 5
+    while family.mission_draft is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.3)  # Long enough for any further (wrong) write to land
+    assert saves == ["values 9"]
+    assert family.mission_draft['values'] == "values 9"
+
+
+def test_staged_draft_is_flushed_on_exit(backend, monkeypatch):
+    exit_hooks = []
+    monkeypatch.setattr(family_state.atexit, 'register', exit_hooks.append)
+    family = FamilyState('fam', backend)
+    saves = counting_saves(family)
+    writer = DraftWriter(delay=60)
+    writer.stage(family, "first", "goals")
+    writer.stage(family, "final", "goals")
+    assert family.mission_draft is None
+
+    for hook in exit_hooks:
+        hook()
+    assert saves == ["final"]
+    assert family.mission_draft['values'] == "final"
+    assert writer.pending('fam') is None
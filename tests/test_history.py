@@ -0,0 +1,100 @@
+import pytest
+
+from history import SEGMENT_EVENTS, PortfolioHistory, _key, record_portfolio_change
+from storage import MemoryBackend
+
+SEED = [
+    {'id': 1, 'name': 'Apple Inc', 'value': 250000, 'type': 'Equities'},
+    {'id': 2, 'name': 'Family Home', 'value': 900000, 'type': 'Real Estate'},
+]
+
+
+def record(backend, before, after, timestamp):
+    record_portfolio_change(backend, 'fam', before, after, timestamp=timestamp)
+    return after
+
+
+def with_value(portfolio, asset_id, value):
+    return [dict(asset, value=value) if asset['id'] == asset_id else dict(asset) for asset in portfolio]
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend()
+
+
+def test_no_history_yet(backend):
+    history = PortfolioHistory(backend, 'fam')
+    assert history.as_of(1000) is None
+    times, values = history.value_series(1)
+    assert len(times) == 0 and len(values) == 0
+
+
+def test_as_of_replays_changes(backend):
+    history = PortfolioHistory(backend, 'fam')
+    current = record(backend, SEED, with_value(SEED, 1, 250001), 100)
+    added = current + [{'id': 3, 'name': 'Bonds', 'value': 5000, 'type': 'Fixed Income'}]
+    current = record(backend, current, added, 200)
+    record(backend, current, [asset for asset in current if asset['id'] != 2], 300)
+
+    def values(timestamp):
+        return {asset['id']: asset['value'] for asset in history.as_of(timestamp)}
+
+    assert values(50) == {1: 250000, 2: 900000}
+    assert values(100) == {1: 250001, 2: 900000}
+    assert values(250) == {1: 250001, 2: 900000, 3: 5000}
+    assert values(300) == {1: 250001, 3: 5000}
+    assert next(asset for asset in history.as_of(250) if asset['id'] == 3)['name'] == 'Bonds'
+
+
+def test_value_series_starts_at_the_baseline(backend):
+    history = PortfolioHistory(backend, 'fam')
+    current = record(backend, SEED, with_value(SEED, 1, 250001), 100)
+    record(backend, current, with_value(current, 1, 260000), 200)
+
+    times, values = history.value_series(1)
+    assert times.tolist() == [100, 100, 200]
+    assert values.tolist() == [250000, 250001, 260000]
+
+    # Unchanged seeded asset: just its baseline
+    times, values = history.value_series(2)
+    assert times.tolist() == [100]
+    assert values.tolist() == [900000]
+
+    # Unknown asset: nothing
+    assert len(history.value_series(99)[0]) == 0
+
+
+def test_value_series_and_as_of_across_sealed_segments(backend):
+    history = PortfolioHistory(backend, 'fam')
+    current = SEED
+    for i in range(SEGMENT_EVENTS + 10):
+        current = record(backend, current, with_value(current, 1, 250000 + i + 1), 1000 + i)
+
+    times, values = history.value_series(1)
+    assert len(times) == SEGMENT_EVENTS + 11
+    assert values[0] == 250000 and values[-1] == 250000 + SEGMENT_EVENTS + 10
+    assert list(times) == sorted(times)
+    assert history.value_series(2)[1].tolist() == [900000]
+
+    assert {a['id']: a['value'] for a in history.as_of(999)}[1] == 250000
+    assert {a['id']: a['value'] for a in history.as_of(1000 + SEGMENT_EVENTS + 3)}[1] == 250000 + SEGMENT_EVENTS + 4
+
+
+def test_large_change_is_sealed_at_segment_size(backend):
+    history = PortfolioHistory(backend, 'fam')
+    current = record(backend, SEED, with_value(SEED, 1, 250001), 100)
+    bulk = current + [
+        {'id': 10 + i, 'name': f'Lot {i}', 'value': 1000 + i, 'type': 'Equities'}
+        for i in range(2 * SEGMENT_EVENTS)
+    ]
+    record(backend, current, bulk, 200)
+
+    segments = backend.get_list(_key('fam', 'segments'))
+    assert len(segments) == 2
+    assert backend.list_length(_key('fam', 'tail')) == 1
+    # The second segment's checkpoint is the portfolio part-way through the batch
+    sealed = history._refresh()[0]
+    assert len(sealed[1].checkpoint) == len(SEED) + SEGMENT_EVENTS - 1
+    assert sorted(asset['id'] for asset in history.as_of(200)) == sorted(asset['id'] for asset in bulk)
+    assert {a['id']: a['value'] for a in history.as_of(150)} == {1: 250001, 2: 900000}
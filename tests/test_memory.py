@@ -0,0 +1,55 @@
+import pickle
+
+import pytest
+
+from memory import AssetRecord, EngagementRecord, LRUDict
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUDict(3)
+    for key in 'abc':
+        cache[key] = key.upper()
+    assert cache['a'] == 'A'       # read: 'a' is now the newest
+    cache['b'] = 'B2'              # write: 'b' is now the newest
+    cache['d'] = 'D'
+    assert list(cache) == ['a', 'b', 'd']
+    assert 'c' not in cache
+    assert cache.get('a') == 'A'
+    cache['e'] = 'E'
+    assert list(cache) == ['d', 'a', 'e']
+
+
+def test_lru_stays_within_capacity():
+    cache = LRUDict(5)
+    for i in range(100):
+        cache[i] = i
+        assert len(cache) <= 5
+    assert list(cache) == [95, 96, 97, 98, 99]
+    assert cache.get(0, 'gone') == 'gone'
+
+
+def test_record_behaves_like_a_dict():
+    asset = AssetRecord({'id': 1, 'name': 'Apple Inc', 'value': 250000})
+    assert asset['name'] == 'Apple Inc'
+    assert asset.get('symbol') is None
+    assert dict(asset) == {'id': 1, 'name': 'Apple Inc', 'value': 250000}
+    asset['value'] = 260000
+    del asset['name']
+    assert dict(asset) == {'id': 1, 'value': 260000}
+    assert pickle.loads(pickle.dumps(asset)) == asset
+
+
+def test_record_rejects_unknown_fields():
+    event = EngagementRecord.from_dict({'heir': 'Leo', 'action': 'Asked Advisor', 'extra': 1})
+    assert 'extra' not in event
+    with pytest.raises(KeyError):
+        event['extra'] = 1
+    with pytest.raises(AttributeError):
+        event.extra = 1
+    assert not hasattr(event, '__dict__')
+
+
+def test_interned_fields_share_one_string():
+    first = EngagementRecord.from_dict({'heir': ''.join(['Le', 'o'])})
+    second = EngagementRecord({'heir': ''.join(['L', 'eo'])})
+    assert first['heir'] is second['heir']
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import pricing
+from data import DEFAULT_PORTFOLIO, update_asset
+from family_state import FamilyState
+from pricing import RevaluationEngine, approximate_values, commit_revaluation
+from storage import MemoryBackend
+
+PORTFOLIO = [
+    {'id': 1, 'symbol': 'AAPL', 'name': 'Apple Inc', 'value': 1000, 'type': 'Equities'},
+    {'id': 2, 'symbol': 'aapl', 'name': 'Apple (second lot)', 'value': 500, 'type': 'Equities'},
+    {'id': 3, 'symbol': 'MSFT', 'name': 'Microsoft', 'value': 2000, 'type': 'Equities'},
+    {'id': 4, 'name': 'Family Home', 'value': 10000, 'type': 'Real Estate'},
+]
+
+
+@pytest.fixture
+def engine():
+    engine = RevaluationEngine()
+    engine.load_family('fam', [dict(asset) for asset in PORTFOLIO])
+    return engine
+
+
+def test_first_tick_anchors_units_and_later_ticks_revalue(engine):
+    result = engine.apply_ticks(['AAPL', 'MSFT'], [100.0, 50.0])
+    values = dict(zip(result.asset_ids.tolist(), result.values.tolist()))
+    assert values == pytest.approx({1: 1000, 2: 500, 3: 2000})
+    assert not result.material.any()
+
+    result = engine.apply_ticks(['AAPL'], [110.0])
+    values = dict(zip(result.asset_ids.tolist(), result.values.tolist()))
+    assert values == pytest.approx({1: 1100, 2: 550})
+
+
+def test_mixed_case_ticks_apply_once_with_last_price(engine):
+    engine.apply_ticks(['AAPL'], [100.0])
+    result = engine.apply_ticks(['aapl', 'AAPL', 'Aapl'], [120.0, 130.0, 110.0])
+    assert result.holdings == 2
+    assert sorted(result.values.tolist()) == pytest.approx([550, 1100])
+
+
+def test_invalid_and_unknown_ticks(engine):
+    engine.apply_ticks(['AAPL'], [100.0])
+    result = engine.apply_ticks(['AAPL', 'AAPL', 'ZZZZ'], [120.0, 0.0, 5.0])
+    assert result.unknown_symbols == 1
+    assert result.ticks == 3
+    assert sorted(result.values.tolist()) == pytest.approx([600, 1200])
+
+
+def test_material_flags_follow_prompt_rounding(engine):
+    engine.apply_ticks(['MSFT'], [100.0])
+    result = engine.apply_ticks(['MSFT'], [100.1])
+    assert not result.material.any()
+    result = engine.apply_ticks(['MSFT'], [120.0])
+    assert result.material.all()
+    assert approximate_values(np.array([123456.0])).tolist() == [120000.0]
+
+
+@pytest.fixture
+def family(monkeypatch):
+    family = FamilyState('fam', MemoryBackend())
+    monkeypatch.setattr(pricing, 'get_family_state', lambda family_id: family)
+    return family
+
+
+def load(engine, family):
+    version = family.portfolio_version
+    engine.load_family('fam', family.get_portfolio(), version)
+
+
+def test_commit_writes_values_and_tracks_version(family):
+    engine = RevaluationEngine()
+    load(engine, family)
+    apple = next(asset for asset in DEFAULT_PORTFOLIO if asset['symbol'] == 'AAPL')
+
+    engine.apply_ticks(['AAPL'], [100.0])
+    assert commit_revaluation(engine, engine.apply_ticks(['AAPL'], [110.0])) == 0
+    committed = {asset['id']: asset for asset in family.get_portfolio()}
+    assert committed[apple['id']]['value'] == round(apple['value'] * 1.1)
+    assert engine.loaded_version('fam') == family.portfolio_version
+
+
+def test_commit_retries_instead_of_overwriting_app_edits(family):
+    engine = RevaluationEngine()
+    load(engine, family)
+    apple = next(asset for asset in DEFAULT_PORTFOLIO if asset['symbol'] == 'AAPL')
+    engine.apply_ticks(['AAPL'], [100.0])
+
+    # Edited in the app after the engine loaded the family
+    with family.update() as portfolio:
+        update_asset(portfolio, apple['id'], name="Apple (edited)", value=300000)
+
+    assert commit_revaluation(engine, engine.apply_ticks(['AAPL'], [110.0])) == 1
+    committed = {asset['id']: asset for asset in family.get_portfolio()}
+    assert committed[apple['id']]['name'] == "Apple (edited)"
+    # The new value is anchored at the latest price rather than overwritten
+    assert committed[apple['id']]['value'] == 300000
+    assert engine.loaded_version('fam') == family.portfolio_version
+
+    assert commit_revaluation(engine, engine.apply_ticks(['AAPL'], [121.0])) == 0
+    committed = {asset['id']: asset for asset in family.get_portfolio()}
+    assert committed[apple['id']]['value'] == 330000
@@ -0,0 +1,26 @@
+import pytest
+
+from projections import project_portfolio
+
+PORTFOLIO = [
+    {'id': 1, 'name': 'Apple Inc', 'type': 'Equities', 'value': 250000},
+    {'id': 2, 'name': 'Savings', 'type': 'Cash/Savings', 'value': 100000},
+]
+
+
+def test_bands_are_ordered_and_scale_with_value():
+    projection = project_portfolio('test-bands', 1, 10, PORTFOLIO)
+    low, median, high = projection['assets'][1]
+    assert low < median < high
+    assert projection['total'].shape == (3, 11)
+    assert projection['total'][:, 0] == pytest.approx([350000] * 3)
+
+
+def test_result_is_shared_and_read_only():
+    projection = project_portfolio('test-shared', 1, 10, PORTFOLIO)
+    assert project_portfolio('test-shared', 1, 10, list(PORTFOLIO)) is projection
+    with pytest.raises(ValueError):
+        projection['total'][0, 0] = 0
+    with pytest.raises(TypeError):
+        projection['assets'][3] = (0, 0, 0)
+    assert project_portfolio('test-shared', 2, 10, PORTFOLIO) is not projection
@@ -0,0 +1,89 @@
+import pytest
+
+from prompts import (
+    HEIR_PROMPT,
+    MIN_FIELD_TOKENS,
+    MISSION_PROMPT,
+    PROMPT_TOKEN_BUDGETS,
+    TRUNCATION_MARKER,
+    PromptTemplate,
+    canonical_text,
+    estimate_tokens,
+    truncate_to_tokens,
+)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hi, you.") == 4           # hi , you .
+    assert estimate_tokens("philanthropy") == 3       # 12 characters
+
+
+def test_canonical_text():
+    assert canonical_text("  a\n\tb  c ") == "a b c"
+    assert canonical_text("Café") == "Café"
+
+
+def test_truncate_keeps_short_text():
+    assert truncate_to_tokens("Hard work and education.", 50) == "Hard work and education."
+
+
+def test_truncate_to_budget_at_a_word_boundary():
+    text = " ".join(f"word{i}" for i in range(200))
+    truncated = truncate_to_tokens(text, 40)
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated) <= 40
+    assert text.startswith(truncated[:-len(TRUNCATION_MARKER)])
+    assert truncated[:-len(TRUNCATION_MARKER)].split()[-1] in text.split()
+
+
+def test_truncate_prefers_sentence_end():
+    text = "First sentence is here. " * 8 + "A trailing clause that runs on and on " * 5
+    truncated = truncate_to_tokens(text, 60)
+    assert truncated.endswith("here." + TRUNCATION_MARKER)
+
+
+def test_truncate_inside_a_giant_word():
+    truncated = truncate_to_tokens("x" * 10000, 20)
+    assert truncated.startswith("xxxx") and truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated) <= 20
+    assert estimate_tokens(truncate_to_tokens("x" * 10000, 1)) <= MIN_FIELD_TOKENS
+
+
+def test_inputs_are_canonicalized():
+    values, goals = "Hard work,\n\n  education\tand philanthropy ", "Keep the Cafe\u0301\nunited."
+    prompt = MISSION_PROMPT.render(values=values, goals=goals)
+    assert "**Core Family Values:** Hard work, education and philanthropy\n" in prompt
+    assert "**Vision for the Family Wealth:** Keep the Caf\u00e9 united.\n" in prompt
+    # Inputs differing only in whitespace or Unicode form share one prompt (and cache entry)
+    assert prompt == MISSION_PROMPT.render(values="Hard work, education and philanthropy", goals="Keep the Caf\u00e9 united.")
+
+
+def test_over_budget_prompt_is_cut_to_budget():
+    goals = "Keep the family\nunited."
+    prompt = MISSION_PROMPT.render(values="Stewardship. " * 3000, goals=goals)
+    assert estimate_tokens(prompt) <= PROMPT_TOKEN_BUDGETS['mission_statement']
+    assert TRUNCATION_MARKER in prompt
+    assert canonical_text(goals) in prompt  # The short field stays whole
+    assert prompt.rstrip().endswith("Make it feel personal to THIS family.")
+
+
+def test_long_fields_share_the_budget():
+    template = PromptTemplate('heir_content', "A: {a}\nB: {b}\nC: {c}")
+    prompt = template.render(a="alpha " * 1000, b="beta " * 1000, c="short")
+    assert estimate_tokens(prompt) <= PROMPT_TOKEN_BUDGETS['heir_content']
+    a, b = prompt.split("\n")[0], prompt.split("\n")[1]
+    assert abs(estimate_tokens(a) - estimate_tokens(b)) <= 2
+    assert prompt.endswith("C: short")
+
+
+def test_numbers_are_formatted_and_counted():
+    prompt = HEIR_PROMPT.render(asset_name="Apple Inc", asset_type="Equities", asset_value=1250000,
+                                age=22, interests="gaming")
+    assert "worth about $1,250,000" in prompt
+    assert "22-year-old" in prompt
+
+
+def test_unknown_call_type():
+    with pytest.raises(KeyError):
+        PromptTemplate('nope', "{x}")
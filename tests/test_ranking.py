@@ -0,0 +1,58 @@
+from ranking import ENGAGED_PENALTY, HeirRanker, interest_affinity, score_asset, value_weight
+
+HEIR = {'id': 'leo', 'name': 'Leo', 'age': 22, 'interests': ['Tech', 'Gaming']}
+
+PORTFOLIO = [
+    {'id': 1, 'name': 'Apple Inc', 'type': 'Equities', 'value': 250000, 'description': 'Technology company'},
+    {'id': 2, 'name': 'Municipal Bonds', 'type': 'Fixed Income', 'value': 500000, 'description': 'Tax-free income'},
+    {'id': 3, 'name': 'Nintendo', 'type': 'Equities', 'value': 50000, 'description': 'Video game maker'},
+    {'id': 4, 'name': 'Family Home', 'type': 'Real Estate', 'value': 2000000, 'description': 'Primary residence'},
+    {'id': 5, 'name': 'Cloud Startup', 'type': 'Private Equity', 'value': 100000, 'description': 'Software seed round'},
+]
+
+
+def ids(assets):
+    return [asset['id'] for asset in assets]
+
+
+def test_scores():
+    assert interest_affinity(PORTFOLIO[1], HEIR['interests']) == 0.0
+    assert interest_affinity(PORTFOLIO[0], HEIR['interests']) == 1.0  # Equities 0.8 + "technology"
+    assert value_weight(0) == 0.0
+    assert value_weight(10 ** 10) == 1.0
+    assert score_asset(PORTFOLIO[3], HEIR) > score_asset(PORTFOLIO[1], HEIR)
+
+
+def test_top_k_matches_full_sort():
+    ranker = HeirRanker(HEIR)
+    full = sorted(PORTFOLIO, key=lambda asset: score_asset(asset, HEIR), reverse=True)
+    for limit in range(len(PORTFOLIO) + 2):
+        assert ids(ranker.top(PORTFOLIO, limit, portfolio_version=1)) == ids(full[:limit])
+
+
+def test_ties_keep_portfolio_order():
+    twins = [dict(PORTFOLIO[1], id=10), dict(PORTFOLIO[1], id=11), dict(PORTFOLIO[1], id=12)]
+    assert ids(HeirRanker(HEIR).top(twins, 2, portfolio_version=1)) == [10, 11]
+
+
+def test_engagement_pushes_asked_about_holdings_down():
+    ranker = HeirRanker(HEIR)
+    first = ranker.top(PORTFOLIO, 1, portfolio_version=1)[0]
+    ranker.observe_engagement([{'heir': 'Leo', 'asset': first['name']}, {'heir': 'Maya', 'asset': 'Nintendo'}], start=0)
+    assert ranker.logs_seen == 2
+    top = ranker.top(PORTFOLIO, len(PORTFOLIO), portfolio_version=1)
+    assert top[0]['id'] != first['id']
+    assert ranker._score(first) == score_asset(first, HEIR) - ENGAGED_PENALTY
+
+    # Entries already folded in by another session are skipped
+    ranker.observe_engagement([{'heir': 'Leo', 'asset': 'Nintendo'}], start=0)
+    assert ranker.logs_seen == 2
+
+
+def test_cached_selection_follows_portfolio_version():
+    ranker = HeirRanker(HEIR)
+    assert ids(ranker.top(PORTFOLIO, 1, portfolio_version=1)) == [1]
+    changed = [dict(PORTFOLIO[0], value=1)] + PORTFOLIO[1:]
+    changed[2] = dict(changed[2], description='Video game maker, gaming and esports', value=5000000)
+    assert ids(ranker.top(changed, 1, portfolio_version=1)) == [1]  # Same version: reused
+    assert ids(ranker.top(changed, 1, portfolio_version=2)) == [3]
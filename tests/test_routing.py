@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from routing import MIN_SAMPLES, ModelRouter, RateLimiter
+
+LITE = 'gemini-2.0-flash-lite'
+FLASH = 'gemini-2.0-flash'
+
+
+def fast_router(burst: int = 100) -> ModelRouter:
+    return ModelRouter(FLASH, rate_per_second=1000, burst=burst)
+
+
+def warm_up(router, model, latency, ok=True, call_type='heir_content'):
+    for _ in range(MIN_SAMPLES):
+        router._record(model, call_type, latency, ok=ok)
+
+
+def test_preferred_model_until_another_is_clearly_faster():
+    router = fast_router()
+    assert router.choose('heir_content') == LITE
+    assert router.choose('unrouted') == FLASH
+
+    warm_up(router, LITE, 1.0)
+    # FLASH has no samples yet, so it is measured first
+    assert router.choose('heir_content') == FLASH
+    warm_up(router, FLASH, 0.9)
+    assert router.choose('heir_content') == LITE  # within the tolerance
+
+    router = fast_router()
+    warm_up(router, LITE, 1.0)
+    warm_up(router, FLASH, 0.1)
+    assert router.choose('heir_content') == FLASH
+
+
+def test_failing_model_is_skipped():
+    router = fast_router()
+    warm_up(router, LITE, 0.1, ok=False)
+    warm_up(router, FLASH, 0.5)
+    assert router.choose('heir_content') == FLASH
+
+
+def test_slow_call_is_hedged_and_first_answer_wins():
+    router = fast_router()
+    warm_up(router, LITE, 0.01)
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)
+            return "primary"
+        return "backup"
+
+    try:
+        assert router.call('heir_content', LITE, generate) == "backup"
+    finally:
+        release.set()
+    assert router.stats()['hedged'] == 1
+
+
+def test_hedge_needs_a_free_rate_limit_token():
+    router = ModelRouter(FLASH, rate_per_second=0.01, burst=1)
+    warm_up(router, LITE, 0.01)
+    calls = []
+
+    def generate():
+        calls.append(None)
+        threading.Event().wait(0.1)
+        return "primary"
+
+    assert router.call('heir_content', LITE, generate) == "primary"
+    assert len(calls) == 1
+    assert router.stats()['hedged'] == 0
+
+
+def test_failed_attempt_falls_back_to_the_other():
+    router = fast_router()
+    warm_up(router, LITE, 0.01)
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RuntimeError("primary failed")
+        release.set()
+        return "backup"
+
+    assert router.call('heir_content', LITE, generate) == "backup"
+
+
+def test_last_error_raised_when_every_attempt_fails():
+    router = fast_router()
+
+    def generate():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        router.call('mission_statement', FLASH, generate)
+    assert router.latency_percentile(FLASH, 'mission_statement') is None
+
+
+def test_try_acquire_does_not_wait():
+    limiter = RateLimiter(rate=0.01, burst=2)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
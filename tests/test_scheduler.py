@@ -0,0 +1,47 @@
+import threading
+
+import scheduler
+import services
+from scheduler import PRIORITY_OFFLINE, PRIORITY_VISIBLE, GenerationScheduler, submit_heir_content
+
+ASSET = {'id': 'a1', 'name': 'Apple Inc', 'type': 'Stock', 'value': 250000}
+HEIR = {'id': 'leo', 'age': 22, 'interests': ['gaming']}
+
+
+def blocked_scheduler():
+    """Single-worker scheduler whose worker waits on the returned event"""
+    release = threading.Event()
+    jobs = GenerationScheduler(concurrency=1)
+    jobs.submit('blocker', release.wait, priority=PRIORITY_VISIBLE)
+    return jobs, release
+
+
+def test_duplicate_keys_share_one_job():
+    jobs, release = blocked_scheduler()
+    order = []
+    first = jobs.submit('a', order.append, 'a', priority=PRIORITY_OFFLINE)
+    second = jobs.submit('b', order.append, 'b', priority=PRIORITY_OFFLINE)
+    again = jobs.submit('a', order.append, 'a-again', priority=PRIORITY_VISIBLE)
+    assert again is first
+    release.set()
+    first.result(timeout=5)
+    second.result(timeout=5)
+
+    # The duplicate ran once, and its raised priority put it ahead of 'b'
+    assert order == ['a', 'b']
+    stats = jobs.stats()
+    assert stats['submitted'] == 3
+    assert stats['deduplicated'] == 1
+
+
+def test_heir_content_jobs_are_split_by_key_mode(monkeypatch):
+    monkeypatch.setattr(scheduler, 'generate_heir_content', lambda asset, heir, api_key: api_key)
+    monkeypatch.setattr(services, 'GENAI_AVAILABLE', True)
+    jobs, release = blocked_scheduler()
+    simulated = submit_heir_content(jobs, ASSET, HEIR, PRIORITY_OFFLINE, api_key="")
+    live = submit_heir_content(jobs, ASSET, HEIR, PRIORITY_OFFLINE, api_key="secret")
+    assert simulated is not live
+    assert submit_heir_content(jobs, dict(ASSET), dict(HEIR), PRIORITY_OFFLINE, api_key="secret") is live
+    release.set()
+    assert simulated.result(timeout=5) == ""
+    assert live.result(timeout=5) == "secret"
@@ -0,0 +1,90 @@
+from search import HoldingIndex, tokenize
+
+HOLDINGS = [
+    {'id': 1, 'name': 'Apple Inc', 'symbol': 'AAPL', 'type': 'Equities', 'description': 'Maker of the iPhone'},
+    {'id': 2, 'name': 'Applied Materials', 'symbol': 'AMAT', 'type': 'Equities', 'description': 'Semiconductor equipment'},
+    {'id': 3, 'name': 'Beachfront Villa', 'symbol': '', 'type': 'Real Estate', 'description': 'Vacation home in Malibu'},
+    {'id': 4, 'name': 'Bitcoin', 'symbol': 'BTC', 'type': 'Cryptocurrency', 'description': 'Digital currency'},
+]
+
+
+def make_index(holdings=HOLDINGS):
+    index = HoldingIndex()
+    index.sync(holdings)
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Apple Inc. (AAPL)") == ['apple', 'inc', 'aapl']
+    assert tokenize(None) == []
+
+
+def test_exact_then_prefix_then_typo():
+    index = make_index()
+    assert index.search("applied") == [2]
+    assert index.search("appl") == [1, 2]       # both by prefix, ties by id
+    assert index.search("equipment") == [2]
+    assert index.search("equity") == []
+    assert index.search("home") == [3]
+    assert index.search("homes") == [3]         # one insertion away from "home"
+    assert index.search("aple") == [1]          # one deletion away from "apple"
+    assert index.search("bitcion") == [4]       # adjacent transposition (shared deletion)
+    assert index.search("bitcoyn") == [4]       # one substitution
+
+
+def test_better_matches_rank_first():
+    index = make_index([
+        {'id': 1, 'name': 'Bold Ventures', 'type': 'Private Equity'},
+        {'id': 2, 'name': 'Goldman Bonds', 'type': 'Fixed Income'},
+        {'id': 3, 'name': 'Gold Bullion', 'type': 'Alternative Investments'},
+    ])
+    assert index.search("gold") == [3, 2, 1]    # exact, prefix, one typo
+    assert index.search("gold", limit=2) == [3, 2]
+
+
+def test_every_query_word_must_match():
+    index = make_index()
+    assert index.search("apple iphone") == [1]
+    assert index.search("apple villa") == []
+    assert index.search("real estate malibu") == [3]
+
+
+def test_short_tokens_match_whole_words_only():
+    index = make_index()
+    assert index.search("ap") == []
+    assert index.search("inc") == [1]
+    assert index.search("btc") == [4]
+
+
+def test_limit_and_empty_query():
+    index = make_index()
+    assert index.search("equities", limit=1) == [1]
+    assert index.search("") == []
+    assert index.search("!!!") == []
+
+
+def test_sync_reindexes_only_changes():
+    index = make_index()
+    renamed = [dict(HOLDINGS[0], name='Orchard Holdings')] + HOLDINGS[1:3]
+    index.sync(renamed)
+    assert len(index) == 3
+    assert index.search("orchard") == [1]
+    assert index.search("apple") == []
+    assert index.search("applied") == [2]
+    assert index.search("bitcoin") == []
+
+    index.add(HOLDINGS[3])
+    assert index.search("bitc") == [4]
+    index.remove(4)
+    assert index.search("bitc") == []
+
+
+def test_large_sync_matches_incremental_updates():
+    holdings = [{'id': i, 'name': f"Fund{i:04d} Holding", 'type': 'Index Fund'} for i in range(600)]
+    index = make_index(holdings)
+    # Prefix matches first, then words one typo away (e.g. fund0012)
+    assert index.search("fund012")[:10] == list(range(120, 130))
+    index.sync(holdings[:100] + [{'id': 1000, 'name': 'Fundamental Trust', 'type': 'Trust'}])
+    assert not set(index.search("fund012")) & set(range(120, 130))
+    assert index.search("fundam") == [1000]
+    assert len(index.search("holding", limit=1000)) == 100
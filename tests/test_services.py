@@ -0,0 +1,51 @@
+import pytest
+
+import services
+from services import generation_key, get_cached_response, response_cache_key
+from storage import MemoryBackend
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(services, 'get_storage_backend', lambda: backend)
+    monkeypatch.setattr(services, 'GENAI_AVAILABLE', True)
+    return backend
+
+
+def test_keys_separate_models_and_key_modes(backend):
+    assert response_cache_key("p", "gemini-2.0-flash", "k") != response_cache_key("p", "gemini-2.5-flash", "k")
+    assert response_cache_key("p", "gemini-2.0-flash", "k") != response_cache_key("p", "gemini-2.0-flash", "")
+    assert response_cache_key("p", "gemini-2.0-flash", "k") == response_cache_key("p", "gemini-2.0-flash", "other")
+    assert generation_key("p", "k") != generation_key("p", "")
+
+
+def test_cached_response_from_any_routed_model(backend):
+    assert get_cached_response("p", 'heir_content', "k") is None
+    backend.set(response_cache_key("p", "gemini-2.0-flash", "k"), "answer")
+    assert get_cached_response("p", 'heir_content', "k") == "answer"
+    assert get_cached_response("p", 'heir_content', "") is None
+    # Not on the mission statement route's model list
+    backend.set(response_cache_key("q", "gemini-2.0-flash-lite", "k"), "lite")
+    assert get_cached_response("q", 'mission_statement', "k") is None
+
+
+def test_mission_candidates_drop_errors_and_cache_per_mode(backend, monkeypatch):
+    replies = iter(["[API Error] quota", "Draft A", "Draft B", "Draft C"])
+    models = []
+
+    def fake_response(prompt, model=None, api_key=None, call_type=None):
+        models.append(model)
+        return next(replies)
+
+    monkeypatch.setattr(services, 'get_gemini_response', fake_response)
+    drafts = services.generate_mission_statement_candidates("Thrift", "Education", count=2, api_key="k")
+    assert drafts == ["Draft A"]
+    assert models == ["gemini-2.0-flash", "gemini-2.0-flash"]
+
+    # Cached for the live mode only; simulation gets the fallback, not live drafts
+    assert services.generate_mission_statement_candidates(" thrift ", "EDUCATION", count=2, api_key="k") == ["Draft A"]
+    assert services.generate_mission_statement_candidates("Thrift", "Education", count=2, api_key="") == [
+        services.FALLBACK_RESPONSES['mission_statement']
+    ]
+    assert len(models) == 2
@@ -0,0 +1,80 @@
+import pytest
+
+from storage import MemoryBackend, SQLiteBackend, StorageBackend, create_backend
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'fakeredis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    if request.param == 'sqlite':
+        return SQLiteBackend(str(tmp_path / "test.db"))
+    pytest.importorskip('fakeredis')
+    return create_backend("fakeredis://")
+
+
+def test_values_are_independent_copies(backend):
+    value = {'a': [1, 2]}
+    backend.set('k', value)
+    value['a'].append(3)
+    assert backend.get('k') == {'a': [1, 2]}
+    assert backend.get('missing', 'default') == 'default'
+    backend.delete('k')
+    assert backend.get('k') is None
+
+
+def test_incr(backend):
+    assert backend.incr('n') == 1
+    assert backend.incr('n') == 2
+    assert backend.get('n') == 2
+
+
+def test_list_ranges(backend):
+    for i in range(5):
+        assert backend.append('items', {'i': i}) == i + 1
+    assert backend.list_length('items') == 5
+    assert [item['i'] for item in backend.get_list('items')] == [0, 1, 2, 3, 4]
+    assert [item['i'] for item in backend.get_list('items', start=3)] == [3, 4]
+    assert [item['i'] for item in backend.get_list('items', start=1, end=3)] == [1, 2]
+    assert backend.get_list('items', start=2, end=2) == []
+    assert backend.get_list('missing') == []
+
+
+def test_extend_appends_in_order(backend):
+    backend.append('items', 'a')
+    assert backend.extend('items', ['b', 'c']) == 3
+    assert backend.extend('items', []) == 3
+    assert backend.get_list('items') == ['a', 'b', 'c']
+
+
+def test_lock_is_exclusive(backend):
+    with backend.lock('family'):
+        with pytest.raises(TimeoutError):
+            with backend.lock('family', timeout=0.05):
+                pass
+    with backend.lock('family', timeout=0.05):
+        pass
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_unknown_url():
+    with pytest.raises(ValueError):
+        create_backend("ftp://nowhere")
+
+
+def test_fakeredis_missing_is_friendly(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_fakeredis(name, *args, **kwargs):
+        if name == 'fakeredis':
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_fakeredis)
+    with pytest.raises(RuntimeError, match="fakeredis"):
+        create_backend("fakeredis://")
@@ -3,7 +3,12 @@
 
 import streamlit as st
 from datetime import datetime
-from data import USERS, format_currency
+from data import USERS, approximate_value, format_currency
+from family_state import get_current_family
+from memory import session_memory
+from scheduler import get_scheduler
+from routing import get_model_router
+from services import DEFAULT_MODEL, is_simulation_mode
 
 
 def render_sidebar():
@@ -44,14 +49,8 @@ def render_sidebar():
             help="Enter your Google Gemini API key. Leave empty for simulation mode."
         )
         
-        # Check for API key in both text input and secrets
-        has_api_key = bool(api_key)
-        if not has_api_key:
-            try:
-                if "GEMINI_API_KEY" in st.secrets:
-                    has_api_key = True
-            except Exception:
-                pass
+        # Check for API key in the text input, secrets and environment
+        has_api_key = bool(api_key) or not is_simulation_mode()
         
         if not has_api_key:
             st.warning("⚡ **Simulation Mode**\nUsing mock AI responses")
@@ -62,18 +61,33 @@ def render_sidebar():
         
         # Session State Debug
         with st.expander("🔧 Debug Info"):
+            memory = session_memory(st.session_state)
+            st.write(f"**Session Memory:** ~{sum(memory.values()) / 1024:.1f} KB")
             st.write("**Session State Keys:**")
-            for key in st.session_state:
+            for key, size in memory.items():
                 if key not in ['gemini_api_key']:
-                    st.write(f"- {key}")
+                    st.write(f"- {key} ({size / 1024:.1f} KB)")
+            
+            family = get_current_family()
+            st.write(f"\n**Family:** {family.family_id} (v{family.version})")
+            st.write(f"**Engagement Logs:** {family.count_engagement_logs()}")
             
-            if 'engagement_logs' in st.session_state:
-                st.write(f"\n**Engagement Logs:** {len(st.session_state.engagement_logs)}")
+            stats = get_scheduler().stats()
+            st.write(
+                f"**Generation Queue:** {stats['queue_depth']} queued, "
+                f"{stats['in_flight']} running, {stats['throughput_per_min']:.0f}/min"
+            )
+            
+            routing = get_model_router(DEFAULT_MODEL).stats()
+            st.write(f"**Hedged Calls:** {routing['hedged']}")
+            for route, latency in routing['latency'].items():
+                st.caption(f"{route}: p50 {latency['p50']:.2f}s · p99 {latency['p99']:.2f}s ({latency['samples']} calls)")
 
 
-def render_user_header(role: str):
-    """Render the current user header"""
-    user = USERS.get(role, USERS['primary'])
+def render_user_header(role: str, user: dict = None):
+    """Render the current user header (`user` overrides the role's default profile)"""
+    if user is None:
+        user = USERS.get(role, USERS['primary'])
     
     col1, col2 = st.columns([1, 5])
     with col1:
@@ -83,18 +97,25 @@ def render_user_header(role: str):
         st.caption(f"{user['role']} • {user.get('bio', '')[:60]}...")
 
 
-def render_legacy_card(asset: dict, explanation: str, show_action: bool = True):
+@st.fragment
+def render_legacy_card(asset: dict, explanation: str, show_action: bool = True, heir: dict = None,
+                       projection: tuple = None):
     """
     Render a TikTok-style Legacy Card for an asset.
     
+    Runs as a fragment, so clicking "Ask Advisor" only reruns this card.
+    
     Args:
         asset: Asset dictionary with name, value, type
         explanation: AI-generated explanation
         show_action: Whether to show the "Ask Advisor" button
+        heir: Profile of the heir viewing the card (defaults to Leo)
+        projection: Optional (years, low, median, high) growth projection
     """
     asset_name = asset.get('name', 'Unknown Asset')
     asset_type = asset.get('type', 'Investment')
     asset_value = asset.get('value', 0)
+    heir_name = (heir or USERS['heir'])['name']
     
     # Type-based color coding
     color_map = {
@@ -127,31 +148,42 @@ def render_legacy_card(asset: dict, explanation: str, show_action: bool = True):
             <span style="color: #aaa; font-size: 14px;">{format_currency(asset_value)}</span>
         </div>
         <h3 style="color: #fff; margin: 10px 0; font-size: 20px;">{asset_name}</h3>
-        <p style="color: #ccc; line-height: 1.6; font-size: 14px;">{explanation}</p>
+        <p style="color: #ccc; line-height: 1.6; font-size: 14px;">{explanation}</p>{render_projection_line(projection)}
     </div>
     """
     
     st.markdown(card_html, unsafe_allow_html=True)
     
     if show_action:
-        if st.button(f"💬 Ask Advisor about this", key=f"ask_{asset_name}"):
+        if st.button(f"💬 Ask Advisor about this", key=f"ask_{asset.get('id', asset_name)}"):
             # Log the engagement
             log_entry = {
                 'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'heir': USERS['heir']['name'],
+                'heir': heir_name,
                 'action': 'Asked Advisor',
                 'asset': asset_name,
                 'asset_type': asset_type
             }
             
-            if 'engagement_logs' not in st.session_state:
-                st.session_state.engagement_logs = []
-            
-            st.session_state.engagement_logs.append(log_entry)
+            # Shared per family so the advisor's session sees it live
+            get_current_family().log_engagement(log_entry)
             st.success(f"✅ Your interest in **{asset_name}** has been shared with Sarah!")
             st.balloons()
 
 
+def render_projection_line(projection: tuple = None) -> str:
+    """HTML line with a card's projected value range (empty without a projection)"""
+    if projection is None:
+        return ""
+    years, low, median, high = projection
+    return (
+        f'<p style="color: #8fa8ff; font-size: 13px; margin: 0;">'
+        f'🔮 In {years} years: ~{format_currency(approximate_value(median))} '
+        f'<span style="color: #888;">(likely {format_currency(approximate_value(low))}'
+        f' – {format_currency(approximate_value(high))})</span></p>'
+    )
+
+
 def render_mission_statement(statement: str):
     """Render the family mission statement in a styled container"""
     st.markdown("""